@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Latência do alarme: do cruzamento do limiar em avaliar_de_json ao primeiro play() no backend."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from typing import Dict, List, Optional, Sequence
+
+import _part1 as P1
+import _part4 as P4
+import _part5 as P5
+from _audiobackend import RecordingBackend
+from _metrics import percentil
+
+NIVEIS_PADRAO = (2, 3, 4, 5)
+
+
+def _dados_para_nivel(nivel: int) -> Optional[dict]:
+    """Janela de pitch (roll parado) cuja avaliação cai exatamente em `nivel`."""
+    # a métrica é (max + min + aa) * fator: basta deslocar a janela inteira
+    for passo in range(1, 400):
+        desloc = 0.01 * passo
+        dados = {
+            "ptchwnd": [desloc + 0.2 * ((i % 9) - 4) for i in range(120)],
+            "rollwnd": [0.0] * 120,
+            "windspdmean": {"med. 2 min": 10.0},
+            "gustspdmax": {"instantaneo op.": 12.0},
+            "_wind_source": "bench",
+        }
+        est = P4.avaliar_de_json(dados)
+        if est["pitch_nivel"] == nivel:
+            return dados
+        if est["pitch_nivel"] > nivel:
+            return None
+    return None
+
+
+def _aguardar_audio_ocioso(timeout: float) -> None:
+    fim = time.monotonic() + timeout
+    while time.monotonic() < fim:
+        if P1.AUDIO_DISPATCHER.pendentes() == 0 and P1.AUDIO_DISPATCHER.tocando() is None:
+            if P1._wait_all_channels_free(max(0.0, fim - time.monotonic())):
+                return
+        time.sleep(0.01)
+
+
+def medir_latencia_alarme(
+    repeticoes: int = 20,
+    niveis: Sequence[int] = NIVEIS_PADRAO,
+    confirmar_sec: float = 0.0,
+    escala: float = 0.01,
+    modo: str = "dupla",
+) -> Dict:
+    """
+    Para cada nível: avalia uma janela que cruza o limiar, entrega ao
+    AlarmState (confirmações com `confirmar_sec` e recoleta devolvendo a
+    mesma leitura) e mede até o primeiro play() no RecordingBackend.
+
+    `confirmar_sec=0` mede só a máquina (timers, fila, banco, compositor);
+    com o valor real (P5.ALARM_CONFIRM_SEC) a soma inclui as duas esperas.
+    `modo="rajada"` usa os tempos reais de P5.ALARM_RAJADA_POR_NIVEL
+    (`confirmar_sec` não se aplica).
+    """
+    rec = RecordingBackend(P1.log, escala=escala)
+    anterior = P1.AUDIO_BACKEND
+    P1.usar_backend_audio(rec)
+    out: Dict = {"backend": rec.nome, "modo": modo, "repeticoes": repeticoes, "confirmar_sec": confirmar_sec, "niveis": {}}
+    try:
+        for nivel in niveis:
+            if nivel <= 3 and P5.is_muted_L23():
+                out["niveis"][str(nivel)] = {"erro": "L2/L3 em mute"}
+                continue
+            dados = _dados_para_nivel(nivel)
+            if dados is None:
+                out["niveis"][str(nivel)] = {"erro": "sem janela para o nível"}
+                continue
+            total: List[float] = []
+            avaliar: List[float] = []
+            perdidos = 0
+            for _ in range(repeticoes):
+                _aguardar_audio_ocioso(5.0)
+                t0 = time.perf_counter()
+                est = P4.avaliar_de_json(dados)
+                t_av = time.perf_counter()
+                alarme = P5.AlarmState(
+                    coletar=lambda est=est: est, amostrar=lambda est=est: est, confirm_sec=confirmar_sec, modo=modo
+                )
+                alarme.maybe_schedule(est)
+                reg = rec.esperar_play(t0, timeout=confirmar_sec * 2 + 10.0)
+                if reg is None:
+                    perdidos += 1
+                    continue
+                avaliar.append((t_av - t0) * 1000.0)
+                total.append((reg["t"] - t0) * 1000.0)
+            out["niveis"][str(nivel)] = {
+                "amostras": len(total),
+                "perdidos": perdidos,
+                "avaliar_ms_p50": _arred(percentil(avaliar, 50)),
+                "ate_play_ms_p50": _arred(percentil(total, 50)),
+                "ate_play_ms_p99": _arred(percentil(total, 99)),
+                "ate_play_ms_max": _arred(max(total) if total else None),
+            }
+        _aguardar_audio_ocioso(5.0)
+    finally:
+        P1.usar_backend_audio(anterior, preload=False)
+    return out
+
+
+def _arred(v: Optional[float]) -> Optional[float]:
+    return None if v is None else round(v, 3)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(
+        description="Latência limiar -> primeiro sample do alarme (backend recording; grava eventos no log do LITE2_HOME)"
+    )
+    ap.add_argument("--repeticoes", type=int, default=20)
+    ap.add_argument("--niveis", default="2,3,4,5", help="níveis separados por vírgula")
+    ap.add_argument("--confirmar", type=float, default=0.0, help="espera de cada confirmação (s); real = %s" % P5.ALARM_CONFIRM_SEC)
+    ap.add_argument("--modo", choices=("dupla", "rajada"), default="dupla", help="confirmação do AlarmState")
+    ap.add_argument("--escala", type=float, default=0.01, help="fator das durações simuladas dos clips")
+    a = ap.parse_args(argv)
+    niveis = [int(x) for x in a.niveis.split(",") if x.strip()]
+    print(json.dumps(medir_latencia_alarme(a.repeticoes, niveis, a.confirmar, a.escala, a.modo), indent=2, ensure_ascii=False))
+    return 0
+
+
+__all__ = [
+    "medir_latencia_alarme",
+    "main",
+]
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
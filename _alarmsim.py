@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Simulador determinístico do AlarmState: série roteirizada ou gravada em relógio virtual -> linha do tempo."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import time
+from bisect import bisect_right
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import _part1 as P1
+import _part4 as P4
+import _part5 as P5
+from _scheduler import Agendador, RelogioVirtual
+
+# (t em s desde o início, pitch, roll) — valores já na métrica do painel (soma max/min)
+Ponto = Tuple[float, float, float]
+
+FOLGA_FINAL_SEC = 60.0  # depois do último ponto, tempo para confirmações pendentes terminarem
+
+_RE_SNAP = re.compile(r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}); SNAP\b.*?PITCH: ([-\d.]+).*?ROLL: ([-\d.]+)")
+
+
+class Serie:
+    """Degraus: o valor vale do seu `t` até o próximo ponto."""
+
+    def __init__(self, pontos: Iterable[Ponto]):
+        self.pontos: List[Ponto] = sorted((float(t), float(p), float(r)) for t, p, r in pontos)
+        self._ts = [p[0] for p in self.pontos]
+
+    @property
+    def fim(self) -> float:
+        return self._ts[-1] if self._ts else 0.0
+
+    def valor(self, t: float) -> Optional[Tuple[float, float]]:
+        i = bisect_right(self._ts, t) - 1
+        if i < 0:
+            return None
+        _, pitch, roll = self.pontos[i]
+        return pitch, roll
+
+
+def roteiro(trechos: Sequence[Tuple[float, float, float]]) -> Serie:
+    """[(duração s, pitch, roll), ...] em sequência -> Serie."""
+    pontos, t = [], 0.0
+    for dur, pitch, roll in trechos:
+        pontos.append((t, pitch, roll))
+        t += float(dur)
+    pontos.append((t, 0.0, 0.0))
+    return Serie(pontos)
+
+
+def carregar_serie(path: str) -> Serie:
+    """
+    - .json: [[t, pitch, roll], ...] ou [{"t":, "pitch":, "roll":}, ...]
+    - .log: linhas SNAP do lite2_events.log (t relativo à primeira)
+    - demais: texto "t;pitch;roll" (ou vírgula), linhas com # ignoradas
+    """
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        if ext == ".json":
+            bruto = json.load(f)
+            return Serie((d["t"], d["pitch"], d["roll"]) if isinstance(d, dict) else d for d in bruto)
+        linhas = f.read().splitlines()
+
+    if ext == ".log":
+        pontos, t0 = [], None
+        for li in linhas:
+            m = _RE_SNAP.match(li)
+            if not m:
+                continue
+            ts = datetime.strptime(m.group(1), "%Y-%m-%d %H:%M:%S").timestamp()
+            t0 = ts if t0 is None else t0
+            pontos.append((ts - t0, float(m.group(2)), float(m.group(3))))
+        return Serie(pontos)
+
+    pontos = []
+    for li in linhas:
+        li = li.strip()
+        if not li or li.startswith("#"):
+            continue
+        campos = [c.strip() for c in re.split(r"[;,]", li)]
+        try:
+            pontos.append((float(campos[0]), float(campos[1]), float(campos[2])))
+        except (ValueError, IndexError):
+            continue  # cabeçalho
+    return Serie(pontos)
+
+
+def simular(
+    serie: Serie,
+    ciclo: float = P1.COLETA_INTERVAL,
+    modo: Optional[str] = None,
+    mutes: Sequence[Tuple[float, float]] = (),
+    duracao: Optional[float] = None,
+    rajada: Optional[Dict[int, Tuple[float, int, int, float]]] = None,
+    confirm_sec: Optional[float] = None,
+) -> List[Dict]:
+    """
+    Roda a série pelo AlarmState em relógio virtual: a cada `ciclo` o
+    "loop" entrega a leitura do momento; as confirmações (dupla ou rajada)
+    leem a série no horário virtual em que acontecem. `mutes` são janelas
+    [início, fim) de mute L2/L3. Nada toca nem vai para o log de eventos.
+
+    Devolve a linha do tempo: CONFIRM_START, PLAY e SUPPRESS (com reason).
+    """
+    ag = Agendador(relogio=RelogioVirtual(0.0))
+    linha: List[Dict] = []
+
+    def _est():
+        v = serie.valor(ag.agora())
+        return None if v is None else P4.avaliar_por_valores(v[0], v[1], None)
+
+    def _mutado() -> bool:
+        t = ag.agora()
+        return any(ini <= t < fim for ini, fim in mutes)
+
+    def _tocar(nivel, est, **extra):
+        linha.append({"t": ag.agora(), "evento": "PLAY", "nivel": nivel, "pitch": est.get("pitch_val"), "roll": est.get("roll_val"), **extra})
+
+    def _log_evento(nome, **kv):
+        ev = {"t": ag.agora(), "evento": "SUPPRESS" if nome == "ALARM_SUPPRESS" else nome}
+        if "level" in kv:
+            ev["nivel"] = kv.pop("level")
+        ev.update({k: v for k, v in kv.items() if v is not None})
+        linha.append(ev)
+
+    alarme = P5.AlarmState(
+        coletar=_est,
+        amostrar=_est,
+        agendador=ag,
+        modo=modo,
+        rajada=rajada,
+        confirm_sec=confirm_sec,
+        mutado=_mutado,
+        tocar=_tocar,
+        log_evento=_log_evento,
+    )
+
+    def _ciclo():
+        est = _est()
+        if est is None:
+            return
+        estava = alarme.confirm_stage
+        alarme.maybe_schedule(est)
+        if estava == 0 and alarme.confirm_stage != 0:
+            linha.append({"t": ag.agora(), "evento": "CONFIRM_START", "nivel": alarme.nivel_combinado(est)})
+
+    ag.a_cada(ciclo, _ciclo, nome="sim_ciclo", primeiro=0.0)
+    ag.avancar(serie.fim + FOLGA_FINAL_SEC if duracao is None else duracao)
+    ag.parar()
+    return linha
+
+
+def _hms(t: float) -> str:
+    t = int(round(t))
+    return f"+{t // 3600:02d}:{t % 3600 // 60:02d}:{t % 60:02d}"
+
+
+def formatar_linha_do_tempo(linha: Sequence[Dict]) -> str:
+    out = []
+    for ev in linha:
+        extras = " ".join(
+            f"{k}={P1._fmt_num(v, 2) if isinstance(v, float) else v}" for k, v in ev.items() if k not in ("t", "evento", "nivel")
+        )
+        out.append(f"{_hms(ev['t'])}  {ev['evento']:<13} L{ev.get('nivel', '-')}  {extras}".rstrip())
+    return "\n".join(out)
+
+
+def _parse_roteiro(txt: str) -> Serie:
+    trechos = []
+    for item in txt.split(","):
+        dur, pitch, roll = (float(x) for x in item.split(":"))
+        trechos.append((dur, pitch, roll))
+    return roteiro(trechos)
+
+
+def _parse_mute(txt: str) -> Tuple[float, float]:
+    ini, fim = txt.split(":")
+    return float(ini), float(fim)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Simulação determinística das regras de alarme (sem áudio, sem rede)")
+    ap.add_argument("serie", nargs="?", help="arquivo .json/.csv/.log (linhas SNAP) com t;pitch;roll")
+    ap.add_argument("--roteiro", help='trechos "dur:pitch:roll,..." em sequência, p.ex. "60:0:0,120:2.3:0"')
+    ap.add_argument("--modo", choices=("dupla", "rajada"), default=None, help="padrão: %s" % P5.ALARM_CONFIRM_MODO)
+    ap.add_argument("--ciclo", type=float, default=P1.COLETA_INTERVAL, help="intervalo do loop (s)")
+    ap.add_argument("--mute", action="append", type=_parse_mute, default=[], metavar="INI:FIM", help="janela de mute L2/L3 (s)")
+    ap.add_argument("--json", action="store_true", help="linha do tempo em JSON")
+    a = ap.parse_args(argv)
+    if not a.serie and not a.roteiro:
+        ap.error("informe um arquivo de série ou --roteiro")
+
+    serie = _parse_roteiro(a.roteiro) if a.roteiro else carregar_serie(a.serie)
+    t0 = time.perf_counter()
+    linha = simular(serie, ciclo=a.ciclo, modo=a.modo, mutes=a.mute)
+    real_ms = (time.perf_counter() - t0) * 1000.0
+
+    if a.json:
+        print(json.dumps({"simulado_s": serie.fim, "real_ms": round(real_ms, 1), "linha": linha}, indent=2, ensure_ascii=False))
+    else:
+        print(formatar_linha_do_tempo(linha))
+        tocados = sum(1 for ev in linha if ev["evento"] == "PLAY")
+        suprimidos = sum(1 for ev in linha if ev["evento"] == "SUPPRESS")
+        print(f"-- {_hms(serie.fim)} simulados em {real_ms:.1f} ms: {tocados} alarmes, {suprimidos} supressões")
+    return 0
+
+
+__all__ = [
+    "Serie",
+    "roteiro",
+    "carregar_serie",
+    "simular",
+    "formatar_linha_do_tempo",
+    "main",
+]
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Aquisição + avaliação (no loop ou num processo separado) e o anel de memória compartilhada entre os dois processos."""
+
+from __future__ import annotations
+
+import json
+import os
+import struct
+import time
+from typing import Dict, Optional, Tuple
+
+import _metrics as M
+import _part1 as P1
+import _part2 as P2
+import _part4 as P4
+import _part5 as P5
+
+CAPACIDADE = 64  # leituras no anel (~10 min a 9 s)
+SLOT_BYTES = 4096  # por leitura (cabeçalho + JSON do est, ~700 bytes)
+SPANS_MAX = 32  # spans do ciclo do filho por leitura (cabem com folga no slot)
+REINICIO_MIN_SEC = 30.0  # entre tentativas de subir de novo o processo que caiu
+PARADA_SEC = 0.2  # espera o processo sair sozinho antes do terminate()
+
+_CAB = struct.Struct("<Q")  # seq da última leitura publicada
+_SLOT = struct.Struct("<QdI")  # seq (0 = sendo escrito), epoch, bytes do JSON
+
+RING_SKIPPED = M.counter("lite2_acquisition_ring_skipped_total", "Leituras do anel puladas porque o consumidor atrasou")
+PROC_RESTARTS = M.counter("lite2_acquisition_process_restarts_total", "Vezes que o processo de aquisição foi reiniciado")
+
+
+def coletar_merged() -> Optional[Dict]:
+    """pitch/roll + vento (com fallback) mesclados, com spans no ciclo aberto do P1.CICLOS."""
+    span = P1.CICLOS.span
+    with span("pitch_roll"):
+        d_pr = P1.coletar_json(P1.URL_SMP_PITCH_ROLL)
+    with span("vento"):
+        d_wind = P2.coletar_wind_com_fallback()
+    with span("merge"):
+        return P5.merge_dados(d_pr, d_wind)
+
+
+# =========================================================
+# Anel em memória compartilhada
+# =========================================================
+class AnelCompartilhado:
+    """
+    Um escritor (processo de aquisição), leitores em outro processo.
+
+    - Layout: [seq da última leitura][slot 0]...[slot N-1]; o slot de
+      `seq` é `seq % capacidade` e guarda (seq, epoch, tamanho, JSON).
+    - Escrita estilo seqlock: zera o seq do slot, grava o corpo, grava o
+      seq e só então o seq global. O leitor confere o seq do slot antes e
+      depois de copiar o corpo; se mudou, a leitura foi sobrescrita
+      (None). Sem locks entre processos; vale com a ordem de escrita do
+      x86 (os PCs do passadiço).
+    - Quem cria (`nome=None`) é o dono e faz o unlink no `fechar()`.
+    """
+
+    def __init__(self, nome: Optional[str] = None, capacidade: int = CAPACIDADE, slot_bytes: int = SLOT_BYTES):
+        from multiprocessing import shared_memory
+
+        self.capacidade = int(capacidade)
+        self.slot_bytes = int(slot_bytes)
+        self.dono = nome is None
+        tamanho = _CAB.size + self.capacidade * self.slot_bytes
+        self.shm = shared_memory.SharedMemory(name=nome, create=self.dono, size=tamanho if self.dono else 0)
+        if self.dono:
+            _CAB.pack_into(self.shm.buf, 0, 0)
+
+    @property
+    def nome(self) -> str:
+        return self.shm.name
+
+    def _off(self, seq: int) -> int:
+        return _CAB.size + (seq % self.capacidade) * self.slot_bytes
+
+    def ultimo(self) -> int:
+        return _CAB.unpack_from(self.shm.buf, 0)[0]
+
+    def publicar(self, leitura: Dict) -> int:
+        corpo = json.dumps(leitura, separators=(",", ":")).encode("utf-8")
+        if len(corpo) > self.slot_bytes - _SLOT.size:
+            raise ValueError("leitura com %d bytes não cabe no slot (%d)" % (len(corpo), self.slot_bytes))
+        buf = self.shm.buf
+        seq = self.ultimo() + 1
+        off = self._off(seq)
+        _SLOT.pack_into(buf, off, 0, 0.0, 0)
+        buf[off + _SLOT.size : off + _SLOT.size + len(corpo)] = corpo
+        _SLOT.pack_into(buf, off, seq, time.time(), len(corpo))
+        _CAB.pack_into(buf, 0, seq)
+        return seq
+
+    def ler(self, seq: int) -> Optional[Tuple[float, Dict]]:
+        """(epoch, leitura) de `seq`; None se ainda não existe ou já foi sobrescrita."""
+        buf = self.shm.buf
+        off = self._off(seq)
+        s1, epoch, n = _SLOT.unpack_from(buf, off)
+        if s1 != seq or n > self.slot_bytes - _SLOT.size:
+            return None
+        corpo = bytes(buf[off + _SLOT.size : off + _SLOT.size + n])
+        if _SLOT.unpack_from(buf, off)[0] != seq:
+            return None
+        return epoch, json.loads(corpo)
+
+    def fechar(self) -> None:
+        try:
+            self.shm.close()
+            if self.dono:
+                self.shm.unlink()
+        except (FileNotFoundError, BufferError):
+            pass
+
+
+# =========================================================
+# Processo de aquisição
+# =========================================================
+def _rodar_processo(nome, capacidade, slot_bytes, intervalo, parar, novo, pref) -> None:
+    """
+    Alvo do processo filho: coleta, avalia e publica uma leitura a cada
+    `intervalo` s até `parar`. Cada leitura leva o `trabalho_ms` e os
+    spans do ciclo do filho, para o /debug/cycles do principal.
+    """
+    import signal
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C é do processo principal
+    P1._setup_logging(retencao=False)
+    P1.APP.marcar("logging")
+    P1.APP.iniciar(("saida", "http"))  # sem áudio: alarme e voz ficam no principal
+    anel = AnelCompartilhado(nome, capacidade, slot_bytes)
+    P1.log.info("Aquisição em processo separado (pid %d)", os.getpid())
+    try:
+        while not parar.is_set():
+            t0 = time.monotonic()
+            ciclo = P1.CICLOS.iniciar()
+            P1.WIND_PREF = pref.value.decode("utf-8") or None
+            dados = coletar_merged()
+            est = None
+            if dados:
+                with P1.CICLOS.span("avaliar"):
+                    est = P4.avaliar_de_json(dados)
+            if dados and P1.HISTORICO_GRAVAR:
+                import _backtest
+
+                with P1.CICLOS.span("historico"):
+                    _backtest.gravar_leitura(dados)
+            P1.CICLOS.fechar()
+            spans = [[p, round(i, 4), round(d, 4)] for p, i, d in ciclo.spans[:SPANS_MAX]]
+            anel.publicar({"dados": est is not None, "est": est, "trabalho_ms": round((time.monotonic() - t0) * 1000.0, 1), "spans": spans})
+            novo.set()
+            parar.wait(max(0.0, intervalo - (time.monotonic() - t0)))
+    except Exception:
+        P1.log.exception("Processo de aquisição caiu")
+    finally:
+        anel.fechar()
+
+
+class AquisicaoEmProcesso:
+    """
+    Lado do processo principal (--aquisicao processo): cria o anel, sobe o
+    processo filho (spawn) e entrega as leituras ao run_monitor.
+
+    - `proxima(timeout)` devolve a leitura mais nova ainda não entregue;
+      se o consumidor atrasou, as intermediárias são puladas (contadas em
+      RING_SKIPPED). None no timeout ou na parada.
+    - Cada leitura traz `trabalho_ms` e `spans` do ciclo do filho; o
+      run_monitor anexa os spans ao seu ciclo (`RegistroCiclos.anexar`).
+    - A preferência de host de vento do painel vai ao filho por
+      `preferencia()` (array compartilhado).
+    - Se o filho morrer, `proxima()` sobe outro (no máximo a cada
+      REINICIO_MIN_SEC); o anel continua o mesmo.
+    """
+
+    def __init__(self, intervalo: Optional[float] = None, capacidade: int = CAPACIDADE, slot_bytes: int = SLOT_BYTES):
+        import multiprocessing
+
+        self._ctx = multiprocessing.get_context("spawn")
+        self.intervalo = float(P1.COLETA_INTERVAL if intervalo is None else intervalo)
+        self.anel = AnelCompartilhado(None, capacidade, slot_bytes)
+        self._parar = self._ctx.Event()
+        self._novo = self._ctx.Event()
+        self._pref = self._ctx.Array("c", 64)
+        self._proc = None
+        self._lido = 0
+        self._ultimo_inicio = 0.0
+        self._fechado = False
+
+    def iniciar(self) -> None:
+        import atexit
+
+        self._subir()
+        atexit.register(self.parar)  # roda antes do atexit do multiprocessing (LIFO)
+
+    def _subir(self) -> None:
+        self._ultimo_inicio = time.monotonic()
+        self._proc = self._ctx.Process(
+            target=_rodar_processo,
+            args=(self.anel.nome, self.anel.capacidade, self.anel.slot_bytes, self.intervalo, self._parar, self._novo, self._pref),
+            name="lite2-aquisicao",
+            daemon=True,
+        )
+        self._proc.start()
+
+    def vivo(self) -> bool:
+        return self._proc is not None and self._proc.is_alive()
+
+    def preferencia(self, host: Optional[str]) -> None:
+        v = (host or "").encode("utf-8")[:63]
+        if self._pref.value != v:
+            self._pref.value = v
+
+    def proxima(self, timeout: float) -> Optional[Tuple[int, float, Dict]]:
+        fim = time.monotonic() + timeout
+        while True:
+            ult = self.anel.ultimo()
+            if ult > self._lido:
+                if ult - self._lido > 1 and self._lido:
+                    RING_SKIPPED.inc(ult - self._lido - 1)
+                self._lido = ult
+                r = self.anel.ler(ult)
+                if r is not None:
+                    return ult, r[0], r[1]
+            resto = fim - time.monotonic()
+            if resto <= 0 or P1.STOP_EVENT.is_set():
+                if not self.vivo() and not P1.STOP_EVENT.is_set() and time.monotonic() - self._ultimo_inicio >= REINICIO_MIN_SEC:
+                    P1.log.warning("Processo de aquisição não está vivo; subindo outro.")
+                    P1.log_event("ACQ_RESTART", exitcode=self._proc.exitcode if self._proc else None)
+                    PROC_RESTARTS.inc()
+                    self._subir()
+                return None
+            self._novo.wait(min(resto, 0.25))
+            self._novo.clear()
+
+    def parar(self) -> None:
+        """Pede a parada, espera PARADA_SEC, termina se preciso e remove o anel (idempotente)."""
+        if self._fechado:
+            return
+        self._fechado = True
+        self._parar.set()
+        if self._proc is not None:
+            self._proc.join(PARADA_SEC)
+            if self._proc.is_alive():
+                self._proc.terminate()
+                self._proc.join(PARADA_SEC)
+        self.anel.fechar()
+
+
+__all__ = [
+    "CAPACIDADE",
+    "SLOT_BYTES",
+    "coletar_merged",
+    "AnelCompartilhado",
+    "AquisicaoEmProcesso",
+]
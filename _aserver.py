@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Servidor de controle/painel em asyncio (1 thread, keep-alive, limite de conexões)."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from http import HTTPStatus
+from typing import Dict, Optional, Set
+
+import _part1 as P1
+import _part5 as P5
+
+MAX_HEADER_BYTES = 16 * 1024  # cabeçalho maior que isso -> 431 e fecha; corpo maior -> 413 e fecha
+MAX_REQS_POR_CONEXAO = 1000  # recicla conexões keep-alive muito longas
+ESPERA_VAGA_SEC = 5.0  # quanto uma conexão aguarda vaga antes do 503
+
+
+def _status_line(code: int) -> bytes:
+    try:
+        reason = HTTPStatus(code).phrase
+    except ValueError:
+        reason = ""
+    return f"HTTP/1.1 {code} {reason}\r\n".encode("latin-1")
+
+
+class AsyncControlServer:
+    """
+    Mesmas rotas do _ControlHandler (via P5._rotear_get_seguro), mas num único
+    event loop em uma thread daemon.
+
+    - keep-alive HTTP/1.1 com timeout de ociosidade (CONTROL_KEEPALIVE_SEC)
+    - no máximo `max_conns` conexões atendidas ao mesmo tempo; as demais
+      esperam vaga até ESPERA_VAGA_SEC e então recebem 503
+    - back-pressure na escrita via `writer.drain()`
+
+    Expõe `server_address`, `shutdown()` e `server_close()` como o
+    ThreadingHTTPServer, para o restante do código tratar os dois igual.
+    """
+
+    def __init__(self, port: int, max_conns: int = P1.CONTROL_MAX_CONNS, keepalive_sec: float = P1.CONTROL_KEEPALIVE_SEC):
+        self.host = "127.0.0.1"
+        self.port = int(port)
+        self.max_conns = max(1, int(max_conns))
+        self.keepalive_sec = float(keepalive_sec)
+        self.server_address = (self.host, self.port)
+
+        self.conexoes_ativas = 0
+        self.conexoes_recusadas = 0
+        self.requisicoes = 0
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._erro: Optional[BaseException] = None
+
+    # -----------------------------------------------------
+    # ciclo de vida
+    # -----------------------------------------------------
+    def start(self) -> bool:
+        self._thread = threading.Thread(target=self._run, name="lite2-aserver", daemon=True)
+        self._thread.start()
+        self._ready.wait(5.0)
+        return self._server is not None and self._erro is None
+
+    def _run(self) -> None:
+        loop = asyncio.new_event_loop()
+        self._loop = loop
+        asyncio.set_event_loop(loop)
+        try:
+            self._sem = asyncio.Semaphore(self.max_conns)
+            self._server = loop.run_until_complete(
+                asyncio.start_server(self._atender, self.host, self.port, limit=MAX_HEADER_BYTES)
+            )
+            sock = self._server.sockets[0]
+            self.server_address = sock.getsockname()[:2]
+        except BaseException as exc:
+            self._erro = exc
+            self._server = None
+            self._ready.set()
+            loop.close()
+            return
+
+        self._ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            try:
+                loop.run_until_complete(loop.shutdown_asyncgens())
+            except Exception:
+                pass
+            loop.close()
+
+    def shutdown(self) -> None:
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+
+        async def _parar():
+            if self._server is not None:
+                self._server.close()
+            for t in list(self._tasks):
+                t.cancel()
+            if self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+            if self._server is not None:
+                await self._server.wait_closed()
+            asyncio.get_running_loop().stop()
+
+        try:
+            asyncio.run_coroutine_threadsafe(_parar(), loop)
+        except RuntimeError:
+            return
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(5.0)
+
+    def server_close(self) -> None:
+        # compat com socketserver: o socket já é fechado em shutdown()
+        return
+
+    # -----------------------------------------------------
+    # conexão
+    # -----------------------------------------------------
+    async def _atender(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        if task is not None:
+            self._tasks.add(task)
+        try:
+            try:
+                await asyncio.wait_for(self._sem.acquire(), ESPERA_VAGA_SEC)
+            except asyncio.TimeoutError:
+                self.conexoes_recusadas += 1
+                await self._escrever(writer, P5._resp_json({"ok": False, "error": "busy"}, 503), None, manter=False)
+                return
+
+            self.conexoes_ativas += 1
+            try:
+                await self._loop_requisicoes(reader, writer)
+            finally:
+                self.conexoes_ativas -= 1
+                self._sem.release()
+        except (asyncio.CancelledError, *P5._CLIENT_ABORT_EXC):
+            pass
+        except Exception:
+            P1.log.debug("Falha no servidor asyncio", exc_info=True)
+        finally:
+            if task is not None:
+                self._tasks.discard(task)
+            try:
+                writer.close()
+            except Exception:
+                pass
+
+    async def _loop_requisicoes(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        for n in range(1, MAX_REQS_POR_CONEXAO + 1):
+            try:
+                head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.keepalive_sec)
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+                return
+            except asyncio.LimitOverrunError:
+                await self._escrever(writer, P5._resp_json({"ok": False, "error": "header_too_large"}, 431), None, manter=False)
+                return
+
+            linhas = head.decode("latin-1").split("\r\n")
+            try:
+                metodo, alvo, versao = linhas[0].split(" ", 2)
+            except ValueError:
+                await self._escrever(writer, P5._resp_json({"ok": False, "error": "bad_request"}, 400), None, manter=False)
+                return
+
+            headers: Dict[str, str] = {}
+            for li in linhas[1:]:
+                if ":" in li:
+                    k, v = li.split(":", 1)
+                    headers[k.strip().lower()] = v.strip()
+
+            # GET não deveria ter corpo; se vier, descarta para não dessincronizar
+            try:
+                tamanho = int(headers.get("content-length", "0") or 0)
+            except ValueError:
+                tamanho = 0
+            if tamanho > 0:
+                if tamanho > MAX_HEADER_BYTES:
+                    # não vale ler o corpo: responde e fecha sem consumir o resto
+                    await self._escrever(writer, P5._resp_json({"ok": False, "error": "payload_too_large"}, 413), None, manter=False)
+                    return
+                await reader.readexactly(tamanho)
+
+            conn_hdr = headers.get("connection", "").lower()
+            if versao.upper() == "HTTP/1.0":
+                manter = conn_hdr == "keep-alive"
+            else:
+                manter = conn_hdr != "close"
+            if n == MAX_REQS_POR_CONEXAO:
+                manter = False  # avisa o cliente antes de reciclar a conexão
+
+            self.requisicoes += 1
+            if metodo.upper() == "GET":
+                resp = P5._rotear_get_seguro(alvo)
+            else:
+                resp = P5._resp_json({"ok": False, "error": "method_not_allowed"}, 501)
+
+            await self._escrever(writer, resp, headers.get("accept-encoding"), manter)
+            if not manter:
+                return
+
+    async def _escrever(self, writer: asyncio.StreamWriter, resp, accept_encoding: Optional[str], manter: bool) -> None:
+        corpo, headers = resp.corpo_e_cabecalhos(accept_encoding)
+        partes = [_status_line(resp.code)]
+        for k, v in headers:
+            partes.append(f"{k}: {v}\r\n".encode("latin-1"))
+        if manter:
+            partes.append(f"Connection: keep-alive\r\nKeep-Alive: timeout={int(self.keepalive_sec)}\r\n\r\n".encode("latin-1"))
+        else:
+            partes.append(b"Connection: close\r\n\r\n")
+        partes.append(corpo)
+        writer.write(b"".join(partes))
+        await writer.drain()
+
+
+def start_async_control_server(port: int = P1.MUTE_CTRL_PORT, max_conns: Optional[int] = None):
+    """Sobe o AsyncControlServer em thread própria; devolve o servidor ou None."""
+    srv = AsyncControlServer(port, max_conns=max_conns or P1.CONTROL_MAX_CONNS)
+    if not srv.start():
+        P1.log.warning("Falha ao subir servidor asyncio na porta %s", port, exc_info=srv._erro)
+        return None
+    return srv
+
+
+__all__ = [
+    "AsyncControlServer",
+    "start_async_control_server",
+]
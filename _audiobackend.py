@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Backends de áudio: pygame (real), null (durações simuladas) e recording (carimba cada play)."""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+import wave
+from typing import Any, Dict, List, Optional, Tuple
+
+CANAIS = ("voz", "beep", "vento")
+FORMATO_PADRAO = (44100, 2, 2)  # freq, bytes por amostra, canais (= mixer do pygame)
+DURACAO_PADRAO_SEC = 1.0  # null: quando não dá para ler a duração do arquivo
+
+# LITE2_AUDIO=pygame|null|recording escolhe o backend na inicialização
+AUDIO_BACKEND_ENV = "LITE2_AUDIO"
+
+
+class AudioBackend:
+    """
+    Interface usada pelo _part1:
+    - `iniciar()` -> bool; depois dele `canais` (nome -> canal) e `formato`
+    - canal: set_volume(v), play(som), stop(), get_busy()
+    - som: get_length() em segundos
+    - `carregar(path)`, `de_pcm(bytes)`, `para_pcm(som)` para o SoundBank/compositor
+    - `encerrar()`
+
+    A espera pelo fim do clip fica no _part1 (prazo = play + get_length()),
+    igual para qualquer backend. Esta classe base é o "sem áudio".
+    """
+
+    nome = "off"
+
+    def __init__(self, log=None):
+        self.log = log
+        self.canais: Dict[str, Any] = {}
+        self.formato: Optional[Tuple[int, int, int]] = None
+
+    def iniciar(self) -> bool:
+        return False
+
+    def carregar(self, path: str):
+        return None
+
+    def de_pcm(self, raw: bytes):
+        return None
+
+    def para_pcm(self, som) -> bytes:
+        return b""
+
+    def encerrar(self) -> None:
+        self.canais = {}
+
+
+# =========================================================
+# pygame
+# =========================================================
+class PygameBackend(AudioBackend):
+    nome = "pygame"
+
+    def __init__(self, pygame_mod, log=None):
+        super().__init__(log)
+        self.pygame = pygame_mod
+
+    def iniciar(self) -> bool:
+        if self.pygame is None:
+            if self.log:
+                self.log.info("Pygame não encontrado; seguindo sem áudio.")
+            return False
+        try:
+            self.pygame.mixer.init(frequency=FORMATO_PADRAO[0], size=-8 * FORMATO_PADRAO[1], channels=FORMATO_PADRAO[2])
+            self.pygame.mixer.set_num_channels(4)
+            self.canais = {name: self.pygame.mixer.Channel(i) for i, name in enumerate(CANAIS)}
+            freq, size, canais = self.pygame.mixer.get_init()
+            self.formato = (freq, abs(size) // 8, canais)
+            return True
+        except Exception:
+            if self.log:
+                self.log.warning("Falha ao inicializar áudio; seguindo sem áudio.", exc_info=True)
+            self.canais = {}
+            return False
+
+    def carregar(self, path: str):
+        return self.pygame.mixer.Sound(path)
+
+    def de_pcm(self, raw: bytes):
+        return self.pygame.mixer.Sound(buffer=raw)
+
+    def para_pcm(self, som) -> bytes:
+        return som.get_raw()
+
+    def encerrar(self) -> None:
+        self.canais = {}
+        if self.pygame is not None:
+            self.pygame.mixer.quit()
+
+
+# =========================================================
+# null: nada sai na placa, mas os tempos são os dos clips
+# =========================================================
+class SomSimulado:
+    __slots__ = ("nome", "duracao", "escala")
+
+    def __init__(self, nome: str, duracao: float, escala: float = 1.0):
+        self.nome = nome
+        self.duracao = duracao  # duração real do clip
+        self.escala = escala
+
+    def get_length(self) -> float:
+        return self.duracao * self.escala
+
+
+class CanalSimulado:
+    def __init__(self, nome: str, backend: "NullBackend"):
+        self.nome = nome
+        self.backend = backend
+        self.volume = 1.0
+        self._fim = 0.0
+
+    def set_volume(self, v: float) -> None:
+        self.volume = float(v)
+
+    def play(self, som) -> None:
+        self._fim = time.monotonic() + som.get_length()
+        self.backend._ao_tocar(self, som)
+
+    def stop(self) -> None:
+        self._fim = 0.0
+
+    def get_busy(self) -> bool:
+        return time.monotonic() < self._fim
+
+
+class NullBackend(AudioBackend):
+    """
+    Sem placa de som (CI, Linux headless). Duração de cada som vem do
+    cabeçalho WAV; `escala` encurta/alonga tudo (0.01 = 100x mais rápido).
+    """
+
+    nome = "null"
+
+    def __init__(self, log=None, escala: float = 1.0, formato: Tuple[int, int, int] = FORMATO_PADRAO):
+        super().__init__(log)
+        self.escala = escala
+        self._formato_fixo = formato
+
+    def iniciar(self) -> bool:
+        self.formato = self._formato_fixo
+        self.canais = {nm: CanalSimulado(nm, self) for nm in CANAIS}
+        return True
+
+    def _bytes_por_seg(self) -> int:
+        freq, largura, canais = self.formato or self._formato_fixo
+        return freq * largura * canais
+
+    def carregar(self, path: str):
+        nome = os.path.splitext(os.path.basename(path))[0]
+        try:
+            with wave.open(path, "rb") as w:
+                dur = w.getnframes() / float(w.getframerate() or 1)
+        except (wave.Error, EOFError, OSError):
+            dur = DURACAO_PADRAO_SEC
+        return SomSimulado(nome, dur, self.escala)
+
+    def de_pcm(self, raw: bytes):
+        return SomSimulado("pcm", len(raw) / float(self._bytes_por_seg()), self.escala)
+
+    def para_pcm(self, som) -> bytes:
+        n = int(som.duracao * self._bytes_por_seg())
+        return bytes(n - n % 2)
+
+    def _ao_tocar(self, canal: CanalSimulado, som) -> None:
+        pass
+
+
+class RecordingBackend(NullBackend):
+    """Null que guarda (perf_counter, canal, som, volume, duração) de cada play()."""
+
+    nome = "recording"
+
+    def __init__(self, log=None, escala: float = 1.0, formato: Tuple[int, int, int] = FORMATO_PADRAO):
+        super().__init__(log, escala, formato)
+        self.registros: List[Dict[str, Any]] = []
+        self._cond = threading.Condition()
+
+    def _ao_tocar(self, canal: CanalSimulado, som) -> None:
+        reg = {
+            "t": time.perf_counter(),
+            "canal": canal.nome,
+            "som": getattr(som, "nome", "?"),
+            "volume": canal.volume,
+            "duracao": round(getattr(som, "duracao", 0.0), 4),
+        }
+        with self._cond:
+            self.registros.append(reg)
+            self._cond.notify_all()
+
+    def esperar_play(self, depois_de: float, timeout: float) -> Optional[Dict[str, Any]]:
+        """Primeiro play com t >= depois_de (perf_counter), ou None no timeout."""
+        limite = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                for reg in self.registros:
+                    if reg["t"] >= depois_de:
+                        return reg
+                resta = limite - time.monotonic()
+                if resta <= 0:
+                    return None
+                self._cond.wait(resta)
+
+    def limpar(self) -> None:
+        with self._cond:
+            self.registros.clear()
+
+
+def criar_backend(nome: Optional[str], pygame_mod=None, log=None) -> AudioBackend:
+    nome = (nome or "pygame").strip().lower()
+    if nome == "null":
+        return NullBackend(log)
+    if nome == "recording":
+        return RecordingBackend(log)
+    if nome != "pygame" and log:
+        log.warning("%s=%s desconhecido; usando pygame.", AUDIO_BACKEND_ENV, nome)
+    return PygameBackend(pygame_mod, log)
+
+
+__all__ = [
+    "AUDIO_BACKEND_ENV",
+    "AudioBackend",
+    "PygameBackend",
+    "NullBackend",
+    "RecordingBackend",
+    "SomSimulado",
+    "criar_backend",
+]
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Fila de áudio com prioridade: um worker toca as sequências, fora do loop de monitoramento."""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+import _metrics as M
+
+AUDIO_PREEMPTED = M.counter("lite2_audio_preempted_total", "Sequências de áudio interrompidas por outra de prioridade maior", ("seq",))
+AUDIO_DROPPED = M.counter("lite2_audio_dropped_total", "Pedidos de áudio descartados antes de tocar", ("seq", "reason"))
+
+
+class PedidoAudio:
+    """Um pedido na fila. `aguardar()` bloqueia até tocar, ser descartado ou interrompido."""
+
+    __slots__ = ("nome", "prioridade", "seq", "prazo", "resultado", "motivo", "_feito")
+
+    def __init__(self, nome: str, prioridade: int, seq: Callable[[], None], prazo: float):
+        self.nome = nome
+        self.prioridade = prioridade
+        self.seq = seq
+        self.prazo = prazo  # monotonic; depois disso o pedido não toca mais
+        self.resultado: Optional[bool] = None
+        self.motivo = "pendente"
+        self._feito = threading.Event()
+
+    def _finalizar(self, ok: bool, motivo: str) -> None:
+        self.resultado, self.motivo = ok, motivo
+        self._feito.set()
+
+    def aguardar(self, timeout: Optional[float] = None) -> Optional[bool]:
+        self._feito.wait(timeout)
+        return self.resultado
+
+
+class AudioDispatcher:
+    """
+    - `enviar()` só enfileira e volta na hora; um worker daemon toca um pedido
+      por vez, sempre o de maior prioridade (empate: o mais antigo).
+    - Pedido com prioridade maior que o que está tocando o interrompe:
+      `interromper` é setado e `parar()` corta os canais; as sequências
+      consultam `interromper` entre um clip e outro e saem.
+    - Um pedido novo com o mesmo nome substitui o que ainda está na fila se
+      tiver prioridade igual ou maior; se for menor (p.ex. L2 atrás de um
+      L5, ambos "pitch_roll"), o novo é que é descartado.
+    - Pedido que passou do prazo (`validade_s`) antes de tocar é descartado.
+
+    `executar(seq, nome, timeout_s) -> bool` é o run_audio_sequence, então quem
+    chama run_audio_sequence direto continua serializado com o worker.
+    """
+
+    def __init__(self, executar: Callable[[Callable[[], None], str, float], bool], parar: Callable[[], None], log=None):
+        self._executar = executar
+        self._parar = parar
+        self.log = log
+        self.interromper = threading.Event()
+        self._cond = threading.Condition()
+        self._fila: List[Tuple[int, int, PedidoAudio]] = []
+        self._ordem = itertools.count()
+        self._atual: Optional[PedidoAudio] = None
+        self._thread: Optional[threading.Thread] = None
+        self._fechado = False
+
+    # -----------------------------------------------------
+    # API
+    # -----------------------------------------------------
+    def enviar(self, seq: Callable[[], None], nome: str, prioridade: int, validade_s: float = 7.0) -> PedidoAudio:
+        pedido = PedidoAudio(nome, prioridade, seq, time.monotonic() + validade_s)
+        interromper = None
+        with self._cond:
+            if self._fechado:
+                pedido._finalizar(False, "closed")
+                return pedido
+
+            antigos = [p for _, _, p in self._fila if p.nome == nome]
+            if any(p.prioridade > prioridade for p in antigos):
+                pedido._finalizar(False, "lower_priority")
+                AUDIO_DROPPED.inc(seq=nome, reason="lower_priority")
+                return pedido
+            if antigos:
+                self._fila = [it for it in self._fila if it[2].nome != nome]
+                heapq.heapify(self._fila)
+                for p in antigos:
+                    p._finalizar(False, "replaced")
+                    AUDIO_DROPPED.inc(seq=nome, reason="replaced")
+
+            heapq.heappush(self._fila, (-prioridade, next(self._ordem), pedido))
+            atual = self._atual
+            if atual is not None and prioridade > atual.prioridade and not self.interromper.is_set():
+                self.interromper.set()
+                interromper = atual
+            self._garantir_worker()
+            self._cond.notify()
+
+        if interromper is not None:
+            AUDIO_PREEMPTED.inc(seq=interromper.nome)
+            if self.log:
+                self.log.info("AudioSeq %s interrompido por %s (prioridade %s > %s)", interromper.nome, nome, prioridade, interromper.prioridade)
+            self._parar()
+        return pedido
+
+    def pendentes(self) -> int:
+        with self._cond:
+            return len(self._fila)
+
+    def tocando(self) -> Optional[str]:
+        atual = self._atual
+        return atual.nome if atual is not None else None
+
+    def fechar(self, timeout: float = 1.0) -> None:
+        """Descarta a fila, interrompe o que estiver tocando e encerra o worker."""
+        with self._cond:
+            self._fechado = True
+            fila, self._fila = self._fila, []
+            self.interromper.set()
+            self._cond.notify_all()
+        for _, _, p in fila:
+            p._finalizar(False, "closed")
+        self._parar()
+        t = self._thread
+        if t is not None and t is not threading.current_thread():
+            t.join(timeout)
+
+    # -----------------------------------------------------
+    # worker
+    # -----------------------------------------------------
+    def _garantir_worker(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._loop, name="lite2-audio", daemon=True)
+            self._thread.start()
+
+    def _proximo(self) -> Optional[PedidoAudio]:
+        with self._cond:
+            while True:
+                while not self._fila and not self._fechado:
+                    self._cond.wait()
+                if self._fechado:
+                    return None
+                _, _, pedido = heapq.heappop(self._fila)
+                if time.monotonic() >= pedido.prazo:
+                    pedido._finalizar(False, "expired")
+                    AUDIO_DROPPED.inc(seq=pedido.nome, reason="expired")
+                    continue
+                self._atual = pedido
+                self.interromper.clear()
+                return pedido
+
+    def _loop(self) -> None:
+        while True:
+            pedido = self._proximo()
+            if pedido is None:
+                return
+            ok = False
+            try:
+                ok = bool(self._executar(pedido.seq, pedido.nome, max(0.1, pedido.prazo - time.monotonic())))
+            except Exception:
+                if self.log:
+                    self.log.warning("Erro na sequência de áudio %s", pedido.nome, exc_info=True)
+            with self._cond:
+                interrompido = self.interromper.is_set()
+                self._atual = None
+                self.interromper.clear()
+            if interrompido:
+                pedido._finalizar(False, "preempted")
+            else:
+                pedido._finalizar(ok, "ok" if ok else "timeout")
+
+
+__all__ = [
+    "PedidoAudio",
+    "AudioDispatcher",
+]
@@ -0,0 +1,473 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Backtest: histórico -> métrica da janela, classificação e regras de alarme, para vários conjuntos de parâmetros."""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import itertools
+import json
+import os
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import _alarmsim as AS
+import _part1 as P1
+import _part2 as P2
+import _part4 as P4
+import _part5 as P5
+
+# parâmetros que um conjunto pode sobrescrever (módulo onde moram)
+PARAMS = {
+    "L2_LEVELS": P1,
+    "L3_LEVELS": P1,
+    "L4_LEVELS": P1,
+    "L5_LEVELS": P1,
+    "OFFSET_L4": P1,
+    "OFFSET_L5": P1,
+    "FATOR_CORRECAO_PITCH": P1,
+    "FATOR_CORRECAO_ROLL": P1,
+    "AA_PITCH": P1,
+    "AA_ROLL": P1,
+    "HTML_WIN_PITCH": P1,
+    "HTML_WIN_ROLL": P1,
+    "ALARM_SILENCE_SEC": P5,
+}
+_NIVEIS = ("L2_LEVELS", "L3_LEVELS", "L4_LEVELS", "L5_LEVELS")
+
+PICO_NIVEL_PADRAO = 3  # episódio de referência: nível combinado >= isto com os parâmetros atuais
+PICO_FOLGA_SEC = 60.0  # alarme até este tempo depois do fim do episódio ainda conta
+BURACO_CICLOS = 3.0  # intervalo maior que isto (em ciclos) não entra no tempo em nível
+
+
+# =========================================================
+# Histórico
+# =========================================================
+class Historico:
+    """
+    Leituras em ordem de tempo (t relativo à primeira). Guarda a janela
+    bruta (ptchwnd/rollwnd) quando o arquivo tem, senão só max+min.
+
+    O custo por conjunto de parâmetros fica no (max + min) de cada janela,
+    que não depende de fator/AA/limiares: é calculado uma vez por tamanho
+    de janela e reaproveitado; cada conjunto faz só (s + aa) * fator.
+    """
+
+    def __init__(self, ts: Sequence[float], janelas=None, somas=None, origem: str = ""):
+        self.ts: List[float] = list(ts)
+        self._janelas = janelas  # [(pitch[], roll[]), ...] ou None
+        self._somas_fixas = somas  # [(s_pitch, s_roll), ...] quando não há janela
+        self._cache: Dict[Tuple[int, int], Tuple[list, list]] = {}
+        self.origem = origem
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    @property
+    def tem_janelas(self) -> bool:
+        return self._janelas is not None
+
+    def ciclo(self) -> float:
+        """Mediana dos intervalos entre leituras (o ciclo em que o histórico foi gravado)."""
+        dts = [b - a for a, b in zip(self.ts, self.ts[1:]) if b > a]
+        return statistics.median(dts) if dts else float(P1.COLETA_INTERVAL)
+
+    def somas(self, n_pitch: int, n_roll: int) -> Tuple[List[Optional[float]], List[Optional[float]]]:
+        """max+min das últimas n amostras de cada janela (None = janela vazia)."""
+        if self._janelas is None:
+            return [s[0] for s in self._somas_fixas], [s[1] for s in self._somas_fixas]
+        chave = (int(n_pitch), int(n_roll))
+        if chave not in self._cache:
+            sp, sr = [], []
+            for pw, rw in self._janelas:
+                sp.append(_max_mais_min(pw, chave[0]))
+                sr.append(_max_mais_min(rw, chave[1]))
+            self._cache[chave] = (sp, sr)
+        return self._cache[chave]
+
+    def __getstate__(self):
+        # para o pool: o cache é refeito em cada processo
+        d = dict(self.__dict__)
+        d["_cache"] = {}
+        return d
+
+
+def _max_mais_min(arr: Sequence[float], n: int) -> Optional[float]:
+    janela = arr[-n:] if n and n > 0 else arr
+    return (max(janela) + min(janela)) if janela else None
+
+
+def _ler_jsonl(paths: Sequence[str]) -> Historico:
+    linhas = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            for li in f:
+                li = li.strip()
+                if not li:
+                    continue
+                try:
+                    d = json.loads(li)
+                    t = float(d["t"])
+                except (ValueError, KeyError, TypeError):
+                    continue
+                linhas.append((t, P2._only_finite(d.get("ptchwnd")), P2._only_finite(d.get("rollwnd"))))
+    linhas.sort(key=lambda x: x[0])
+    t0 = linhas[0][0] if linhas else 0.0
+    return Historico([t - t0 for t, _, _ in linhas], janelas=[(p, r) for _, p, r in linhas], origem="janelas")
+
+
+def _de_serie(serie: AS.Serie) -> Historico:
+    """Série já na métrica do painel: volta para max+min com o fator/AA atuais (janela não se aplica)."""
+    somas = []
+    for _, pitch, roll in serie.pontos:
+        somas.append((pitch / P1.FATOR_CORRECAO_PITCH - P1.AA_PITCH, roll / P1.FATOR_CORRECAO_ROLL - P1.AA_ROLL))
+    return Historico([p[0] for p in serie.pontos], somas=somas, origem="metrica")
+
+
+def carregar_historico(path: str) -> Historico:
+    """
+    - diretório ou .jsonl: leituras gravadas com LITE2_HISTORICO=1
+      ({"t", "ptchwnd", "rollwnd"} por linha) — todos os parâmetros valem
+    - demais (.log SNAP, .json, .csv do --simular-alarme): valores já na
+      métrica; fator/AA são aplicados sobre o max+min reconstruído e
+      HTML_WIN_* não tem efeito
+    """
+    if os.path.isdir(path):
+        return _ler_jsonl(sorted(glob.glob(os.path.join(path, "*.jsonl"))))
+    if path.lower().endswith(".jsonl"):
+        return _ler_jsonl([path])
+    return _de_serie(AS.carregar_serie(path))
+
+
+def gravar_leitura(dados: dict, agora: Optional[float] = None, pasta: Optional[str] = None) -> None:
+    """Acrescenta a leitura do ciclo ao histórico do dia (pasta/AAAA-MM-DD.jsonl)."""
+    try:
+        agora = time.time() if agora is None else agora
+        pasta = pasta or P1.HISTORICO_DIR
+        os.makedirs(pasta, exist_ok=True)
+        linha = json.dumps(
+            {
+                "t": round(agora, 3),
+                "ptchwnd": [round(v, 3) for v in P2._only_finite(dados.get("ptchwnd"))],
+                "rollwnd": [round(v, 3) for v in P2._only_finite(dados.get("rollwnd"))],
+            },
+            separators=(",", ":"),
+        )
+        nome = datetime.fromtimestamp(agora).strftime("%Y-%m-%d") + ".jsonl"
+        with open(os.path.join(pasta, nome), "a", encoding="utf-8") as f:
+            f.write(linha + "\n")
+    except Exception:
+        P1.log.warning("Falha ao gravar histórico", exc_info=True)
+
+
+# =========================================================
+# Parâmetros
+# =========================================================
+def _como_niveis(v) -> List[float]:
+    """Escalar x -> [x, -x, x, -x]; lista de 4 passa direto."""
+    if isinstance(v, (int, float)):
+        v = abs(float(v))
+        return [v, -v, v, -v]
+    v = [float(x) for x in v]
+    if len(v) != 4:
+        raise ValueError("níveis precisam de 4 valores (pitch+, pitch-, roll+, roll-)")
+    return v
+
+
+def validar_params(params: Dict) -> Dict:
+    out = {}
+    for k, v in params.items():
+        if k == "nome":
+            continue
+        if k not in PARAMS:
+            raise ValueError("parâmetro desconhecido: %s" % k)
+        if k in _NIVEIS:
+            out[k] = _como_niveis(v)
+        elif k.startswith("HTML_WIN"):
+            out[k] = int(v)
+        else:
+            out[k] = float(v)
+    return out
+
+
+def _somar_offset(base: List[float], off: float) -> List[float]:
+    return [base[0] + off, base[1] - off, base[2] + off, base[3] - off]
+
+
+@contextmanager
+def params_aplicados(params: Dict) -> Iterator[Dict]:
+    """
+    Aplica o conjunto nos módulos (P1/P5), como se fosse a configuração do
+    programa, e restaura na saída. L4/L5 são recalculados a partir de
+    L3 + OFFSET_L4 (+ OFFSET_L5) quando não vierem explícitos.
+    """
+    p = validar_params(params)
+    antes = {k: getattr(mod, k) for k, mod in PARAMS.items()}
+    cfg = dict(antes)
+    cfg.update(p)
+    if "L4_LEVELS" not in p and ("L3_LEVELS" in p or "OFFSET_L4" in p):
+        cfg["L4_LEVELS"] = _somar_offset(cfg["L3_LEVELS"], cfg["OFFSET_L4"])
+    if "L5_LEVELS" not in p and ("L4_LEVELS" in p or "L3_LEVELS" in p or "OFFSET_L4" in p or "OFFSET_L5" in p):
+        cfg["L5_LEVELS"] = _somar_offset(cfg["L4_LEVELS"], cfg["OFFSET_L5"])
+    try:
+        for k, mod in PARAMS.items():
+            setattr(mod, k, cfg[k])
+        yield cfg
+    finally:
+        for k, mod in PARAMS.items():
+            setattr(mod, k, antes[k])
+
+
+def _nome_config(params: Dict) -> str:
+    if params.get("nome"):
+        return str(params["nome"])
+    p = {k: v for k, v in params.items() if k != "nome"}
+    return " ".join("%s=%s" % (k, v) for k, v in p.items()) or "atual"
+
+
+def grade(eixos: Sequence[Tuple[str, Sequence]]) -> List[Dict]:
+    """Produto cartesiano [(param, [v1, v2]), ...] -> lista de conjuntos."""
+    if not eixos:
+        return []
+    nomes = [k for k, _ in eixos]
+    return [dict(zip(nomes, combo)) for combo in itertools.product(*[vs for _, vs in eixos])]
+
+
+# =========================================================
+# Execução
+# =========================================================
+def _niveis_por_leitura(pitch: Sequence[float], roll: Sequence[float]) -> List[int]:
+    out = []
+    for pv, rv in zip(pitch, roll):
+        est = P4.avaliar_por_valores(pv, rv, None)
+        out.append(max(est["pitch_nivel"], est["roll_nivel"]))
+    return out
+
+
+def _metrica(hist: Historico, cfg: Dict) -> Tuple[List[float], List[float]]:
+    sp, sr = hist.somas(cfg["HTML_WIN_PITCH"], cfg["HTML_WIN_ROLL"])
+    fp, ap_ = cfg["FATOR_CORRECAO_PITCH"], cfg["AA_PITCH"]
+    fr, ar = cfg["FATOR_CORRECAO_ROLL"], cfg["AA_ROLL"]
+    pitch = [0.0 if s is None else (s + ap_) * fp for s in sp]
+    roll = [0.0 if s is None else (s + ar) * fr for s in sr]
+    return pitch, roll
+
+
+def episodios(ts: Sequence[float], niveis: Sequence[int], minimo: int, buraco: float) -> List[Tuple[float, float, int]]:
+    """Trechos contíguos com nível >= minimo -> [(início, fim, nível máximo)]."""
+    out: List[Tuple[float, float, int]] = []
+    atual = None
+    for t, nv in zip(ts, niveis):
+        if nv >= minimo and atual is not None and t - atual[1] <= buraco:
+            atual = (atual[0], t, max(atual[2], nv))
+            continue
+        if atual is not None:
+            out.append(atual)
+            atual = None
+        if nv >= minimo:
+            atual = (t, t, nv)
+    if atual is not None:
+        out.append(atual)
+    return out
+
+
+def rodar_config(
+    hist: Historico,
+    params: Dict,
+    modo: Optional[str] = None,
+    ciclo: Optional[float] = None,
+    picos: Sequence[Tuple[float, float, int]] = (),
+) -> Dict:
+    """Um conjunto de parâmetros sobre o histórico inteiro (mesmo código de avaliação/alarme do programa)."""
+    t0 = time.perf_counter()
+    ciclo = ciclo or hist.ciclo()
+    buraco = ciclo * BURACO_CICLOS
+    with params_aplicados(params) as cfg:
+        pitch, roll = _metrica(hist, cfg)
+        niveis = _niveis_por_leitura(pitch, roll)
+        linha = AS.simular(AS.Serie(zip(hist.ts, pitch, roll)), ciclo=ciclo, modo=modo)
+        silencio = cfg["ALARM_SILENCE_SEC"]
+
+    tempo = {str(n): 0.0 for n in range(6)}
+    for i, nv in enumerate(niveis[:-1]):
+        dt = hist.ts[i + 1] - hist.ts[i]
+        tempo[str(nv)] += dt if dt <= buraco else ciclo
+    if niveis:
+        tempo[str(niveis[-1])] += ciclo
+
+    alarmes = {str(n): 0 for n in range(2, 6)}
+    supressoes: Dict[str, int] = {}
+    tocados = []
+    for ev in linha:
+        if ev["evento"] == "PLAY":
+            alarmes[str(ev["nivel"])] = alarmes.get(str(ev["nivel"]), 0) + 1
+            tocados.append(ev["t"])
+        elif ev["evento"] == "SUPPRESS":
+            motivo = str(ev.get("reason", "?"))
+            supressoes[motivo] = supressoes.get(motivo, 0) + 1
+
+    # pico perdido: nenhum alarme entre (início - silêncio) e (fim + folga)
+    perdidos = [
+        ini for ini, fim, _ in picos if not any(ini - silencio <= t <= fim + PICO_FOLGA_SEC for t in tocados)
+    ]
+    return {
+        "nome": _nome_config(params),
+        "params": validar_params(params),
+        "alarmes": alarmes,
+        "total_alarmes": sum(alarmes.values()),
+        "supressoes": supressoes,
+        "tempo_em_nivel_s": {k: round(v, 1) for k, v in tempo.items()},
+        "picos": len(picos),
+        "picos_perdidos": len(perdidos),
+        "perdidos_t": [round(t, 1) for t in perdidos[:20]],
+        "real_ms": round((time.perf_counter() - t0) * 1000.0, 1),
+    }
+
+
+# estado de cada processo do pool (enviado uma vez pelo initializer)
+_W: Dict = {}
+
+
+def _iniciar_worker(hist: Historico, modo: Optional[str], ciclo: float, picos) -> None:
+    _W.update(hist=hist, modo=modo, ciclo=ciclo, picos=picos)
+
+
+def _rodar_no_worker(params: Dict) -> Dict:
+    return rodar_config(_W["hist"], params, _W["modo"], _W["ciclo"], _W["picos"])
+
+
+def backtest(
+    hist: Historico,
+    configs: Sequence[Dict],
+    modo: Optional[str] = None,
+    ciclo: Optional[float] = None,
+    pico_nivel: int = PICO_NIVEL_PADRAO,
+    processos: int = 0,
+) -> Dict:
+    """
+    Roda cada conjunto (o primeiro costuma ser {} = parâmetros atuais) e
+    devolve um resumo por conjunto. Os picos de referência saem dos
+    parâmetros atuais, então "perdidos" compara todos contra o mesmo alvo.
+    `processos` 0 = os.cpu_count(); 1 = sem pool.
+    """
+    for c in configs:
+        validar_params(c)
+    ciclo = ciclo or hist.ciclo()
+    pitch, roll = _metrica(hist, {k: getattr(mod, k) for k, mod in PARAMS.items()})
+    picos = episodios(hist.ts, _niveis_por_leitura(pitch, roll), pico_nivel, ciclo * BURACO_CICLOS)
+
+    t0 = time.perf_counter()
+    processos = processos or os.cpu_count() or 1
+    resultados = None
+    if processos > 1 and len(configs) > 1:
+        try:
+            with ProcessPoolExecutor(
+                max_workers=min(processos, len(configs)), initializer=_iniciar_worker, initargs=(hist, modo, ciclo, picos)
+            ) as pool:
+                resultados = list(pool.map(_rodar_no_worker, configs))
+        except Exception:
+            P1.log.warning("Backtest: pool de processos indisponível; seguindo em um processo", exc_info=True)
+    if resultados is None:
+        resultados = [rodar_config(hist, c, modo, ciclo, picos) for c in configs]
+
+    return {
+        "historico": {"leituras": len(hist), "duracao_s": round(hist.ts[-1] if hist.ts else 0.0, 1), "origem": hist.origem, "ciclo_s": ciclo},
+        "pico_nivel": pico_nivel,
+        "modo": modo or P5.ALARM_CONFIRM_MODO,
+        "real_ms": round((time.perf_counter() - t0) * 1000.0, 1),
+        "configs": resultados,
+    }
+
+
+def formatar_relatorio(rel: Dict) -> str:
+    h = rel["historico"]
+    out = [
+        "histórico: %d leituras, %.1f h (%s), ciclo %.1f s; picos L%d+ de referência: %d"
+        % (h["leituras"], h["duracao_s"] / 3600.0, h["origem"], h["ciclo_s"], rel["pico_nivel"], rel["configs"][0]["picos"] if rel["configs"] else 0),
+        "%-40s %4s %4s %4s %4s %5s %8s   %s" % ("conjunto", "L2", "L3", "L4", "L5", "sup", "perdidos", "min em L0/L1/L2/L3/L4/L5"),
+    ]
+    for c in rel["configs"]:
+        a = c["alarmes"]
+        tempo = "/".join("%.0f" % (c["tempo_em_nivel_s"][str(n)] / 60.0) for n in range(6))
+        out.append(
+            "%-40s %4d %4d %4d %4d %5d %8d   %s"
+            % (c["nome"][:40], a["2"], a["3"], a["4"], a["5"], sum(c["supressoes"].values()), c["picos_perdidos"], tempo)
+        )
+    out.append("-- %d conjuntos em %.1f ms" % (len(rel["configs"]), rel["real_ms"]))
+    return "\n".join(out)
+
+
+# =========================================================
+# CLI
+# =========================================================
+def _parse_eixo(txt: str) -> Tuple[str, List]:
+    """PARAM=v1,v2,... (níveis: escalar simétrico ou v/v/v/v)."""
+    nome, _, valores = txt.partition("=")
+    nome = nome.strip()
+    if nome not in PARAMS or not valores:
+        raise argparse.ArgumentTypeError("use PARAM=v1,v2 com PARAM em: %s" % ", ".join(PARAMS))
+    vs: List = []
+    for v in valores.split(","):
+        v = v.strip()
+        vs.append([float(x) for x in v.split("/")] if "/" in v else float(v))
+    return nome, vs
+
+
+def _ler_configs(path: str) -> List[Dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        bruto = json.load(f)
+    return list(bruto) if isinstance(bruto, list) else [bruto]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Backtest de limiares e regras de alarme sobre um histórico (sem áudio, sem rede)")
+    ap.add_argument("historico", help="pasta/.jsonl gravado com LITE2_HISTORICO=1, ou .log/.json/.csv já na métrica")
+    ap.add_argument("--params", help="JSON com um conjunto ou lista de conjuntos {PARAM: valor, 'nome': ...}")
+    ap.add_argument("--grade", action="append", type=_parse_eixo, default=[], metavar="PARAM=v1,v2", help="eixo da grade (repetível)")
+    ap.add_argument("--modo", choices=("dupla", "rajada"), default=None, help="padrão: %s" % P5.ALARM_CONFIRM_MODO)
+    ap.add_argument("--ciclo", type=float, default=None, help="intervalo do loop (s); padrão: o do histórico")
+    ap.add_argument("--pico-nivel", type=int, default=PICO_NIVEL_PADRAO, choices=(2, 3, 4, 5))
+    ap.add_argument("--processos", type=int, default=0, help="0 = núcleos da máquina; 1 = sem pool")
+    ap.add_argument("--json", action="store_true", help="relatório em JSON")
+    a = ap.parse_args(argv)
+
+    hist = carregar_historico(a.historico)
+    if not len(hist):
+        ap.error("histórico sem leituras: %s" % a.historico)
+    configs: List[Dict] = [{"nome": "atual"}]
+    try:
+        if a.params:
+            configs += _ler_configs(a.params)
+        configs += grade(a.grade)
+        rel = backtest(hist, configs, modo=a.modo, ciclo=a.ciclo, pico_nivel=a.pico_nivel, processos=a.processos)
+    except (OSError, ValueError) as e:
+        ap.error(str(e))
+
+    print(json.dumps(rel, indent=2, ensure_ascii=False) if a.json else formatar_relatorio(rel))
+    return 0
+
+
+__all__ = [
+    "PARAMS",
+    "Historico",
+    "carregar_historico",
+    "gravar_leitura",
+    "validar_params",
+    "params_aplicados",
+    "grade",
+    "episodios",
+    "rodar_config",
+    "backtest",
+    "formatar_relatorio",
+    "main",
+]
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Microbenchmarks dos caminhos quentes (avaliação, renderização, log) com saída JSON comparável entre versões."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import _part1 as P1
+import _part2 as P2
+import _part3 as P3
+import _part4 as P4
+import _part5 as P5
+
+JANELAS = (39, 120, 600, 2400)  # amostras em ptchwnd/rollwnd/windwnd
+LINHAS_LOG = (1_000, 10_000, 100_000)
+JANELAS_RAPIDO = (39, 600)
+LINHAS_LOG_RAPIDO = (1_000,)
+TOLERANCIA_PADRAO = 0.25  # --comparar: mais lento que isto (25%) é regressão
+
+Caso = Tuple[str, Dict, Callable[[], object]]
+
+
+# =========================================================
+# Cargas sintéticas
+# =========================================================
+def _janela(rng: random.Random, n: int, amp: float, buracos: float = 0.02) -> list:
+    """Série tipo PyHMS: senoide com ruído e alguns null."""
+    out = []
+    for i in range(n):
+        if rng.random() < buracos:
+            out.append(None)
+        else:
+            out.append(round(amp * ((i % 17) / 8.5 - 1.0) + rng.uniform(-0.1, 0.1), 3))
+    return out
+
+
+def payload(n: int, pyhms: bool = True, semente: int = 42) -> Tuple[dict, dict]:
+    """(d_pr, d_wind) com janelas de n amostras; pyhms=False deixa só windwnd (fallback antigo)."""
+    rng = random.Random(semente + n)
+    d_pr = {"ptchwnd": _janela(rng, n, 1.2), "rollwnd": _janela(rng, n, 0.8)}
+    d_wind = {"windwnd": [abs(v) * 12.0 if v is not None else None for v in _janela(rng, n, 1.5)], "_wind_source": "bench"}
+    if pyhms:
+        d_wind.update(
+            {
+                "windspdmean": {"med. 2 min": 14.2},
+                "gustspdmax": {"instantaneo op.": 19.8},
+                "winddirmeanv": 231.0,
+                "airpresslmeanv": 1013.2,
+            }
+        )
+    return d_pr, d_wind
+
+
+def escrever_log(path: str, linhas: int) -> None:
+    """Log único no formato real: EVENT/INFO com um SNAP a cada 10 linhas."""
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(linhas):
+            ts = "2026-01-01 %02d:%02d:%02d" % (i // 3600 % 24, i // 60 % 60, i % 60)
+            if i % 10 == 0:
+                corpo = P1._kv_line("SNAP", pitch=1.2, roll=-0.4, vento=14.0, raj=19.5, src="smp18ocn01").upper()
+            elif i % 10 == 5:
+                corpo = P1._kv_line("EVENT", name="WIND_HOST", host="smp18ocn01", vm=14.0, raj=19.5).upper()
+            else:
+                corpo = "[INFO] Vento ativo: smp18ocn01 (vm=14.00, raj=19.50)"
+            f.write("%s; %s\n" % (ts, corpo))
+
+
+@contextmanager
+def _arquivos_em(pasta: str, **chaves: str) -> Iterator[None]:
+    """Aponta entradas de P1.FILES para arquivos da pasta temporária."""
+    antes = {k: P1.FILES[k] for k in chaves}
+    try:
+        for k, nome in chaves.items():
+            P1.FILES[k] = os.path.join(pasta, nome)
+        yield
+    finally:
+        P1.FILES.update(antes)
+
+
+# =========================================================
+# Casos
+# =========================================================
+def casos(janelas: Sequence[int] = JANELAS) -> List[Caso]:
+    out: List[Caso] = []
+    for n in janelas:
+        d_pr, d_wind = payload(n)
+        _, d_wind_antigo = payload(n, pyhms=False)
+        dados = P5.merge_dados(d_pr, d_wind)
+        est = P4.avaliar_de_json(dados)
+        p = {"n": n}
+        out += [
+            ("_only_finite", p, lambda d=d_pr: P2._only_finite(d["ptchwnd"])),
+            ("soma_max_min_pitch", p, lambda d=d_pr: P2.soma_max_min_pitch(d["ptchwnd"])),
+            ("soma_max_min_roll", p, lambda d=d_pr: P2.soma_max_min_roll(d["rollwnd"])),
+            ("rajada", {**p, "fonte": "pyhms"}, lambda d=d_wind: P2.rajada(d)),
+            ("rajada", {**p, "fonte": "windwnd"}, lambda d=d_wind_antigo: P2.rajada(d)),
+            ("vento_medio", {**p, "fonte": "pyhms"}, lambda d=d_wind: P2.vento_medio(d)),
+            ("vento_medio", {**p, "fonte": "windwnd"}, lambda d=d_wind_antigo: P2.vento_medio(d)),
+            ("merge_dados", p, lambda a=d_pr, b=d_wind: P5.merge_dados(a, b)),
+            ("avaliar_de_json", p, lambda d=dados: P4.avaliar_de_json(d)),
+        ]
+        if n == janelas[0]:
+            # não dependem do tamanho da janela
+            out += [
+                ("gerar_html", {}, lambda e=est: _gerar_html(e)),
+                ("_kv_line", {}, lambda: P1._kv_line("SNAP", pitch=1.23, roll=-0.4, vento=14.0, raj=19.5, src="smp18ocn01")),
+            ]
+    return out
+
+
+def _gerar_html(est: dict) -> None:
+    P5.gerar_html(
+        est["pitch_val"],
+        est["roll_val"],
+        est["pitch_cor"],
+        est["roll_cor"],
+        est["rot"],
+        est["raj"],
+        est["raj_cor"],
+        est["status_cor"],
+        est.get("wdir_adj"),
+        est.get("barometro"),
+        est.get("wdir_lbl"),
+        est.get("vento_med"),
+        est.get("vento_cor", "verde"),
+        est.get("wind_source"),
+    )
+
+
+# =========================================================
+# Medição
+# =========================================================
+def medir(fn: Callable[[], object], tempo_min: float = 0.2, repeticoes: int = 5) -> Dict:
+    """Dobra o nº de chamadas até uma rodada durar tempo_min; repete e devolve µs por chamada."""
+    t = timeit.Timer(fn)
+    loops = 1
+    while True:
+        dt = t.timeit(loops)
+        if dt >= tempo_min or loops >= 10_000_000:
+            break
+        loops *= 2 if dt <= 0 else max(2, min(10, int(tempo_min / dt * 1.2)))
+    tempos = [x / loops * 1e6 for x in t.repeat(repeticoes, loops)]
+    return {
+        "loops": loops,
+        "us_min": round(min(tempos), 3),
+        "us_mediana": round(statistics.median(tempos), 3),
+        "us_max": round(max(tempos), 3),
+    }
+
+
+def _chave(nome: str, params: Dict) -> str:
+    return nome + "".join("[%s=%s]" % (k, params[k]) for k in sorted(params))
+
+
+def _git_rev() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            timeout=5,
+        )
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def rodar(
+    janelas: Sequence[int] = JANELAS,
+    linhas_log: Sequence[int] = LINHAS_LOG,
+    filtro: Optional[str] = None,
+    tempo_min: float = 0.2,
+    repeticoes: int = 5,
+) -> Dict:
+    resultados = []
+
+    def _registrar(nome, params, fn):
+        if filtro and filtro not in nome:
+            return
+        resultados.append({"nome": nome, "params": params, "chave": _chave(nome, params), **medir(fn, tempo_min, repeticoes)})
+
+    with tempfile.TemporaryDirectory() as tmp, _arquivos_em(tmp, events="events.log", log="events.log", html="pitch_roll.html"):
+        for nome, params, fn in casos(janelas):
+            _registrar(nome, params, fn)
+
+        _registrar("log_event", {}, lambda: P1.log_event("BENCH", nivel=3, pitch=1.23, motivo="bench"))
+
+        for linhas in linhas_log:
+            escrever_log(P1.FILES["log"], linhas)
+            _registrar("ler_ultimo_do_log", {"linhas": linhas}, P3.ler_ultimo_do_log)
+
+    return {
+        "meta": {
+            "git": _git_rev(),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "epoch": int(time.time()),
+            "tempo_min": tempo_min,
+            "repeticoes": repeticoes,
+        },
+        "resultados": resultados,
+    }
+
+
+def comparar(atual: Dict, base: Dict, tolerancia: float = TOLERANCIA_PADRAO) -> Dict:
+    """Razão us_mediana atual/base por caso; acima de 1 + tolerancia é regressão."""
+    base_por_chave = {r["chave"]: r for r in base.get("resultados", [])}
+    casos_cmp, regressoes = [], []
+    for r in atual["resultados"]:
+        b = base_por_chave.get(r["chave"])
+        if not b or not b.get("us_mediana"):
+            continue
+        razao = r["us_mediana"] / b["us_mediana"]
+        casos_cmp.append({"chave": r["chave"], "base_us": b["us_mediana"], "atual_us": r["us_mediana"], "razao": round(razao, 3)})
+        if razao > 1.0 + tolerancia:
+            regressoes.append(r["chave"])
+    return {"base_git": base.get("meta", {}).get("git"), "tolerancia": tolerancia, "casos": casos_cmp, "regressoes": regressoes}
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Microbenchmarks de avaliação, HTML e log (JSON na saída)")
+    ap.add_argument("--filtro", help="só casos cujo nome contém isto")
+    ap.add_argument("--tempo-min", type=float, default=0.2, help="duração mínima de cada rodada (s)")
+    ap.add_argument("--repeticoes", type=int, default=5)
+    ap.add_argument("--rapido", action="store_true", help="menos tamanhos, rodadas curtas (CI/smoke)")
+    ap.add_argument("--saida", help="grava o JSON neste arquivo (padrão: stdout)")
+    ap.add_argument("--comparar", metavar="BASE.json", help="compara com um resultado anterior; sai com 1 se houver regressão")
+    ap.add_argument("--tolerancia", type=float, default=TOLERANCIA_PADRAO, help="folga antes de acusar regressão (0.25 = 25%%)")
+    a = ap.parse_args(argv)
+
+    if a.rapido:
+        rel = rodar(JANELAS_RAPIDO, LINHAS_LOG_RAPIDO, a.filtro, tempo_min=min(a.tempo_min, 0.02), repeticoes=min(a.repeticoes, 3))
+    else:
+        rel = rodar(JANELAS, LINHAS_LOG, a.filtro, a.tempo_min, a.repeticoes)
+
+    rc = 0
+    if a.comparar:
+        with open(a.comparar, "r", encoding="utf-8") as f:
+            rel["comparacao"] = comparar(rel, json.load(f), a.tolerancia)
+        for chave in rel["comparacao"]["regressoes"]:
+            print("REGRESSÃO: %s" % chave, file=sys.stderr)
+        rc = 1 if rel["comparacao"]["regressoes"] else 0
+
+    texto = json.dumps(rel, indent=2, ensure_ascii=False)
+    if a.saida:
+        with open(a.saida, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+    else:
+        print(texto)
+    return rc
+
+
+__all__ = [
+    "payload",
+    "escrever_log",
+    "casos",
+    "medir",
+    "rodar",
+    "comparar",
+    "main",
+]
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Spans por ciclo do run_monitor num anel de tamanho fixo + resumo estilo flame dos ciclos mais lentos."""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import _metrics as M
+
+CICLOS_CAPACIDADE = 180  # ~30 min a 9 s por ciclo
+ESPERA = "espera"  # span da espera até o próximo ciclo; fica fora do ranking e do flame
+
+SPAN_SEC = M.histogram("lite2_cycle_span_seconds", "Duração de cada etapa do ciclo do run_monitor", ("span",))
+
+
+class Ciclo:
+    __slots__ = ("n", "epoch", "t0", "trabalho", "spans", "info", "thread")
+
+    def __init__(self, n: int):
+        self.n = n
+        self.epoch = time.time()
+        self.t0 = time.perf_counter()
+        self.trabalho: Optional[float] = None  # s do início até fechar() (sem a espera)
+        self.spans: List[Tuple[str, float, float]] = []  # (pilha "a;b", início relativo, duração) em s
+        self.info: Dict = {}
+        self.thread = threading.get_ident()
+
+    def as_dict(self) -> Dict:
+        return {
+            "n": self.n,
+            "epoch": round(self.epoch, 3),
+            "trabalho_ms": None if self.trabalho is None else round(self.trabalho * 1000.0, 1),
+            "spans": [{"pilha": p, "inicio_ms": round(i * 1000.0, 1), "ms": round(d * 1000.0, 1)} for p, i, d in self.spans],
+            **self.info,
+        }
+
+
+class RegistroCiclos:
+    """
+    - `iniciar()` abre um ciclo (e fecha o anterior, se ficou aberto);
+      `fechar(**info)` marca o fim do trabalho; a espera entra depois como
+      span ESPERA no mesmo ciclo.
+    - `span(nome)` mede um trecho do ciclo aberto. Spans aninhados viram
+      pilhas "vento;host X"; spans de outras threads (agendador) entram no
+      ciclo aberto com o nome da thread na frente. Sem ciclo aberto, não
+      custa nada além do `with`. `span(nome, ciclo)` mede num ciclo
+      específico (sinks do _pipeline, que terminam depois do próximo
+      `iniciar()`). `anexar(ciclo, spans, thread)` junta spans medidos em
+      outro processo (a aquisição de --aquisicao processo).
+    - O anel guarda os últimos `capacidade` ciclos.
+    - Ouvintes (`ouvir`) recebem ao_iniciar(ciclo)/ao_fechar(ciclo) na
+      thread do loop, p.ex. o profiler do /debug/profile.
+    """
+
+    def __init__(self, capacidade: int = CICLOS_CAPACIDADE):
+        self._anel: deque = deque(maxlen=capacidade)
+        self._lock = threading.Lock()
+        self._atual: Optional[Ciclo] = None
+        self._n = 0
+        self._local = threading.local()
+        self._ouvintes: List = []
+
+    @property
+    def capacidade(self) -> int:
+        return self._anel.maxlen
+
+    def iniciar(self) -> Ciclo:
+        with self._lock:
+            self._n += 1
+            ciclo = Ciclo(self._n)
+            anterior, self._atual = self._atual, ciclo
+            if anterior is not None and anterior.trabalho is None:
+                anterior.trabalho = time.perf_counter() - anterior.t0
+            self._anel.append(ciclo)
+        self._avisar("ao_iniciar", ciclo)
+        return ciclo
+
+    def fechar(self, **info) -> Optional[Ciclo]:
+        ciclo = self._atual
+        if ciclo is not None and ciclo.trabalho is None:
+            ciclo.trabalho = time.perf_counter() - ciclo.t0
+            ciclo.info.update(info)
+            self._avisar("ao_fechar", ciclo)
+        return ciclo
+
+    def _avisar(self, evento: str, ciclo: Ciclo) -> None:
+        for o in list(self._ouvintes):
+            try:
+                getattr(o, evento)(ciclo)
+            except Exception:
+                pass  # diagnóstico não pode derrubar o loop
+
+    def ouvir(self, ouvinte) -> None:
+        if ouvinte not in self._ouvintes:
+            self._ouvintes.append(ouvinte)
+
+    def deixar_de_ouvir(self, ouvinte) -> None:
+        if ouvinte in self._ouvintes:
+            self._ouvintes.remove(ouvinte)
+
+    @contextmanager
+    def span(self, nome: str, ciclo: Optional[Ciclo] = None) -> Iterator[None]:
+        ciclo = ciclo or self._atual
+        if ciclo is None:
+            yield
+            return
+        pilha = getattr(self._local, "pilha", None)
+        if pilha is None:
+            pilha = self._local.pilha = []
+        if not pilha and threading.get_ident() != ciclo.thread:
+            nome = "[%s];%s" % (threading.current_thread().name, nome)
+        pilha.append(nome)
+        caminho = ";".join(pilha)
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            dur = time.perf_counter() - t
+            pilha.pop()
+            with self._lock:
+                ciclo.spans.append((caminho, t - ciclo.t0, dur))
+            SPAN_SEC.observe(dur, span=nome.split(";")[-1].split(" ")[0])
+
+    def anexar(self, ciclo: Ciclo, spans, thread: str) -> None:
+        """Spans (pilha, início, duração) de fora deste processo, como "[thread];pilha"; o início é relativo ao ciclo de lá."""
+        for pilha, inicio, dur in spans:
+            with self._lock:
+                ciclo.spans.append(("[%s];%s" % (thread, pilha), float(inicio), float(dur)))
+            SPAN_SEC.observe(float(dur), span=pilha.split(";")[-1].split(" ")[0])
+
+    def ultimos(self, n: Optional[int] = None) -> List[Ciclo]:
+        with self._lock:
+            ciclos = list(self._anel)
+        return ciclos[-n:] if n else ciclos
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._anel.clear()
+            self._atual = None
+
+    # -----------------------------------------------------
+    # resumo
+    # -----------------------------------------------------
+    @staticmethod
+    def flame(ciclos: List[Ciclo]) -> List[Tuple[str, float]]:
+        """
+        Pilhas colapsadas (formato do flamegraph.pl) somadas nos ciclos, em
+        ms de tempo próprio: o filho é descontado do pai e o que nenhum span
+        cobriu no ciclo vira "ciclo;(sem span)".
+        """
+        total: Dict[str, float] = {}
+        for c in ciclos:
+            spans = [(p, d) for p, _, d in c.spans if p.split(";")[-1] != ESPERA]
+            existentes = {p for p, _ in spans}
+            proprio: Dict[str, float] = {}
+            for pilha, dur in spans:
+                proprio[pilha] = proprio.get(pilha, 0.0) + dur
+                pai = pilha.rpartition(";")[0]
+                if pai in existentes:
+                    proprio[pai] = proprio.get(pai, 0.0) - dur
+            coberto = sum(d for p, _, d in c.spans if ";" not in p and p != ESPERA)
+            if c.trabalho is not None and c.trabalho > coberto:
+                proprio["(sem span)"] = c.trabalho - coberto
+            for pilha, seg in proprio.items():
+                chave = "ciclo;" + pilha
+                total[chave] = total.get(chave, 0.0) + max(0.0, seg)
+        return sorted(((p, ms * 1000.0) for p, ms in total.items()), key=lambda x: x[1], reverse=True)
+
+    def resumo(self, n: int = 30, lentos: int = 5) -> Dict:
+        ciclos = [c for c in self.ultimos() if c.trabalho is not None]
+        piores = sorted(ciclos, key=lambda c: c.trabalho, reverse=True)[:lentos]
+        return {
+            "capacidade": self.capacidade,
+            "gravados": len(ciclos),
+            "ultimos": [c.as_dict() for c in ciclos[-n:]] if n else [],
+            "lentos": [c.as_dict() for c in piores],
+            "flame_lentos": [{"pilha": p, "ms": round(ms, 1)} for p, ms in self.flame(piores)],
+        }
+
+    def colapsado(self, lentos: int = 5) -> str:
+        """Texto para flamegraph.pl/speedscope: "pilha microssegundos" por linha."""
+        ciclos = [c for c in self.ultimos() if c.trabalho is not None]
+        piores = sorted(ciclos, key=lambda c: c.trabalho, reverse=True)[:lentos]
+        return "".join("%s %d\n" % (p, round(ms * 1000.0)) for p, ms in self.flame(piores))
+
+
+__all__ = [
+    "CICLOS_CAPACIDADE",
+    "ESPERA",
+    "Ciclo",
+    "RegistroCiclos",
+]
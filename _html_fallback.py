@@ -11,9 +11,12 @@ HTML_TPL = """<!DOCTYPE html>
 <title>Pitch & Roll – Monitoramento</title>
 
 <script>
-setTimeout(()=>location.reload(true), $refresh_ms);
+// Um único polling em /state (live view + mute + fonte do vento + saúde dos hosts)
+// substitui o reload da página, o /mute_status e o /wind_pref.
+const STATE_POLL_MS = $state_poll_ms;
+const BOOT_ID = '$boot_id';
 const STALE_SEC = $stale_sec;
-const LAST_EPOCH_MS = $last_epoch_ms;
+let LAST_EPOCH_MS = $last_epoch_ms;
 
 function stalenessLoop() {
   const ageSec = Math.floor((Date.now() - LAST_EPOCH_MS) / 1000);
@@ -29,42 +32,61 @@ function stalenessLoop() {
 setTimeout(stalenessLoop, 500);
 
 const CTRL = 'http://127.0.0.1:$port';
-async function muteL23(mins) { try { await fetch(CTRL + '/mute?mins=' + mins); } catch (e) {} }
-async function unmuteL23() { try { await fetch(CTRL + '/unmute'); } catch (e) {} }
-
-async function pollMuteBadge() {
-  try {
-    const r = await fetch(CTRL + '/mute_status', { cache: "no-store" });
-    const j = await r.json();
-    const el = document.getElementById('mute-badge');
-    if (!el) return;
+async function muteL23(mins) { try { await fetch(CTRL + '/mute?mins=' + mins); } catch (e) {} refreshState(); }
+async function unmuteL23() { try { await fetch(CTRL + '/unmute'); } catch (e) {} refreshState(); }
+
+function setText(id, txt) { const el = document.getElementById(id); if (el) el.textContent = txt; }
+function setHtml(id, html) { const el = document.getElementById(id); if (el) el.innerHTML = html; }
+function setCor(id, base, cor) { const el = document.getElementById(id); if (el) el.className = (base ? base + ' ' : '') + cor; }
+
+function applyState(j) {
+  if (j.boot && j.boot !== BOOT_ID) { location.reload(true); return; }
+  const v = j.view || {};
+  if (v.last_epoch_ms) LAST_EPOCH_MS = v.last_epoch_ms;
+  setCor('status-dot', 'status-dot', v.status_cor || 'amarelo');
+  setHtml('rot', v.rot || '');
+  setText('pitch-txt', 'Pitch: ' + (v.pitch_txt || '---'));
+  setCor('pitch-txt', '', v.pitch_cor || 'amarelo');
+  setText('roll-txt', 'Roll: ' + (v.roll_txt || '---'));
+  setCor('roll-txt', '', v.roll_cor || 'amarelo');
+  setText('vento-txt', v.vento_med_txt || '---');
+  setCor('vento-cor', '', v.vento_cor || 'verde');
+  setText('rajada-txt', v.rajada_txt || '---');
+  setCor('rajada-cor', '', v.rajada_cor || 'verde');
+  setText('wdir-txt', (v.wdir_aj || '---') + '° (' + (v.wdir_lbl || '---') + ')');
+  setText('baro-txt', (v.barometro || '---') + ' hPa');
+  setHtml('hora', v.hora_html || '---');
+  setHtml('stale-hora', v.hora_html || '---');
+
+  const badge = document.getElementById('mute-badge');
+  if (badge) {
     if (j.muted) {
-      const dt = new Date(j.muted_until * 1000);
-      el.textContent = '🔇 até ' + dt.toLocaleTimeString();
-      el.style.display = 'inline-block';
+      badge.textContent = '🔇 até ' + new Date(j.muted_until * 1000).toLocaleTimeString();
+      badge.style.display = 'inline-block';
     } else {
-      el.style.display = 'none';
+      badge.style.display = 'none';
     }
-  } catch(e){}
-  setTimeout(pollMuteBadge, 3000);
+  }
+  const sel = document.getElementById('wind-pref');
+  if (sel && document.activeElement !== sel) sel.value = (j.wind_pref || 'auto');
 }
 
-async function hydrateWindPref() {
+let stateTimer = null;
+async function refreshState() {
+  if (stateTimer) clearTimeout(stateTimer);
   try {
-    const r = await fetch(CTRL + '/wind_pref', { cache: "no-store" });
-    const j = await r.json();
-    const sel = document.getElementById('wind-pref');
-    if (sel) sel.value = (j.host || 'auto');
+    const r = await fetch(CTRL + '/state', { cache: "no-store" });
+    applyState(await r.json());
   } catch(e){}
+  stateTimer = setTimeout(refreshState, STATE_POLL_MS);
 }
 
 async function setWindPref(val) {
   try { await fetch(CTRL + '/wind_pref?host=' + encodeURIComponent(val), { cache: "no-store" }); } catch (e) {}
-  location.reload(true);
+  refreshState();
 }
 
-setTimeout(pollMuteBadge, 1000);
-setTimeout(hydrateWindPref, 800);
+setTimeout(refreshState, 800);
 </script>
 
 <style>
@@ -270,7 +292,7 @@ body {
 <div id="stale-overlay">
   <div>
     <h2>⚠ DADOS DESATUALIZADOS</h2>
-    <p>Última atualização: <strong>$hora</strong></p>
+    <p>Última atualização: <strong id="stale-hora">$hora</strong></p>
     <p>Idade dos dados: <strong><span id="stale-age">--</span>s</strong></p>
     <p class="hint">Aguarde o sistema retomar ou feche esta janela.</p>
   </div>
@@ -278,7 +300,7 @@ body {
 
 <div class="container">
   <div class="status-indicator">
-    <div class="status-dot $status_cor"></div>
+    <div id="status-dot" class="status-dot $status_cor"></div>
     <div class="status-label">STATUS</div>
   </div>
 
@@ -301,29 +323,29 @@ body {
   <div class="wind-main">
     <div class="wind-data">
       <div><span class="vento-label">Vento</span>:
-        <strong class="$vento_cor"><span class="vento-valor">$vento_med_txt</span> nós</strong>
+        <strong id="vento-cor" class="$vento_cor"><span id="vento-txt" class="vento-valor">$vento_med_txt</span> nós</strong>
       </div>
       <div><span class="rajada-label">Rajada</span>:
-        <strong class="$rajada_cor"><span class="rajada-valor">$rajada_txt</span> nós</strong>
+        <strong id="rajada-cor" class="$rajada_cor"><span id="rajada-txt" class="rajada-valor">$rajada_txt</span> nós</strong>
       </div>
     </div>
   </div>
 
   <div class="wind-secondary">
     <div class="wind-data">
-      <div>Dir. vento (ajustado): <strong>$wdir_aj° ($wdir_lbl)</strong></div>
-      <div>Barômetro: <strong>$barometro hPa</strong></div>
+      <div>Dir. vento (ajustado): <strong id="wdir-txt">$wdir_aj° ($wdir_lbl)</strong></div>
+      <div>Barômetro: <strong id="baro-txt">$barometro hPa</strong></div>
     </div>
   </div>
 
   <div class="main-panel">
     <h1 class="main-title">⚓ Monitoramento de Pitch & Roll</h1>
-    <div class="main-status">$rot</div>
+    <div id="rot" class="main-status">$rot</div>
     <div class="main-values">
-      <strong><span class="$pitch_cor">Pitch: $pitch_txt</span></strong>
-      <strong><span class="$roll_cor">Roll: $roll_txt</span></strong>
+      <strong><span id="pitch-txt" class="$pitch_cor">Pitch: $pitch_txt</span></strong>
+      <strong><span id="roll-txt" class="$roll_cor">Roll: $roll_txt</span></strong>
     </div>
-    <div class="main-time">🕒 Atualizado em: $hora</div>
+    <div class="main-time">🕒 Atualizado em: <span id="hora">$hora</span></div>
   </div>
 </div>
 </body>
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Tempo de inicialização: imports (estilo -X importtime, num processo novo) e etapas do APP."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Sequence
+
+import _part1 as P1
+
+_RE_LINHA = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def medir_imports(modulo: str = "_part3") -> Dict:
+    """
+    `python -X importtime -c "import <modulo>"` num processo novo (nada já
+    importado por este). Devolve o total e cada módulo com self/acumulado.
+    """
+    t0 = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import %s" % modulo],
+        cwd=BASE_DIR,
+        capture_output=True,
+        text=True,
+    )
+    parede_ms = (time.perf_counter() - t0) * 1000.0
+    modulos: List[Dict] = []
+    for li in proc.stderr.splitlines():
+        m = _RE_LINHA.match(li)
+        if m:
+            modulos.append(
+                {
+                    "modulo": m.group(4),
+                    "self_ms": int(m.group(1)) / 1000.0,
+                    "acumulado_ms": int(m.group(2)) / 1000.0,
+                    "nivel": len(m.group(3)) // 2,
+                }
+            )
+    raiz = next((x for x in reversed(modulos) if x["modulo"] == modulo), None)
+    return {
+        "modulo": modulo,
+        "ok": proc.returncode == 0,
+        "processo_ms": round(parede_ms, 1),
+        "import_ms": raiz["acumulado_ms"] if raiz else None,
+        "modulos": modulos,
+    }
+
+
+def medir_etapas(etapas: Sequence[str] = P1.AppContext.ETAPAS) -> Dict[str, Optional[float]]:
+    """Sobe as etapas do APP neste processo e devolve ms de cada (None = já estava de pé)."""
+    out: Dict[str, Optional[float]] = {}
+    for nome in etapas:
+        if P1.APP.pronto(nome):
+            out[nome] = None
+            continue
+        P1.APP.garantir(nome)
+        out[nome] = round(P1.APP.tempos[nome] * 1000.0, 2)
+    if "audio" in etapas and P1.audio_ok:
+        P1.SOUND_BANK.pronto.wait(10.0)
+        P1.AUDIO_BACKEND.encerrar()
+    return out
+
+
+def _proprio(nome: str) -> bool:
+    return nome.startswith("_") and os.path.exists(os.path.join(BASE_DIR, nome + ".py"))
+
+
+def formatar(rel: Dict, top: int = 15) -> str:
+    imp = rel["imports"]
+    out = [
+        "import %s (processo novo): %s ms de import, %.1f ms de processo"
+        % (imp["modulo"], "%.1f" % imp["import_ms"] if imp["import_ms"] is not None else "?", imp["processo_ms"]),
+        "%9s %9s  %s" % ("self ms", "acum. ms", "módulo"),
+    ]
+    mais_caros = sorted(imp["modulos"], key=lambda x: x["self_ms"], reverse=True)[:top]
+    mostrar = [x for x in imp["modulos"] if x in mais_caros or _proprio(x["modulo"])]
+    for x in mostrar:
+        out.append("%9.1f %9.1f  %s%s" % (x["self_ms"], x["acumulado_ms"], "  " * x["nivel"], x["modulo"]))
+    out.append("etapas do APP (neste processo):")
+    for nome, ms in rel["etapas"].items():
+        out.append("%9s ms  %s" % ("já feita" if ms is None else "%.1f" % ms, nome))
+    return "\n".join(out)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Tempo de inicialização: imports e etapas preguiçosas do APP")
+    ap.add_argument("--modulo", default="_part3", help="módulo importado no processo novo (padrão: o runtime completo)")
+    ap.add_argument("--etapas", default=",".join(P1.AppContext.ETAPAS), help="etapas do APP a medir ('' = nenhuma)")
+    ap.add_argument("--top", type=int, default=15, help="módulos mais caros listados (os do lite2 sempre aparecem)")
+    ap.add_argument("--json", action="store_true")
+    a = ap.parse_args(argv)
+
+    etapas = [e for e in a.etapas.split(",") if e.strip()]
+    for e in etapas:
+        if e not in P1.AppContext.ETAPAS:
+            ap.error("etapa desconhecida: %s (use %s)" % (e, ", ".join(P1.AppContext.ETAPAS)))
+    rel = {"imports": medir_imports(a.modulo), "etapas": medir_etapas(etapas)}
+    print(json.dumps(rel, indent=2, ensure_ascii=False) if a.json else formatar(rel, a.top))
+    return 0 if rel["imports"]["ok"] else 1
+
+
+__all__ = [
+    "medir_imports",
+    "medir_etapas",
+    "main",
+]
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Gerador de carga do servidor de controle (thread x asyncio).
+
+Dois modos:
+- saturação (`medir_servidor`/`comparar_servidores`): clientes pedem sem pausa,
+  mede capacidade máxima;
+- painel (`executar_carga`): N clientes keep-alive num processo separado
+  (asyncio, 1 thread) pedindo as rotas no ritmo do JS do painel, enquanto
+  uma sonda repete o trabalho do ciclo do run_monitor (avaliar_de_json +
+  gerar_html) e mede quanto a carga atrasa o ciclo.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import http.client
+import json
+import multiprocessing as mp
+import queue
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import _part1 as P1
+import _part4 as P4
+import _part5 as P5
+from _metrics import percentil
+
+ROTAS_PADRAO = ("/", "/data.json", "/mute_status")
+TIMEOUT_REQ_SEC = 10.0
+
+# carga de um ciclo "típico" para a sonda do monitor
+_FIXTURE_CICLO = {
+    "ptchwnd": [0.1 * ((i % 9) - 4) for i in range(120)],
+    "rollwnd": [0.12 * ((i % 7) - 3) for i in range(120)],
+    "windspdmean": {"med. 2 min": 14.2},
+    "gustspdmax": {"instantaneo op.": 19.8},
+    "winddirmean": {"med. 2 min": 130.0},
+    "airpresslmeanv": 1012.4,
+    "_wind_source": "loadtest",
+}
+
+
+def _cliente(port: int, rotas: Sequence[str], fim: float, lat: List[float], erros: List[int], lock: threading.Lock) -> None:
+    """Cliente keep-alive: reaproveita a conexão enquanto o servidor permitir. Latência só das respostas com sucesso."""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    i = 0
+    while time.monotonic() < fim:
+        rota = rotas[i % len(rotas)]
+        i += 1
+        t0 = time.perf_counter()
+        try:
+            conn.request("GET", rota, headers={"Accept-Encoding": "gzip"})
+            resp = conn.getresponse()
+            resp.read()
+            dt = time.perf_counter() - t0
+            with lock:
+                if resp.status >= 400:
+                    erros[0] += 1
+                else:
+                    lat.append(dt)
+        except Exception:
+            with lock:
+                erros[0] += 1
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    conn.close()
+
+
+def medir_servidor(modo: str, clientes: int = 16, duracao_s: float = 5.0, rotas: Sequence[str] = ROTAS_PADRAO) -> Dict:
+    """Sobe o servidor `modo` numa porta livre, dispara `clientes` em paralelo e mede."""
+    srv = P5.start_control_server(0, modo=modo)
+    if srv is None:
+        return {"modo": modo, "erro": "servidor não subiu"}
+    port = srv.server_address[1]
+
+    lat: List[float] = []
+    erros = [0]
+    lock = threading.Lock()
+    pico_threads = threading.active_count()
+    fim = time.monotonic() + duracao_s
+    ths = [threading.Thread(target=_cliente, args=(port, rotas, fim, lat, erros, lock), daemon=True) for _ in range(clientes)]
+    t0 = time.monotonic()
+    for t in ths:
+        t.start()
+    while any(t.is_alive() for t in ths):
+        pico_threads = max(pico_threads, threading.active_count())
+        time.sleep(0.05)
+    total_s = time.monotonic() - t0
+
+    srv.shutdown()
+    srv.server_close()
+
+    n = len(lat)
+    return {
+        "modo": modo,
+        "clientes": clientes,
+        "requisicoes": n,
+        "erros": erros[0],
+        "req_por_s": round(n / total_s, 1) if total_s > 0 else None,
+        "p50_ms": round(percentil(lat, 50) * 1000, 3) if n else None,
+        "p99_ms": round(percentil(lat, 99) * 1000, 3) if n else None,
+        # descontadas as threads dos próprios clientes
+        "pico_threads_servidor": max(0, pico_threads - clientes),
+    }
+
+
+def comparar_servidores(clientes: int = 16, duracao_s: float = 5.0) -> List[Dict]:
+    return [medir_servidor(m, clientes, duracao_s) for m in ("thread", "asyncio")]
+
+
+
+# =========================================================
+# Carga no ritmo do painel
+# =========================================================
+
+def perfil_painel() -> Dict[str, float]:
+    """Rota -> período (s) de cada viewer, como o JS do HTML_TPL faz hoje (polling único)."""
+    return {"/state": float(P1.STATE_POLL_SEC)}
+
+
+def perfil_painel_legado() -> Dict[str, float]:
+    """Ritmo do painel antigo (reload + /mute_status + /wind_pref), para comparação."""
+    recarga = float(P1.HTML_REFRESH_SEC)
+    return {
+        "/": recarga,  # location.reload
+        "/wind_pref": recarga,  # hydrateWindPref a cada reload
+        "/data.json": recarga,  # pollers externos / integrações
+        "/mute_status": 3.0,  # pollMuteBadge
+    }
+
+
+async def _cliente_painel(port: int, perfil: Dict[str, float], fim: float, acelerar: float, rnd: random.Random, stats: Dict) -> None:
+    loop = asyncio.get_running_loop()
+    reader = writer = None
+    # fase aleatória para os viewers não baterem todos juntos
+    prox = {rota: loop.time() + rnd.uniform(0, per / acelerar) for rota, per in perfil.items()}
+
+    while True:
+        rota, quando = min(prox.items(), key=lambda kv: kv[1])
+        if quando >= fim:
+            break
+        await asyncio.sleep(max(0.0, quando - loop.time()))
+        prox[rota] = quando + perfil[rota] / acelerar
+
+        t0 = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                stats["conexoes"] += 1
+            writer.write(f"GET {rota} HTTP/1.1\r\nHost: 127.0.0.1\r\nAccept-Encoding: gzip\r\n\r\n".encode("latin-1"))
+            await writer.drain()
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), TIMEOUT_REQ_SEC)
+            linhas = head.decode("latin-1").split("\r\n")
+            versao, status = linhas[0].split(" ", 2)[:2]
+            hdrs = {k.strip().lower(): v.strip() for k, v in (li.split(":", 1) for li in linhas[1:] if ":" in li)}
+            await asyncio.wait_for(reader.readexactly(int(hdrs.get("content-length", "0"))), TIMEOUT_REQ_SEC)
+            if versao.upper() == "HTTP/1.0" or hdrs.get("connection", "").lower() == "close":
+                writer.close()
+                reader = writer = None
+            if int(status) >= 400:
+                stats["erros"] += 1  # sem latência: só respostas com sucesso entram nos percentis
+            else:
+                stats["lat"].setdefault(rota, []).append(time.perf_counter() - t0)
+        except Exception:
+            stats["erros"] += 1
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+
+    if writer is not None:
+        writer.close()
+
+
+async def _rodar_clientes(port: int, clientes: int, duracao_s: float, perfil: Dict[str, float], acelerar: float, semente: int) -> Dict:
+    stats: Dict = {"lat": {}, "erros": 0, "conexoes": 0}
+    fim = asyncio.get_running_loop().time() + duracao_s
+    rnd = random.Random(semente)
+    await asyncio.gather(*(_cliente_painel(port, perfil, fim, acelerar, random.Random(rnd.random()), stats) for _ in range(clientes)))
+    return stats
+
+
+def _processo_clientes(port, clientes, duracao_s, perfil, acelerar, semente, fila) -> None:
+    fila.put(asyncio.run(_rodar_clientes(port, clientes, duracao_s, perfil, acelerar, semente)))
+
+
+def _esperar_stats(fila, proc, timeout: float) -> Dict:
+    """Resultado do processo de clientes; RuntimeError (com o exit code) se ele morrer ou estourar `timeout`."""
+    fim = time.monotonic() + timeout
+    while True:
+        try:
+            return fila.get(timeout=0.5)
+        except queue.Empty:
+            pass
+        if proc.exitcode is not None:
+            try:
+                return fila.get(timeout=1.0)  # o put pode chegar logo depois da saída
+            except queue.Empty:
+                raise RuntimeError("processo de clientes saiu com código %s sem entregar o resultado" % proc.exitcode) from None
+        if time.monotonic() >= fim:
+            proc.terminate()
+            raise RuntimeError("processo de clientes não entregou o resultado em %.0f s" % timeout)
+
+
+def _sonda_ciclo(fim: float, intervalo: float, amostras: List[Tuple[float, float]]) -> None:
+    """Repete o trabalho do ciclo do run_monitor; registra (atraso ao acordar, duração)."""
+    prox = time.monotonic()
+    while True:
+        t0 = time.monotonic()
+        if t0 >= fim:
+            return
+        atraso = max(0.0, t0 - prox)
+        est = P4.avaliar_de_json(_FIXTURE_CICLO)
+        P5.gerar_html(
+            est["pitch_val"], est["roll_val"], est["pitch_cor"], est["roll_cor"], est["rot"],
+            est["raj"], est["raj_cor"], est["status_cor"], est.get("wdir_adj"), est.get("barometro"),
+            est.get("wdir_lbl"), est.get("vento_med"), est.get("vento_cor", "verde"), est.get("wind_source"),
+        )
+        amostras.append((atraso, time.monotonic() - t0))
+        prox += intervalo
+        time.sleep(max(0.0, prox - time.monotonic()))
+
+
+def _resumo_sonda(amostras: List[Tuple[float, float]]) -> Dict:
+    atrasos = [a for a, _ in amostras]
+    trabalho = [t for _, t in amostras]
+
+    def _ms(v):
+        return None if v is None else round(v * 1000, 3)
+
+    return {
+        "ciclos": len(amostras),
+        "atraso_p50_ms": _ms(percentil(atrasos, 50)),
+        "atraso_p99_ms": _ms(percentil(atrasos, 99)),
+        "trabalho_p50_ms": _ms(percentil(trabalho, 50)),
+        "trabalho_p99_ms": _ms(percentil(trabalho, 99)),
+    }
+
+
+def _medir_sonda(duracao_s: float, intervalo: float) -> Dict:
+    amostras: List[Tuple[float, float]] = []
+    _sonda_ciclo(time.monotonic() + duracao_s, intervalo, amostras)
+    return _resumo_sonda(amostras)
+
+
+def executar_carga(
+    modo: str = "thread",
+    clientes: int = 20,
+    duracao_s: float = 20.0,
+    acelerar: float = 1.0,
+    ciclo_s: float = 0.5,
+    perfil: Optional[Dict[str, float]] = None,
+    semente: int = 1,
+) -> Dict:
+    """
+    Sobe o servidor `modo`, mede a sonda do ciclo sem carga, depois com
+    `clientes` viewers no ritmo do painel (multiplicado por `acelerar`).
+    """
+    perfil = perfil or perfil_painel()
+    srv = P5.start_control_server(0, modo=modo)
+    if srv is None:
+        return {"modo": modo, "erro": "servidor não subiu"}
+    port = srv.server_address[1]
+
+    try:
+        base_threads = threading.active_count()
+        sonda_base = _medir_sonda(min(duracao_s, 5.0), ciclo_s)
+
+        fila = mp.Queue()
+        proc = mp.Process(target=_processo_clientes, args=(port, clientes, duracao_s, perfil, acelerar, semente, fila), daemon=True)
+        amostras: List[Tuple[float, float]] = []
+        fim = time.monotonic() + duracao_s
+        sonda = threading.Thread(target=_sonda_ciclo, args=(fim, ciclo_s, amostras), daemon=True)
+
+        proc.start()
+        sonda.start()
+        threads: List[int] = []
+        while time.monotonic() < fim:
+            threads.append(threading.active_count())
+            time.sleep(0.05)
+        sonda.join()
+        try:
+            stats = _esperar_stats(fila, proc, duracao_s + 30.0)
+        except RuntimeError as e:
+            P1.log.error("Loadtest: %s", e)
+            return {"modo": modo, "erro": str(e)}
+        proc.join(5.0)
+    finally:
+        srv.shutdown()
+        srv.server_close()
+
+    todas = [v for lst in stats["lat"].values() for v in lst]
+    n = len(todas)
+    carga = _resumo_sonda(amostras)
+    delta = {}
+    for k in ("atraso_p50_ms", "atraso_p99_ms", "trabalho_p50_ms", "trabalho_p99_ms"):
+        if carga.get(k) is not None and sonda_base.get(k) is not None:
+            delta[k] = round(carga[k] - sonda_base[k], 3)
+
+    return {
+        "modo": modo,
+        "clientes": clientes,
+        "duracao_s": duracao_s,
+        "acelerar": acelerar,
+        "requisicoes": n,
+        "req_por_s": round(n / duracao_s, 2) if duracao_s > 0 else None,
+        "erros": stats["erros"],
+        # n conta só sucessos: tentativas = sucessos + erros
+        "taxa_erro": round(stats["erros"] / (n + stats["erros"]), 5) if (n + stats["erros"]) else 0.0,
+        "conexoes_abertas": stats["conexoes"],
+        "p50_ms": round(percentil(todas, 50) * 1000, 3) if n else None,
+        "p99_ms": round(percentil(todas, 99) * 1000, 3) if n else None,
+        "por_rota": {
+            rota: {
+                "n": len(lst),
+                "p50_ms": round(percentil(lst, 50) * 1000, 3),
+                "p99_ms": round(percentil(lst, 99) * 1000, 3),
+            }
+            for rota, lst in sorted(stats["lat"].items())
+        },
+        # threads do processo do servidor (clientes rodam em outro processo)
+        "threads_base": base_threads,
+        "threads_pico": max(threads) if threads else base_threads,
+        "threads_media": round(sum(threads) / len(threads), 1) if threads else base_threads,
+        "ciclo_sem_carga": sonda_base,
+        "ciclo_com_carga": carga,
+        "ciclo_delta": delta,
+    }
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Carga no servidor de controle do lite2")
+    ap.add_argument("--clientes", type=int, default=20, help="viewers simultâneos (keep-alive)")
+    ap.add_argument("--duracao", type=float, default=20.0, help="segundos de carga por servidor")
+    ap.add_argument("--acelerar", type=float, default=1.0, help="multiplica o ritmo de polling do painel")
+    ap.add_argument("--ciclo", type=float, default=0.5, help="intervalo (s) da sonda do ciclo do monitor")
+    ap.add_argument("--server", choices=("thread", "asyncio", "ambos"), default="ambos")
+    ap.add_argument("--perfil", choices=("state", "legado"), default="state", help="ritmo do painel atual (/state) ou do antigo")
+    ap.add_argument("--saturar", action="store_true", help="modo saturação (sem pausa entre pedidos)")
+    a = ap.parse_args(argv)
+    perfil = perfil_painel() if a.perfil == "state" else perfil_painel_legado()
+
+    modos = ("thread", "asyncio") if a.server == "ambos" else (a.server,)
+    if a.saturar:
+        out = [medir_servidor(m, a.clientes, a.duracao) for m in modos]
+    else:
+        out = [executar_carga(m, a.clientes, a.duracao, a.acelerar, a.ciclo, perfil) for m in modos]
+    print(json.dumps(out, indent=2, ensure_ascii=False))
+    return 0
+
+
+__all__ = [
+    "perfil_painel",
+    "perfil_painel_legado",
+    "medir_servidor",
+    "comparar_servidores",
+    "executar_carga",
+    "main",
+]
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Vazamentos em execuções longas: amostras periódicas de RSS, tracemalloc, threads e objetos, com aviso de crescimento (/debug/memory)."""
+
+from __future__ import annotations
+
+import ctypes
+import gc
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+from typing import Dict, List, Optional
+
+import _metrics as M
+
+INTERVALO_SEC = 300.0  # entre amostras
+JANELA = 12  # amostras comparadas (12 x 5 min = 1 h)
+ALERTA_MB = 32.0  # RSS ou tracemalloc crescendo mais que isto na janela
+ALERTA_THREADS = 8
+ALERTA_OBJETOS = 20_000  # por tipo
+TOP = 15  # linhas de tracemalloc / tipos de objeto no relatório
+TRACEMALLOC_FRAMES = 1
+
+RSS_BYTES = M.gauge("lite2_memory_rss_bytes", "Memória residente do processo na última amostra")
+TRACED_BYTES = M.gauge("lite2_memory_traced_bytes", "Memória alocada rastreada pelo tracemalloc na última amostra")
+GROWTH_WARNINGS = M.counter("lite2_memory_growth_warnings_total", "Avisos de crescimento na janela de amostras", ("kind",))
+
+_RE_NUM = re.compile(r"\d+")
+
+
+def rss_bytes() -> Optional[int]:
+    """RSS atual (Windows: GetProcessMemoryInfo; Linux: /proc/self/statm); None se não der."""
+    if sys.platform == "win32":
+        try:
+
+            class _PMC(ctypes.Structure):
+                _fields_ = [
+                    ("cb", ctypes.c_ulong),
+                    ("PageFaultCount", ctypes.c_ulong),
+                    ("PeakWorkingSetSize", ctypes.c_size_t),
+                    ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t),
+                    ("PeakPagefileUsage", ctypes.c_size_t),
+                ]
+
+            pmc = _PMC()
+            pmc.cb = ctypes.sizeof(pmc)
+            proc = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.psapi.GetProcessMemoryInfo(proc, ctypes.byref(pmc), pmc.cb):
+                return int(pmc.WorkingSetSize)
+        except Exception:
+            return None
+        return None
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        return None
+
+
+def censo_threads() -> Dict[str, int]:
+    """Threads vivas agrupadas por nome com os números trocados por N ("Thread-N (process_request_thread)")."""
+    out: Dict[str, int] = {}
+    for t in threading.enumerate():
+        nome = _RE_NUM.sub("N", t.name)
+        out[nome] = out.get(nome, 0) + 1
+    return dict(sorted(out.items(), key=lambda x: x[1], reverse=True))
+
+
+def contar_objetos() -> Dict[str, int]:
+    """Objetos rastreados pelo gc, por tipo."""
+    out: Dict[str, int] = {}
+    for o in gc.get_objects():
+        nome = type(o).__name__
+        out[nome] = out.get(nome, 0) + 1
+    return out
+
+
+class Amostra:
+    __slots__ = ("epoch", "rss", "traced", "threads", "objetos", "gc_total")
+
+    def __init__(self, epoch, rss, traced, threads, objetos):
+        self.epoch = epoch
+        self.rss: Optional[int] = rss
+        self.traced: Optional[int] = traced
+        self.threads: Dict[str, int] = threads
+        self.objetos: Dict[str, int] = objetos
+        self.gc_total = sum(objetos.values())
+
+    def as_dict(self, top: int = TOP) -> Dict:
+        return {
+            "epoch": round(self.epoch, 3),
+            "rss_mb": None if self.rss is None else round(self.rss / 1e6, 2),
+            "traced_mb": None if self.traced is None else round(self.traced / 1e6, 2),
+            "threads": sum(self.threads.values()),
+            "objetos_gc": self.gc_total,
+        }
+
+
+class MonitorMemoria:
+    """
+    - `amostrar()` tira uma amostra (RSS, total do tracemalloc se ligado,
+      censo de threads por nome, contagem de objetos do gc por tipo) e a
+      guarda numa janela de `janela` amostras; roda a cada `intervalo` s
+      numa thread própria ("lite2-memoria") depois de `iniciar()`. Fica
+      fora do Agendador: com tracemalloc o snapshot e o censo do gc levam
+      de centenas de ms a segundos num heap grande, e lá atrasariam as
+      confirmações de alarme.
+    - Com tracemalloc ligado (LITE2_TRACEMALLOC=1 no início ou
+      `/debug/memory?tracemalloc=1`), guarda o snapshot da primeira amostra
+      e o da anterior; o relatório traz o diff por linha contra cada um.
+    - Comparando a amostra nova com a mais antiga da janela (cheia): RSS ou
+      tracemalloc acima de ALERTA_MB, threads acima de ALERTA_THREADS ou
+      algum tipo acima de ALERTA_OBJETOS viram evento MEM_GROWTH no log.
+      Cada tipo de aviso só repete depois que o crescimento some.
+    """
+
+    def __init__(
+        self,
+        log=None,
+        log_event=None,
+        intervalo: float = INTERVALO_SEC,
+        janela: int = JANELA,
+        alerta_mb: float = ALERTA_MB,
+        alerta_threads: int = ALERTA_THREADS,
+        alerta_objetos: int = ALERTA_OBJETOS,
+    ):
+        self.log = log
+        self.log_event = log_event
+        self.intervalo = float(intervalo)
+        self.alerta_mb = float(alerta_mb)
+        self.alerta_threads = int(alerta_threads)
+        self.alerta_objetos = int(alerta_objetos)
+        self._lock = threading.Lock()
+        self._amostras: deque = deque(maxlen=max(2, int(janela)))
+        self._snap_primeiro = None
+        self._snap_anterior = None
+        self._snap_atual = None
+        self._avisos_ativos: Dict[str, Dict] = {}
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # -----------------------------------------------------
+    # ciclo de vida
+    # -----------------------------------------------------
+    def iniciar(self, tracemalloc_ligado: bool = False) -> None:
+        if tracemalloc_ligado:
+            self.ligar_tracemalloc()
+        if self._thread is None or not self._thread.is_alive():
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._rodar, name="lite2-memoria", daemon=True)
+            self._thread.start()
+
+    def parar(self, timeout: float = 1.0) -> None:
+        self._parar.set()
+        th, self._thread = self._thread, None
+        if th is not None and th is not threading.current_thread():
+            th.join(timeout)
+
+    def _rodar(self) -> None:
+        # primeira amostra já na partida; depois a cada `intervalo`
+        while True:
+            self._amostrar_seguro()
+            if self._parar.wait(self.intervalo):
+                return
+
+    def ligar_tracemalloc(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        with self._lock:
+            self._snap_primeiro = self._snap_anterior = self._snap_atual = None
+
+    def desligar_tracemalloc(self) -> None:
+        with self._lock:
+            self._snap_primeiro = self._snap_anterior = self._snap_atual = None
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    # -----------------------------------------------------
+    # amostragem
+    # -----------------------------------------------------
+    def _amostrar_seguro(self) -> None:
+        try:
+            self.amostrar()
+        except Exception:
+            if self.log:
+                self.log.debug("Falha na amostra de memória", exc_info=True)
+
+    def amostrar(self) -> Amostra:
+        traced, snap = None, None
+        if tracemalloc.is_tracing():
+            traced = tracemalloc.get_traced_memory()[0]
+            snap = tracemalloc.take_snapshot().filter_traces(
+                (
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                    tracemalloc.Filter(False, "<unknown>"),
+                )
+            )
+        a = Amostra(time.time(), rss_bytes(), traced, censo_threads(), contar_objetos())
+        with self._lock:
+            self._amostras.append(a)
+            if snap is not None:
+                self._snap_anterior = self._snap_atual
+                self._snap_atual = snap
+                if self._snap_primeiro is None:
+                    self._snap_primeiro = snap
+        if a.rss is not None:
+            RSS_BYTES.set(a.rss)
+        if a.traced is not None:
+            TRACED_BYTES.set(a.traced)
+        self._verificar()
+        return a
+
+    def crescimento(self) -> Dict[str, Dict]:
+        """Crescimentos acima dos limites entre a amostra mais antiga e a mais nova da janela (cheia)."""
+        with self._lock:
+            if len(self._amostras) < self._amostras.maxlen:
+                return {}
+            a0, a1 = self._amostras[0], self._amostras[-1]
+        horas = max(1e-9, (a1.epoch - a0.epoch) / 3600.0)
+        out: Dict[str, Dict] = {}
+        for tipo, v0, v1 in (("rss", a0.rss, a1.rss), ("tracemalloc", a0.traced, a1.traced)):
+            if v0 is not None and v1 is not None and (v1 - v0) / 1e6 > self.alerta_mb:
+                out[tipo] = {"de_mb": round(v0 / 1e6, 2), "para_mb": round(v1 / 1e6, 2), "mb_por_hora": round((v1 - v0) / 1e6 / horas, 2)}
+        t0, t1 = sum(a0.threads.values()), sum(a1.threads.values())
+        if t1 - t0 > self.alerta_threads:
+            por_nome = {n: c - a0.threads.get(n, 0) for n, c in a1.threads.items() if c > a0.threads.get(n, 0)}
+            out["threads"] = {"de": t0, "para": t1, "por_nome": por_nome}
+        tipos = {n: c - a0.objetos.get(n, 0) for n, c in a1.objetos.items() if c - a0.objetos.get(n, 0) > self.alerta_objetos}
+        if tipos:
+            out["objetos"] = {"por_tipo": dict(sorted(tipos.items(), key=lambda x: x[1], reverse=True)[:TOP])}
+        return out
+
+    def _verificar(self) -> None:
+        atual = self.crescimento()
+        for tipo, det in atual.items():
+            if tipo in self._avisos_ativos:
+                continue
+            GROWTH_WARNINGS.inc(kind=tipo)
+            if self.log_event:
+                self.log_event("MEM_GROWTH", kind=tipo, **{k: v for k, v in det.items() if not isinstance(v, dict)})
+            if self.log:
+                self.log.warning("Crescimento de memória (%s) na janela: %s", tipo, det)
+        self._avisos_ativos = atual
+
+    # -----------------------------------------------------
+    # relatório
+    # -----------------------------------------------------
+    @staticmethod
+    def _diff(novo, velho, top: int) -> List[Dict]:
+        if novo is None or velho is None:
+            return []
+        out = []
+        for st in novo.compare_to(velho, "lineno")[:top]:
+            fr = st.traceback[0]
+            out.append(
+                {
+                    "onde": "%s:%d" % (os.path.basename(fr.filename), fr.lineno),
+                    "kb": round(st.size / 1024.0, 1),
+                    "kb_diff": round(st.size_diff / 1024.0, 1),
+                    "blocos_diff": st.count_diff,
+                }
+            )
+        return out
+
+    def resumo(self, top: int = TOP) -> Dict:
+        with self._lock:
+            amostras = list(self._amostras)
+            primeiro, anterior, atual = self._snap_primeiro, self._snap_anterior, self._snap_atual
+        ult = amostras[-1] if amostras else None
+        base = amostras[0] if amostras else None
+        objetos_diff = {}
+        if ult is not None and base is not None:
+            objetos_diff = {n: c - base.objetos.get(n, 0) for n, c in ult.objetos.items() if c != base.objetos.get(n, 0)}
+        return {
+            "intervalo_sec": self.intervalo,
+            "janela": self._amostras.maxlen,
+            "tracemalloc": tracemalloc.is_tracing(),
+            "limites": {"mb": self.alerta_mb, "threads": self.alerta_threads, "objetos": self.alerta_objetos},
+            "amostras": [a.as_dict() for a in amostras],
+            "threads": ult.threads if ult else censo_threads(),
+            "objetos_top": dict(sorted(ult.objetos.items(), key=lambda x: x[1], reverse=True)[:top]) if ult else {},
+            "objetos_diff_janela": dict(sorted(objetos_diff.items(), key=lambda x: abs(x[1]), reverse=True)[:top]),
+            "tracemalloc_diff_anterior": self._diff(atual, anterior, top),
+            "tracemalloc_diff_inicio": self._diff(atual, primeiro, top),
+            "avisos": self._avisos_ativos,
+        }
+
+
+__all__ = [
+    "INTERVALO_SEC",
+    "JANELA",
+    "rss_bytes",
+    "censo_threads",
+    "contar_objetos",
+    "MonitorMemoria",
+]
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Métricas em memória (contadores/histogramas) no formato texto do Prometheus."""
+
+from __future__ import annotations
+
+import functools
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# buckets em segundos: de 1 ms (avaliação/HTML) a 30 s (timeouts HTTP, ciclo)
+BUCKETS_PADRAO = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_LabelKey = Tuple[str, ...]
+
+
+def _esc(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(v: float) -> str:
+    if v == math.inf:
+        return "+Inf"
+    if float(v).is_integer():
+        return str(int(v))
+    return repr(float(v))
+
+
+class _Metrica:
+    tipo = ""
+
+    def __init__(self, nome: str, ajuda: str, labels: Sequence[str] = ()):
+        self.nome, self.ajuda, self.labels = nome, ajuda, tuple(labels)
+        self._lock = threading.Lock()
+
+    def _chave(self, kv: Dict[str, object]) -> _LabelKey:
+        if set(kv) != set(self.labels):
+            raise ValueError(f"{self.nome}: labels esperados {self.labels}, recebidos {tuple(kv)}")
+        return tuple(str(kv[k]) for k in self.labels)
+
+    def _labels_txt(self, chave: _LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+        pares = [f'{k}="{_esc(v)}"' for k, v in zip(self.labels, chave)]
+        if extra:
+            pares.append(f'{extra[0]}="{_esc(extra[1])}"')
+        return "{" + ",".join(pares) + "}" if pares else ""
+
+    def _cabecalho(self) -> List[str]:
+        return [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} {self.tipo}"]
+
+    def exposicao(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metrica):
+    tipo = "counter"
+
+    def __init__(self, nome, ajuda, labels=()):
+        super().__init__(nome, ajuda, labels)
+        self._vals: Dict[_LabelKey, float] = {}
+
+    def inc(self, n: float = 1.0, **labels) -> None:
+        k = self._chave(labels)
+        with self._lock:
+            self._vals[k] = self._vals.get(k, 0.0) + n
+
+    def valor(self, **labels) -> float:
+        with self._lock:
+            return self._vals.get(self._chave(labels), 0.0)
+
+    def exposicao(self) -> List[str]:
+        with self._lock:
+            itens = sorted(self._vals.items())
+        return self._cabecalho() + [f"{self.nome}{self._labels_txt(k)} {_fmt(v)}" for k, v in itens]
+
+
+class Gauge(_Metrica):
+    """Valor instantâneo; `funcao` (opcional) é lida na hora da exposição."""
+
+    tipo = "gauge"
+
+    def __init__(self, nome, ajuda, labels=(), funcao: Optional[Callable[[], float]] = None):
+        super().__init__(nome, ajuda, labels)
+        self._vals: Dict[_LabelKey, float] = {}
+        self._funcao = funcao
+
+    def set(self, v: float, **labels) -> None:
+        k = self._chave(labels)
+        with self._lock:
+            self._vals[k] = float(v)
+
+    def exposicao(self) -> List[str]:
+        if self._funcao is not None:
+            try:
+                return self._cabecalho() + [f"{self.nome} {_fmt(float(self._funcao()))}"]
+            except Exception:
+                return self._cabecalho()
+        with self._lock:
+            itens = sorted(self._vals.items())
+        return self._cabecalho() + [f"{self.nome}{self._labels_txt(k)} {_fmt(v)}" for k, v in itens]
+
+
+class Histogram(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nome, ajuda, labels=(), buckets: Sequence[float] = BUCKETS_PADRAO):
+        super().__init__(nome, ajuda, labels)
+        self.buckets = tuple(sorted(buckets))
+        # chave -> [contagens por bucket (não cumulativas) + overflow, soma, total]
+        self._vals: Dict[_LabelKey, list] = {}
+
+    def observe(self, v: float, **labels) -> None:
+        k = self._chave(labels)
+        i = bisect_left(self.buckets, v)
+        with self._lock:
+            st = self._vals.get(k)
+            if st is None:
+                st = self._vals[k] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            st[0][i] += 1
+            st[1] += v
+            st[2] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def contagem(self, **labels) -> int:
+        with self._lock:
+            st = self._vals.get(self._chave(labels))
+            return st[2] if st else 0
+
+    def exposicao(self) -> List[str]:
+        with self._lock:
+            itens = sorted((k, ([*st[0]], st[1], st[2])) for k, st in self._vals.items())
+        out = self._cabecalho()
+        for k, (cont, soma, total) in itens:
+            acum = 0
+            for le, c in zip(self.buckets + (math.inf,), cont):
+                acum += c
+                out.append(f"{self.nome}_bucket{self._labels_txt(k, ('le', _fmt(le)))} {acum}")
+            out.append(f"{self.nome}_sum{self._labels_txt(k)} {_fmt(soma)}")
+            out.append(f"{self.nome}_count{self._labels_txt(k)} {total}")
+        return out
+
+
+def cronometrar(hist: Histogram, **labels):
+    """Decorator: observa a duração de cada chamada em `hist`."""
+
+    def _dec(fn):
+        @functools.wraps(fn)
+        def _wrap(*args, **kwargs):
+            with hist.time(**labels):
+                return fn(*args, **kwargs)
+
+        return _wrap
+
+    return _dec
+
+
+class Registro:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metricas: Dict[str, _Metrica] = {}
+
+    def _registrar(self, cls, nome, *args, **kwargs):
+        with self._lock:
+            m = self._metricas.get(nome)
+            if m is None:
+                m = self._metricas[nome] = cls(nome, *args, **kwargs)
+            elif not isinstance(m, cls):
+                raise ValueError(f"métrica {nome} já registrada como {m.tipo}")
+            return m
+
+    def counter(self, nome: str, ajuda: str, labels: Sequence[str] = ()) -> Counter:
+        return self._registrar(Counter, nome, ajuda, labels)
+
+    def gauge(self, nome: str, ajuda: str, labels: Sequence[str] = (), funcao=None) -> Gauge:
+        return self._registrar(Gauge, nome, ajuda, labels, funcao=funcao)
+
+    def histogram(self, nome: str, ajuda: str, labels: Sequence[str] = (), buckets=BUCKETS_PADRAO) -> Histogram:
+        return self._registrar(Histogram, nome, ajuda, labels, buckets=buckets)
+
+    def exposicao(self) -> str:
+        with self._lock:
+            metricas = [self._metricas[n] for n in sorted(self._metricas)]
+        linhas: List[str] = []
+        for m in metricas:
+            linhas.extend(m.exposicao())
+        return "\n".join(linhas) + "\n"
+
+
+def percentil(valores: Sequence[float], p: float) -> Optional[float]:
+    """Percentil p (0-100) pelo vizinho mais próximo; None sem valores. Usado nos relatórios das ferramentas."""
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    idx = min(len(ordenados) - 1, max(0, int(round(p / 100.0 * (len(ordenados) - 1)))))
+    return ordenados[idx]
+
+
+REGISTRO = Registro()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+counter = REGISTRO.counter
+gauge = REGISTRO.gauge
+histogram = REGISTRO.histogram
+exposicao = REGISTRO.exposicao
+
+
+# =========================================================
+# Métricas do lite2 (declaradas aqui para ficarem num lugar só)
+# =========================================================
+HTTP_FETCH_SEC = histogram("lite2_http_fetch_seconds", "Duração de coletar_json por host (todas as tentativas)", ("host", "result"))
+HTTP_RETRIES = counter("lite2_http_retries_total", "Tentativas extras em coletar_json", ("host",))
+WIND_FALLTHROUGH = counter("lite2_wind_fallthrough_total", "Hosts de vento pulados pelo fallback", ("host", "reason"))
+WIND_HOST_USED = counter("lite2_wind_host_used_total", "Host de vento aceito (position 0 = primeiro da ordem)", ("host", "position"))
+WIND_ALL_FAILED = counter("lite2_wind_all_failed_total", "Ciclos sem nenhum host de vento válido")
+AVALIAR_SEC = histogram("lite2_avaliar_de_json_seconds", "Duração de avaliar_de_json")
+GERAR_HTML_SEC = histogram("lite2_gerar_html_seconds", "Duração de gerar_html")
+CYCLE_SEC = histogram("lite2_cycle_seconds", "Duração do ciclo do run_monitor (sem a espera)")
+CYCLE_OVERRUNS = counter("lite2_cycle_overruns_total", "Ciclos que passaram de COLETA_INTERVAL")
+ALARM_CONFIRM = counter("lite2_alarm_confirm_total", "Resultados das confirmações de alarme", ("stage", "result"))
+ALARM_PLAYED = counter("lite2_alarm_played_total", "Alarmes pitch/roll tocados", ("level",))
+ALARM_SUPPRESS = counter("lite2_alarm_suppress_total", "Alarmes suprimidos (motivos do ALARM_SUPPRESS)", ("reason",))
+AUDIO_SEQ_WAIT_SEC = histogram("lite2_audio_seq_wait_seconds", "Espera de uma sequência de áudio por lock + canais livres", ("seq",))
+AUDIO_SEQ_TIMEOUT = counter("lite2_audio_seq_timeout_total", "Sequências de áudio canceladas por timeout", ("seq", "cause"))
+HTTP_REQUESTS = counter("lite2_control_requests_total", "Requisições no servidor de controle", ("path", "code"))
+THREADS = gauge("lite2_threads", "Threads vivas no processo", funcao=threading.active_count)
+
+
+__all__ = [
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "Registro",
+    "cronometrar",
+    "percentil",
+    "REGISTRO",
+    "CONTENT_TYPE",
+    "counter",
+    "gauge",
+    "histogram",
+    "exposicao",
+]
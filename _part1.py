@@ -16,12 +16,19 @@ import sys
 import threading
 import time
 
-import tempfile
 from datetime import datetime, timedelta
 
 from ctypes import wintypes
-from typing import Optional, Any
-from logging.handlers import RotatingFileHandler
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlsplit
+
+import _metrics as M
+from _audiobackend import AUDIO_BACKEND_ENV, AudioBackend, criar_backend
+from _audioqueue import AudioDispatcher
+from _ciclos import RegistroCiclos
+from _memoria import MonitorMemoria
+from _scheduler import Agendador
+from _soundbank import ClipCompositor, SoundBank
 
 
 # =========================
@@ -43,6 +50,7 @@ def _can_write_in_dir(d: str) -> bool:
 
 def escolher_output_dir(app_name: str = "lite2") -> str:
     """Escolhe saída: exe/script, %LOCALAPPDATA%/<app>, %TEMP%/<app>, cwd."""
+    import tempfile
 
     candidates = []
 
@@ -67,18 +75,20 @@ def escolher_output_dir(app_name: str = "lite2") -> str:
 
 
 # =========================
-# Dependências opcionais
+# Dependências opcionais (só localizadas aqui; o import fica para a etapa
+# do APP que usa cada uma: "http" -> requests, "audio" -> pygame)
 # =========================
 requests_spec = importlib.util.find_spec("requests")
-requests = importlib.import_module("requests") if requests_spec else None
+requests = None
 
 pygame_spec = importlib.util.find_spec("pygame")
-pygame = importlib.import_module("pygame") if pygame_spec else None
+pygame = None
 
 # =========================
 # Constantes
 # =========================
 HTML_REFRESH_SEC, HTML_STALE_MAX_AGE_SEC = 10, 40
+STATE_POLL_SEC = 6  # painel: intervalo do polling único em /state
 HTML_WIN_PITCH = HTML_WIN_ROLL = 39
 COLETA_INTERVAL = 9
 
@@ -119,11 +129,24 @@ JANELA_WIND_SEC, TOP_N_WIND = 120, 4
 LOG_RETENCAO_HRS, VENTO_ALARME_CHECK_INTERVAL_MIN = 36, 15
 VENTO_ALARME_THRESHOLD, VENTO_REARME_MIN = 23.0, 90.0
 MUTE_CTRL_PORT = 8765
+CONTROL_SERVER_MODE = "thread"  # "thread" (ThreadingHTTPServer) | "asyncio" (_aserver)
+CONTROL_MAX_CONNS = 64  # asyncio: conexões atendidas ao mesmo tempo; excedentes são aceitas, esperam vaga até _aserver.ESPERA_VAGA_SEC e então recebem 503
+CONTROL_KEEPALIVE_SEC = 15.0  # asyncio: fecha conexão keep-alive ociosa
+AQUISICAO_MODO = "local"  # "local" (no loop do monitor) | "processo" (_aquisicao, anel em memória compartilhada)
+
+GET_PATH = "/get/data?missingvalues=null"
+# URL de dados do PyHMS por host; LITE2_URL_MODELO aponta para outro servidor (p.ex. o do --soak)
+URL_MODELO = os.environ.get("LITE2_URL_MODELO", "http://{host}:8509" + GET_PATH)
+HOST_PITCH_ROLL = "smp18ocn01"
+
 
-URL_SMP_PITCH_ROLL = "http://smp18ocn01:8509/get/data?missingvalues=null"
+def url_dados(host: str) -> str:
+    return URL_MODELO.format(host=host)
+
+
+URL_SMP_PITCH_ROLL = url_dados(HOST_PITCH_ROLL)
 WIND_HOSTS_ORDER = ["smp18ocn01", "smp19ocn02", "smp35ocn01", "smp53ocn01"]
 WIND_PREF: Optional[str] = None
-GET_PATH = "/get/data?missingvalues=null"
 KEYS_PR = ("ptchwnd", "rollwnd")
 KEYS_WIND = (
     "windwnd",
@@ -183,7 +206,6 @@ def _app_home_dir() -> Path:
 
 APP_HOME = _app_home_dir()
 OUTPUT_DIR = str((APP_HOME / "runtime").resolve())
-Path(OUTPUT_DIR).mkdir(parents=True, exist_ok=True)
 
 
 FILES = {
@@ -195,6 +217,10 @@ FILES = {
     "html": os.path.join(OUTPUT_DIR, "pitch_roll.html"),
 }
 
+# Histórico bruto (janelas ptchwnd/rollwnd por ciclo) para o --backtest; LITE2_HISTORICO=1 liga
+HISTORICO_DIR = os.path.join(OUTPUT_DIR, "historico")
+HISTORICO_GRAVAR = os.environ.get("LITE2_HISTORICO", "") == "1"
+
 
 def ordered_wind_hosts(preferencia: Optional[str] = None):
     """Retorna a ordem de hosts de vento, priorizando a preferência quando válida."""
@@ -203,29 +229,105 @@ def ordered_wind_hosts(preferencia: Optional[str] = None):
     return list(WIND_HOSTS_ORDER)
 
 
+# =========================
+# Contexto da aplicação (inicialização preguiçosa)
+# =========================
+class AppContext:
+    """
+    Os efeitos colaterais de subir o programa (pasta de saída, logging com
+    retenção, requests, pygame/mixer/banco de sons) são etapas registradas
+    aqui e executadas uma única vez: no primeiro uso (`garantir`) ou todas
+    de uma vez em `iniciar()`, que o monitor chama ao começar. Importar os
+    módulos não toca disco, rede nem áudio, então `--stop` e as
+    ferramentas só pagam pelo que usam. `tempos` guarda quanto cada etapa
+    levou (relatório do --tempo-inicio).
+    """
+
+    ETAPAS = ("saida", "logging", "http", "audio")
+
+    def __init__(self):
+        self._etapas: Dict[str, Callable[[], Any]] = {}
+        self._lock = threading.RLock()
+        self._andamento: set = set()
+        self.tempos: Dict[str, float] = {}
+
+    def registrar(self, nome: str, fn: Callable[[], Any]) -> None:
+        self._etapas[nome] = fn
+
+    def pronto(self, nome: str) -> bool:
+        return nome in self.tempos
+
+    def marcar(self, nome: str) -> None:
+        """Dá a etapa por feita sem rodar (p.ex. backend de áudio escolhido à mão)."""
+        with self._lock:
+            self.tempos.setdefault(nome, 0.0)
+
+    def garantir(self, nome: str) -> None:
+        if nome in self.tempos:
+            return
+        with self._lock:
+            # reentrada (a etapa loga enquanto sobe) não roda de novo
+            if nome in self.tempos or nome in self._andamento:
+                return
+            self._andamento.add(nome)
+            t0 = time.perf_counter()
+            try:
+                self._etapas[nome]()
+            finally:
+                self._andamento.discard(nome)
+                self.tempos[nome] = time.perf_counter() - t0
+
+    def iniciar(self, etapas=ETAPAS) -> None:
+        for nome in etapas:
+            self.garantir(nome)
+
+
+APP = AppContext()
+
+
+def _preparar_saida() -> None:
+    Path(OUTPUT_DIR).mkdir(parents=True, exist_ok=True)
+
+
+APP.registrar("saida", _preparar_saida)
+
+
 # =========================
 # Logging (no arquivo único)
 # =========================
 _LOGGING_CONFIGURED = False
+_LOG_HANDLER: Optional[logging.Handler] = None
+
+
+class _HandlerPreguicoso(logging.Handler):
+    """Primeiro registro emitido sobe a etapa "logging" e segue para o handler real."""
 
+    def emit(self, record: logging.LogRecord) -> None:
+        APP.garantir("logging")
+        h = _LOG_HANDLER
+        if h is not None:
+            h.handle(record)
+        elif record.levelno >= logging.WARNING:
+            # durante a própria configuração (falha na retenção)
+            logging.lastResort.handle(record)
 
-def _setup_logging() -> logging.Logger:
-    """Configura logging (idempotente) no arquivo único e devolve o logger nomeado."""
-    global _LOGGING_CONFIGURED
+
+def _setup_logging(retencao: bool = True) -> logging.Logger:
+    """
+    Configura logging (idempotente) no arquivo único, com retenção, e devolve o logger nomeado.
+    `retencao=False` só abre o arquivo (processo auxiliar: quem reescreve é o principal).
+    """
+    global _LOGGING_CONFIGURED, _LOG_HANDLER
 
     logger = logging.getLogger("painel")
     if _LOGGING_CONFIGURED:
         return logger
 
-    level_name = os.environ.get("PITCHROLL_LOG_LEVEL", "INFO").upper()
-    level = getattr(logging, level_name, logging.INFO)
-    logger.setLevel(level)
-    logger.propagate = False
-
     fmt = logging.Formatter("%(asctime)s [%(levelname)s] %(message)s")
 
     try:
-        _apply_log_retention()
+        if retencao:
+            _apply_log_retention()
         os.makedirs(os.path.dirname(FILES["events"]), exist_ok=True)
         handler = logging.FileHandler(FILES["events"], encoding="utf-8")
     except Exception:
@@ -236,12 +338,22 @@ def _setup_logging() -> logging.Logger:
     # evita duplicar handlers se recarregar módulo em dev
     if not any(type(h) is type(handler) for h in logger.handlers):
         logger.addHandler(handler)
+    _LOG_HANDLER = next(h for h in logger.handlers if type(h) is type(handler))
+    logger.removeHandler(_HANDLER_PREGUICOSO)
 
     _LOGGING_CONFIGURED = True
     return logger
 
 
-log = _setup_logging()
+# No import só o logger (nível/propagação); arquivo e retenção sobem no
+# primeiro registro emitido ou no APP.iniciar().
+log = logging.getLogger("painel")
+log.setLevel(getattr(logging, os.environ.get("PITCHROLL_LOG_LEVEL", "INFO").upper(), logging.INFO))
+log.propagate = False
+_HANDLER_PREGUICOSO = _HandlerPreguicoso()
+if not log.handlers:
+    log.addHandler(_HANDLER_PREGUICOSO)
+APP.registrar("logging", _setup_logging)
 
 
 
@@ -450,7 +562,7 @@ _mutex_handle = None
 
 def signal_quit(name: str = QUIT_EVENT_NAME) -> bool:
     if not kernel32:
-        return False
+        return _sinalizar_pid()
     h = kernel32.OpenEventW(EVENT_MODIFY_STATE, False, name)
     if not h:
         return False
@@ -463,7 +575,7 @@ def signal_quit(name: str = QUIT_EVENT_NAME) -> bool:
 def obter_mutex():
     global _mutex_handle
     if not kernel32:
-        return False, None
+        return _obter_lock_posix()
     ctypes.set_last_error(0)
     _mutex_handle = kernel32.CreateMutexW(None, False, "PitchRollMonitorMutex")
     if not _mutex_handle:
@@ -471,80 +583,365 @@ def obter_mutex():
     return (ctypes.get_last_error() == 183), _mutex_handle
 
 
+# =========================
+# Parada (todas as plataformas)
+# =========================
+# Fora do Windows: instância única por flock num arquivo com o PID na
+# pasta de saída; --stop manda SIGTERM para esse PID. No Windows o evento
+# nomeado continua sendo o caminho do --stop, vigiado por uma thread.
+STOP_EVENT = threading.Event()
+INSTANCIA_LOCK = os.path.join(OUTPUT_DIR, "lite2.lock")
+_lock_fd: Optional[int] = None
+
+
+def parando() -> bool:
+    """O processo está encerrando (STOP_EVENT ou evento de quit do Windows)."""
+    return STOP_EVENT.is_set() or bool(_quit_evt and _quit_evt.is_signaled())
+
+
+def parar_processo() -> None:
+    """
+    Parada local: acorda todas as esperas no STOP_EVENT e fecha a sessão
+    HTTP, então novas coletas voltam None na hora e as em curso são
+    abandonadas (o loop roda numa thread daemon).
+    """
+    global session
+    if STOP_EVENT.is_set():
+        return
+    STOP_EVENT.set()
+    s, session = session, None
+    if s is not None:
+        try:
+            s.close()
+        except Exception:
+            log.debug("Erro ao fechar sessão HTTP na parada", exc_info=True)
+
+
+def instalar_sinais_parada() -> None:
+    """SIGTERM/SIGINT (e SIGBREAK no Windows) -> parar_processo; só na thread principal."""
+    import signal
+
+    def _handler(signum, frame):
+        # set() de Event dentro do handler pode travar no lock que a thread
+        # principal segura; faz a parada numa thread à parte
+        threading.Thread(target=parar_processo, name="lite2-parada", daemon=True).start()
+
+    for nome in ("SIGTERM", "SIGINT", "SIGBREAK"):
+        sig = getattr(signal, nome, None)
+        if sig is not None:
+            try:
+                signal.signal(sig, _handler)
+            except (ValueError, OSError):
+                log.debug("Não consegui instalar handler de %s", nome, exc_info=True)
+
+
+def vigiar_quit_evt() -> None:
+    """Windows: thread que espera o evento nomeado do --stop e chama parar_processo."""
+    evt = _quit_evt
+    if not (kernel32 and evt and evt.handle):
+        return
+
+    def _vigiar():
+        while not STOP_EVENT.is_set():
+            if kernel32.WaitForSingleObject(evt.handle, 250) == WAIT_OBJECT_0:
+                parar_processo()
+                return
+
+    threading.Thread(target=_vigiar, name="lite2-quit", daemon=True).start()
+
+
+def _obter_lock_posix():
+    """(já_existe, fd): flock exclusivo em INSTANCIA_LOCK; o PID vai no arquivo."""
+    global _lock_fd
+    import fcntl
+
+    try:
+        os.makedirs(os.path.dirname(INSTANCIA_LOCK), exist_ok=True)
+        fd = os.open(INSTANCIA_LOCK, os.O_RDWR | os.O_CREAT, 0o644)
+    except OSError:
+        log.debug("Não consegui abrir %s", INSTANCIA_LOCK, exc_info=True)
+        return False, None
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return True, None
+    os.ftruncate(fd, 0)
+    os.write(fd, str(os.getpid()).encode("ascii"))
+    _lock_fd = fd  # fica aberto até o processo sair; o kernel solta o lock
+    return False, fd
+
+
+def _pid_da_instancia() -> Optional[int]:
+    """PID gravado por uma instância viva (lock ocupado); None se não há."""
+    try:
+        import fcntl
+    except ImportError:
+        return None
+    try:
+        fd = os.open(INSTANCIA_LOCK, os.O_RDONLY)
+    except OSError:
+        return None
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            return None  # ninguém segura o lock: PID velho
+        except OSError:
+            pass
+        pid = os.read(fd, 32).decode("ascii", "ignore").strip()
+        return int(pid) if pid.isdigit() else None
+    finally:
+        os.close(fd)
+
+
+def _sinalizar_pid() -> bool:
+    import signal
+
+    pid = _pid_da_instancia()
+    if not pid or pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, signal.SIGTERM)
+        return True
+    except OSError:
+        return False
+
+
 # =========================
 # HTTP / Requests session
 # =========================
 session = None
-if requests is not None:
-    session = requests.Session()
-    session.headers.update({"User-Agent": "Mozilla/5.0"})
+
+
+def _iniciar_http() -> None:
+    """Etapa "http": importa requests e abre a sessão."""
+    global requests, session
+    if requests_spec is None:
+        return
+    try:
+        requests = importlib.import_module("requests")
+        s = requests.Session()
+        s.headers.update({"User-Agent": "Mozilla/5.0"})
+        session = s
+    except Exception:
+        log.warning("Falha ao importar requests; seguindo sem coleta HTTP.", exc_info=True)
+
+
+APP.registrar("http", _iniciar_http)
+
+
+# Saúde por host (última coleta), exposta no /state
+_HOST_HEALTH_LOCK = threading.Lock()
+_HOST_HEALTH: dict = {}
+_HOST_HEALTH_VERSION = 0
+
+
+def _host_de_url(url: str) -> str:
+    try:
+        return urlsplit(url).hostname or url
+    except Exception:
+        return url
+
+
+def _registrar_saude_host(url: str, ok: bool, dur_s: float) -> None:
+    global _HOST_HEALTH_VERSION
+    host = _host_de_url(url)
+    with _HOST_HEALTH_LOCK:
+        h = _HOST_HEALTH.setdefault(host, {"ok": False, "last_ok_epoch": None, "fails": 0, "last_ms": None})
+        h["ok"] = bool(ok)
+        h["last_ms"] = round(dur_s * 1000.0, 1)
+        if ok:
+            h["last_ok_epoch"] = time.time()
+            h["fails"] = 0
+        else:
+            h["fails"] += 1
+        _HOST_HEALTH_VERSION += 1
+
+
+def saude_hosts():
+    """Devolve (versão, {host: {ok, last_ok_epoch, fails, last_ms}})."""
+    with _HOST_HEALTH_LOCK:
+        return _HOST_HEALTH_VERSION, {h: dict(v) for h, v in _HOST_HEALTH.items()}
+
+
+HTTP_RETRY_PAUSA_SEC = 0.5  # entre tentativas de coletar_json
 
 
 def coletar_json(url: str, tentativas: int = 3, timeout: int = 10):
+    if STOP_EVENT.is_set():
+        return None
     if session is None:
+        APP.garantir("http")
+    s = session
+    if s is None:
         return None
+    host = _host_de_url(url)
+    t0 = time.monotonic()
     for tent in range(tentativas):
+        if tent > 0:
+            M.HTTP_RETRIES.inc(host=host)
         try:
-            resp = session.get(url, timeout=timeout)
+            resp = s.get(url, timeout=timeout)
             resp.raise_for_status()
-            return resp.json()
+            dados = resp.json()
+            dur = time.monotonic() - t0
+            _registrar_saude_host(url, True, dur)
+            M.HTTP_FETCH_SEC.observe(dur, host=host, result="ok")
+            return dados
         except Exception:
+            if STOP_EVENT.is_set():
+                return None  # sessão fechada pela parada: não é falha do host
             log.debug("Falha na tentativa %s para %s", tent + 1, url, exc_info=True)
             if tent == tentativas - 1:
                 log.warning("Falha ao coletar %s", url, exc_info=True)
                 log_event("HTTP_FAIL", url=url)
+                dur = time.monotonic() - t0
+                _registrar_saude_host(url, False, dur)
+                M.HTTP_FETCH_SEC.observe(dur, host=host, result="fail")
+                return None
+            if STOP_EVENT.wait(HTTP_RETRY_PAUSA_SEC):
                 return None
-            time.sleep(0.5)
     return None
 
 
+# =========================
+# Agendador (uma thread para todo trabalho atrasado/periódico)
+# =========================
+AGENDADOR = Agendador(log=log)
+
+# Spans de cada ciclo do run_monitor (servidos em /debug/cycles)
+CICLOS = RegistroCiclos()
+
+# Amostras de RSS/threads/objetos a cada 5 min (servidas em /debug/memory); LITE2_TRACEMALLOC=1 liga o tracemalloc desde o início
+MEMORIA_TRACEMALLOC = os.environ.get("LITE2_TRACEMALLOC", "") == "1"
+MEMORIA = MonitorMemoria(log=log, log_event=log_event)
+
+
 # =========================
 # Audio
 # =========================
-audio_ok, CHANNELS, _SND = True, {}, {}
+audio_ok, CHANNELS, _SND = False, {}, {}
 AUDIO_SEQ_LOCK = threading.RLock()
 _ACTIVE_AUDIO_SEQ = None
 
 
 def _init_audio() -> bool:
-    """Inicializa mixer/filas e devolve True/False indicando sucesso."""
+    """Inicializa o backend de áudio (LITE2_AUDIO, padrão pygame) e devolve True/False."""
     global CHANNELS
-    if pygame is None:
-        log.info("Pygame não encontrado; seguindo sem áudio.")
-        return False
+    ok = AUDIO_BACKEND.iniciar()
+    CHANNELS = AUDIO_BACKEND.canais if ok else {}
+    return ok
+
+
+# "off" até a etapa "audio" do APP (ou usar_backend_audio) escolher o backend.
+# Sem pygame (ou mixer com falha), audio_ok fica False e o restante da
+# aplicação segue funcional, só que muda.
+AUDIO_BACKEND: AudioBackend = AudioBackend(log)
+
+MIXER_FORMATO = AUDIO_BACKEND.formato if audio_ok else None
+AUDIO_PCM_CACHE_DIR = os.path.join(OUTPUT_DIR, "audio_pcm")
+
+
+def _criar_sound_bank() -> SoundBank:
+    """
+    Banco de sons: manifesto de audioss/ + pré-carga em background (alarmes primeiro).
+    OGG/FLAC são decodificados uma vez e o PCM fica em AUDIO_PCM_CACHE_DIR
+    (só com pygame: o null não tem PCM de verdade para guardar).
+    """
+    return SoundBank(
+        AUDIO_DIR,
+        loader=(AUDIO_BACKEND.carregar if audio_ok else None),
+        log=log,
+        cache_dir=(AUDIO_PCM_CACHE_DIR if AUDIO_BACKEND.nome == "pygame" else None),
+        formato=MIXER_FORMATO,
+        to_raw=AUDIO_BACKEND.para_pcm,
+        from_raw=AUDIO_BACKEND.de_pcm,
+    )
+
+
+SOUND_BANK = _criar_sound_bank()
+_SND = SOUND_BANK.sons
+
+
+def _criar_compositor() -> Optional[ClipCompositor]:
+    if MIXER_FORMATO is None:
+        return None
     try:
-        pygame.mixer.init(frequency=44100, size=-16, channels=2)
-        pygame.mixer.set_num_channels(4)
-        CHANNELS = {name: pygame.mixer.Channel(i) for i, name in enumerate(["voz", "beep", "vento"])}
-        return True
+        return ClipCompositor(
+            SOUND_BANK,
+            MIXER_FORMATO,
+            to_raw=AUDIO_BACKEND.para_pcm,
+            make_sound=AUDIO_BACKEND.de_pcm,
+            log=log,
+        )
     except Exception:
-        log.warning("Falha ao inicializar áudio; seguindo sem áudio.", exc_info=True)
-        CHANNELS = {}
-        return False
+        log.warning("Compositor de clips indisponível; usando sequência clip a clip.", exc_info=True)
+        return None
 
 
-audio_ok = _init_audio()
-# Quando pygame não está disponível, audio_ok fica False para evitar chamadas a atributos
-# de pygame.* mais adiante, mantendo o restante da aplicação funcional.
+COMPOSITOR = _criar_compositor()
 
 
-def _any_channel_busy() -> bool:
-    for ch in CHANNELS.values():
+# Fim de reprodução por canal calculado no play() (duração do clip), em vez de
+# consultar get_busy() a cada 10 ms. Quem espera dorme na condição até o prazo
+# ou até um stop() notificar.
+AUDIO_FIM_FOLGA_SEC = 0.03  # cobre o buffer do mixer após o último sample
+GAP_ENTRE_CLIPS_SEC = 0.05  # respiro entre falas de uma mesma sequência
+VENTO_GAP_SEC = 1.0  # pausa intencional entre av1/av2/av3
+_AUDIO_COND = threading.Condition()
+_CANAL_FIM: dict = {}  # canal_nome -> monotonic previsto para o fim do clip
+
+
+def _marcar_play(canal_nome: str, dur_s: float) -> None:
+    with _AUDIO_COND:
+        _CANAL_FIM[canal_nome] = time.monotonic() + max(0.0, dur_s) + AUDIO_FIM_FOLGA_SEC
+        _AUDIO_COND.notify_all()
+
+
+def _parar_canal(canal_nome: str) -> None:
+    canal = CHANNELS.get(canal_nome)
+    if canal:
         try:
-            if ch and ch.get_busy():
-                return True
+            canal.stop()
         except Exception:
-            continue
-    return False
+            pass
+    with _AUDIO_COND:
+        _CANAL_FIM.pop(canal_nome, None)
+        _AUDIO_COND.notify_all()
+
+
+def _canal_ocupado_locked(canal_nome: str, now: float) -> bool:
+    fim = _CANAL_FIM.get(canal_nome)
+    return fim is not None and now < fim
+
+
+def _any_channel_busy() -> bool:
+    now = time.monotonic()
+    with _AUDIO_COND:
+        return any(_canal_ocupado_locked(nm, now) for nm in list(_CANAL_FIM))
+
+
+def _aguardar_prazo(proximo_fim, timeout_s: float) -> bool:
+    """Dorme em _AUDIO_COND até proximo_fim() (prazo ou None=livre); False se estourar timeout."""
+    limite = time.monotonic() + timeout_s
+    with _AUDIO_COND:
+        while True:
+            now = time.monotonic()
+            fim = proximo_fim(now)
+            if fim is None:
+                return True
+            if now >= limite:
+                return False
+            _AUDIO_COND.wait(min(fim, limite) - now)
 
 
 def _wait_all_channels_free(timeout_s: float) -> bool:
-    deadline = time.monotonic() + timeout_s
-    while _any_channel_busy():
-        if time.monotonic() > deadline:
-            return False
-        time.sleep(0.01)
-    return True
+    def _ultimo_fim(now):
+        pendentes = [f for f in _CANAL_FIM.values() if now < f]
+        return max(pendentes) if pendentes else None
+
+    return _aguardar_prazo(_ultimo_fim, timeout_s)
 
 
 def run_audio_sequence(seq_callable, nome: str = "audio_seq", timeout_s: float = 7.0) -> bool:
@@ -555,6 +952,7 @@ def run_audio_sequence(seq_callable, nome: str = "audio_seq", timeout_s: float =
     acquired = AUDIO_SEQ_LOCK.acquire(timeout=timeout_s)
     if not acquired:
         log.warning("AudioSeq %s cancelado: timeout aguardando sequência atual.", seq_name)
+        M.AUDIO_SEQ_TIMEOUT.inc(seq=seq_name, cause="lock")
         return False
 
     global _ACTIVE_AUDIO_SEQ
@@ -566,7 +964,9 @@ def run_audio_sequence(seq_callable, nome: str = "audio_seq", timeout_s: float =
         remaining = max(0.0, timeout_s - elapsed)
         if not _wait_all_channels_free(remaining):
             log.warning("AudioSeq %s cancelado: canais ocupados.", seq_name)
+            M.AUDIO_SEQ_TIMEOUT.inc(seq=seq_name, cause="channels")
             return False
+        M.AUDIO_SEQ_WAIT_SEC.observe(time.monotonic() - start_wait, seq=seq_name)
         seq_callable()
         return True
     finally:
@@ -575,42 +975,81 @@ def run_audio_sequence(seq_callable, nome: str = "audio_seq", timeout_s: float =
         AUDIO_SEQ_LOCK.release()
 
 
+# Fila de áudio: alarmes e clips tocam num worker próprio, por prioridade.
+# Pitch/roll = base + nível, então L5 interrompe L2 e qualquer alarme
+# interrompe vento/random.
+PRIORIDADE_RANDOM = 0
+PRIORIDADE_VENTO = 1
+PRIORIDADE_PITCH_ROLL_BASE = 10
+AUDIO_VALIDADE_SEC = 7.0  # pedido que não começou a tocar nesse prazo é descartado
+
+
+def _parar_todos_canais() -> None:
+    for nm in list(CHANNELS) or ["voz", "beep", "vento"]:
+        _parar_canal(nm)
+
+
+AUDIO_DISPATCHER = AudioDispatcher(
+    executar=lambda seq, nome, timeout_s: run_audio_sequence(seq, nome=nome, timeout_s=timeout_s),
+    parar=_parar_todos_canais,
+    log=log,
+)
+M.gauge("lite2_audio_queue_depth", "Pedidos de áudio aguardando na fila", funcao=AUDIO_DISPATCHER.pendentes)
+
+
+def enfileirar_audio(seq_callable, nome: str, prioridade: int, validade_s: float = AUDIO_VALIDADE_SEC):
+    """Entrega a sequência ao worker de áudio e volta na hora (devolve o PedidoAudio)."""
+    return AUDIO_DISPATCHER.enviar(seq_callable, nome, prioridade, validade_s)
+
+
+def _interromper() -> bool:
+    """A sequência em curso deve parar (encerrando ou interrompida por prioridade maior)."""
+    return parando() or AUDIO_DISPATCHER.interromper.is_set()
+
+
+def _pausa(seg: float) -> bool:
+    """Pausa entre clips que acorda na hora se a sequência for interrompida."""
+    return not AUDIO_DISPATCHER.interromper.wait(seg)
+
+
 def _carregar_wav(nome_base: str):
-    if not audio_ok or pygame is None:
-        return None
-    path = os.path.join(AUDIO_DIR, f"{nome_base}.wav")
-    try:
-        snd = pygame.mixer.Sound(path)
-        _SND[nome_base] = snd
-        return snd
-    except Exception:
-        log.warning("Falha ao carregar áudio %s", path, exc_info=True)
+    """Som do banco (já pré-carregado ou carregado agora, uma vez só)."""
+    if not audio_ok:
         return None
+    return SOUND_BANK.get(nome_base)
 
 
-def _esperar_canal(canal, timeout_s: float = 10.0):
-    if not audio_ok or canal is None or pygame is None:
-        return
-    t0 = time.monotonic()
-    while canal.get_busy():
-        try:
-            pygame.time.delay(10)
-        except Exception:
-            time.sleep(0.01)
-        if time.monotonic() - t0 > timeout_s:
-            break
+def _esperar_canal(canal_nome: str, timeout_s: float = 10.0) -> bool:
+    """Aguarda o fim do clip no canal (prazo calculado no play; sem polling)."""
+    if not audio_ok or not CHANNELS.get(canal_nome):
+        return True
+
+    def _fim(now):
+        return _CANAL_FIM.get(canal_nome) if _canal_ocupado_locked(canal_nome, now) else None
+
+    return _aguardar_prazo(_fim, timeout_s)
+
+
+def _tocar_snd(canal_nome: str, snd, vol01: float) -> bool:
+    """play() no canal registrando o prazo de término; não espera."""
+    canal = CHANNELS.get(canal_nome)
+    if not canal or not snd:
+        return False
+    canal.set_volume(clamp(vol01, 0.0, 1.0))
+    canal.play(snd)
+    _marcar_play(canal_nome, snd.get_length())
+    return True
 
 
 def _tocar_em_canal(nome_base: str, vol01: float, canal_nome: str):
-    if not audio_ok or pygame is None or not CHANNELS.get(canal_nome):
+    if not audio_ok or not CHANNELS.get(canal_nome) or _interromper():
         return
     snd = _SND.get(nome_base) or _carregar_wav(nome_base)
     if not snd:
         return
     try:
-        CHANNELS[canal_nome].set_volume(clamp(vol01, 0.0, 1.0))
-        CHANNELS[canal_nome].play(snd)
-        _esperar_canal(CHANNELS[canal_nome], max(1.5, snd.get_length() + 0.5))
+        _tocar_snd(canal_nome, snd, vol01)
+        _esperar_canal(canal_nome, max(1.5, snd.get_length() + 0.5))
     except Exception:
         log.warning("Erro ao tocar áudio %s", nome_base, exc_info=True)
 
@@ -647,12 +1086,8 @@ def _combo_key(direcoes_upper: set):
     return None
 
 def _audio_file_exists(nome_base: str) -> bool:
-    """Evita warning do _carregar_wav quando o arquivo nem existe."""
-    try:
-        path = os.path.join(AUDIO_DIR, f"{nome_base}.wav")
-        return os.path.isfile(path)
-    except Exception:
-        return False
+    """Consulta o manifesto do banco (sem acesso a disco no caminho do alarme)."""
+    return SOUND_BANK.existe(nome_base)
 
 
 def _ensure_sound_loaded(nome_base: str):
@@ -669,13 +1104,14 @@ def _ensure_sound_loaded(nome_base: str):
 
 def _pick_sound_key(base_key: str, use_v2: bool) -> str:
     """
-    Se use_v2=True tenta <base_key>2 primeiro; se não existir/carregar, cai no base_key.
+    Se use_v2=True tenta <base_key>2 primeiro; se não existir no manifesto
+    (ou já falhou ao carregar), cai no base_key.
     """
     if not use_v2:
         return base_key
 
     key2 = f"{base_key}2"
-    if _ensure_sound_loaded(key2):
+    if SOUND_BANK.disponivel(key2):
         return key2
 
     # fallback para o original
@@ -692,18 +1128,16 @@ def falar_wavs(direcoes, incluir_atencao: bool, use_v2: bool = False):
     dirs = [d.strip().upper() for d in (direcoes or []) if d and d.strip().upper() in validos]
 
     if CHANNELS.get("voz"):
-        try:
-            CHANNELS["voz"].stop()
-        except Exception:
-            pass
+        _parar_canal("voz")
 
     # 1) Atenção (normal ou v2)
     if incluir_atencao:
-        if _quit_evt and _quit_evt.is_signaled():
+        if _interromper():
             return
         key = _pick_sound_key("atencao", use_v2)
         _tocar_em_canal(key, vol01, "voz")
-        time.sleep(0.12)
+        if dirs and not _pausa(GAP_ENTRE_CLIPS_SEC):
+            return
 
     if not dirs:
         return
@@ -715,23 +1149,23 @@ def falar_wavs(direcoes, incluir_atencao: bool, use_v2: bool = False):
 
         # garante load sem warning se arquivo não existir
         if _ensure_sound_loaded(combo_key):
-            if _quit_evt and _quit_evt.is_signaled():
+            if _interromper():
                 return
             _tocar_em_canal(combo_key, vol01, "voz")
-            time.sleep(0.25)
             return
 
         # fallback: se pediu v2 e não existe, tenta o combo original (se existir)
         if combo_key != combo and _ensure_sound_loaded(combo):
-            if _quit_evt and _quit_evt.is_signaled():
+            if _interromper():
                 return
             _tocar_em_canal(combo, vol01, "voz")
-            time.sleep(0.25)
             return
 
     # 3) Sem combo: toca individuais (normal ou v2)
-    for d in dirs:
-        if _quit_evt and _quit_evt.is_signaled():
+    for i, d in enumerate(dirs):
+        if _interromper():
+            return
+        if i and not _pausa(GAP_ENTRE_CLIPS_SEC):
             return
         base = d.lower()  # "popa", "proa", ...
         key = _pick_sound_key(base, use_v2)
@@ -741,54 +1175,193 @@ def falar_wavs(direcoes, incluir_atencao: bool, use_v2: bool = False):
             key = base
 
         _tocar_em_canal(key, vol01, "voz")
-        time.sleep(0.12)
 
-    time.sleep(0.25)
 
 
+# =========================
+# Alarme pitch/roll como clip único (compositor)
+# =========================
+COMPOSITOR_AQUECER_NIVEIS = (5, 4, 3, 2)  # todos: o alarme nunca monta clip (nem aplica ganho) na hora de tocar
+_DIRECOES_VALIDAS = ("PROA", "POPA", "BORESTE", "BOMBORDO")
+# como _part5 monta `cond`: direção de pitch primeiro, depois a de roll
+_COMBINACOES_DIRS = [()] + [(d,) for d in _DIRECOES_VALIDAS] + [
+    (p, r) for p in ("PROA", "POPA") for r in ("BORESTE", "BOMBORDO")
+]
+
+
+def _beep_key(nivel_num: int) -> Optional[str]:
+    """Mesma escolha do tocar_alerta: l2..l5, com fallback l3 -> l2."""
+    nome = f"l{min(nivel_num, 5)}" if nivel_num >= 2 else "l2"
+    for cand in (nome, "l3", "l2"):
+        if _audio_file_exists(cand):
+            return cand
+    return None
+
+
+def _normalizar_dirs(direcoes) -> list:
+    return [d.strip().upper() for d in (direcoes or []) if d and d.strip().upper() in _DIRECOES_VALIDAS]
+
+
+def _pecas_alarme(nivel: int, dirs: list) -> list:
+    """Receita (nome, ganho, silêncio depois) equivalente a tocar_alerta + falar_wavs."""
+    vol_voz = clamp(VOLUMES.get("voz", 100) / 100.0, 0.0, 1.0)
+    use_v2 = nivel >= 3
+    pecas = []
+
+    beep = _beep_key(nivel)
+    if beep:
+        pecas.append([beep, VOLUMES.get(f"beep_{beep}", VOLUMES["beep_fallback"]), 0.0])
+    if nivel >= 3:
+        pecas.append([_pick_sound_key("atencao", use_v2), vol_voz, GAP_ENTRE_CLIPS_SEC])
+
+    combo = _combo_key(set(dirs))
+    if combo:
+        key = _pick_sound_key(combo, use_v2)
+        if not _audio_file_exists(key):
+            key = combo if _audio_file_exists(combo) else None
+        if key:
+            pecas.append([key, vol_voz, 0.0])
+            return pecas
+
+    for d in dirs:
+        key = _pick_sound_key(d.lower(), use_v2)
+        if not _audio_file_exists(key):
+            key = d.lower()
+        pecas.append([key, vol_voz, GAP_ENTRE_CLIPS_SEC])
+
+    if pecas:
+        pecas[-1][2] = 0.0
+    return pecas
+
+
+def tocar_alarme_composto(nivel: int, direcoes) -> bool:
+    """
+    Toca beep + atenção + direção(ões) como um único play() no canal de voz.
+    Devolve False quando não há clip composto (sem compositor ou peça ausente):
+    quem chama usa tocar_alerta + falar_wavs.
+    """
+    if not audio_ok or COMPOSITOR is None or not CHANNELS.get("voz"):
+        return False
+    dirs = _normalizar_dirs(direcoes)
+    som = COMPOSITOR.compor((nivel, tuple(dirs)), _pecas_alarme(nivel, dirs))
+    if som is None:
+        return False
+    if _interromper():
+        return True
+    try:
+        _parar_canal("voz")
+        _tocar_snd("voz", som, 1.0)
+        _esperar_canal("voz", som.get_length() + 1.0)
+    except Exception:
+        log.warning("Erro ao tocar clip composto L%s %s", nivel, dirs, exc_info=True)
+        return False
+    return True
+
+
+def _aquecer_clips() -> None:
+    """Monta os clips compostos de todos os níveis e direções logo após a pré-carga."""
+    if COMPOSITOR is None:
+        return
+    t0 = time.perf_counter()
+    for nivel in COMPOSITOR_AQUECER_NIVEIS:
+        for dirs in _COMBINACOES_DIRS:
+            COMPOSITOR.compor((nivel, dirs), _pecas_alarme(nivel, list(dirs)))
+    log.info("Clips compostos prontos: %s em %.1f ms", COMPOSITOR.em_cache(), (time.perf_counter() - t0) * 1000.0)
+
+
+
+
+def usar_backend_audio(backend, preload: bool = True) -> bool:
+    """
+    Troca o backend em execução (benchmarks/testes com null/recording):
+    para os canais, encerra o anterior e remonta banco de sons e compositor.
+    """
+    global AUDIO_BACKEND, audio_ok, MIXER_FORMATO, SOUND_BANK, _SND, COMPOSITOR
+    APP.marcar("audio")
+    _parar_todos_canais()
+    try:
+        if audio_ok:
+            AUDIO_BACKEND.encerrar()
+    except Exception:
+        log.debug("Erro ao encerrar backend de áudio %s", AUDIO_BACKEND.nome, exc_info=True)
+    AUDIO_BACKEND = backend
+    audio_ok = _init_audio()
+    MIXER_FORMATO = AUDIO_BACKEND.formato if audio_ok else None
+    SOUND_BANK = _criar_sound_bank()
+    _SND = SOUND_BANK.sons
+    COMPOSITOR = _criar_compositor()
+    if audio_ok and preload:
+        SOUND_BANK.preload()
+        _aquecer_clips()
+    return audio_ok
+
+
+def _importar_pygame():
+    global pygame
+    if pygame is None and pygame_spec is not None:
+        try:
+            pygame = importlib.import_module("pygame")
+        except Exception:
+            log.warning("Falha ao importar pygame; seguindo sem áudio.", exc_info=True)
+    return pygame
+
+
+def _iniciar_audio_app() -> None:
+    """Etapa "audio": backend de LITE2_AUDIO (pygame: import + mixer), banco de sons e pré-carga em background."""
+    nome = os.environ.get(AUDIO_BACKEND_ENV)
+    pg = None if (nome or "").strip().lower() in ("null", "recording") else _importar_pygame()
+    if usar_backend_audio(criar_backend(nome, pg, log), preload=False):
+        SOUND_BANK.preload_async(depois=_aquecer_clips)
+
+
+APP.registrar("audio", _iniciar_audio_app)
+
 
 def tocar_alarme_vento():
+    """Enfileira av1/av2/av3 no worker de áudio; não bloqueia quem chama."""
+
     def _seq():
         if not audio_ok:
             return
-        canal = CHANNELS.get("vento") or CHANNELS.get("beep") or CHANNELS.get("voz")
-        if canal is None:
+        canal_nome = next((nm for nm in ("vento", "beep", "voz") if CHANNELS.get(nm)), None)
+        if canal_nome is None:
             return
-        for nm in ("av1", "av2", "av3"):
-            if _quit_evt and _quit_evt.is_signaled():
+        for i, nm in enumerate(("av1", "av2", "av3")):
+            if _interromper():
                 return
             snd = _SND.get(nm) or _carregar_wav(nm)
             if not snd:
                 continue
+            if i and not _pausa(VENTO_GAP_SEC):
+                return
             try:
-                canal.set_volume(1.0)
-                canal.play(snd)
-                _esperar_canal(canal, max(1.2, snd.get_length() + 0.3))
+                _tocar_snd(canal_nome, snd, 1.0)
+                _esperar_canal(canal_nome, max(1.2, snd.get_length() + 0.3))
             except Exception:
                 pass
-            time.sleep(1.0)
 
-    return run_audio_sequence(_seq, nome="alarme_vento")
+    return enfileirar_audio(_seq, "alarme_vento", PRIORIDADE_VENTO)
 
 
 def tocar_random():
+    """Enfileira o clip random com a menor prioridade; não bloqueia quem chama."""
+
     def _seq():
-        if not audio_ok:
+        if not audio_ok or _interromper():
             return
-        canal = CHANNELS.get("voz") or CHANNELS.get("beep")
-        if canal is None:
+        canal_nome = next((nm for nm in ("voz", "beep") if CHANNELS.get(nm)), None)
+        if canal_nome is None:
             return
         snd = _SND.get("random") or _carregar_wav("random")
         if not snd:
             return
         try:
-            canal.set_volume(1.0)
-            canal.play(snd)
-            _esperar_canal(canal, max(2.0, snd.get_length() + 0.5))
+            _tocar_snd(canal_nome, snd, 1.0)
+            _esperar_canal(canal_nome, max(2.0, snd.get_length() + 0.5))
         except Exception:
             pass
 
-    return run_audio_sequence(_seq, nome="random")
+    return enfileirar_audio(_seq, "random", PRIORIDADE_RANDOM)
 
 
 # =========================
@@ -798,12 +1371,105 @@ def tocar_random():
 def base_argparser() -> argparse.ArgumentParser:
     ap = argparse.ArgumentParser()
     ap.add_argument("--stop", action="store_true", help="pede para a instância em execução encerrar e sai")
+    ap.add_argument(
+        "--server",
+        choices=("thread", "asyncio"),
+        default=None,
+        help="servidor de controle/painel (padrão: %s)" % CONTROL_SERVER_MODE,
+    )
+    ap.add_argument(
+        "--aquisicao",
+        choices=("local", "processo"),
+        default=None,
+        help="coleta + avaliação no loop do monitor ou num processo separado (padrão: %s)" % AQUISICAO_MODO,
+    )
+    ap.add_argument(
+        "--loadtest",
+        action="store_true",
+        help="roda o gerador de carga do servidor de controle e sai (demais opções: python _loadtest.py -h)",
+    )
+    ap.add_argument(
+        "--bench-alarme",
+        action="store_true",
+        help="mede a latência limiar -> primeiro play do alarme com o backend recording e sai (opções: python _alarmbench.py -h)",
+    )
+    ap.add_argument(
+        "--simular-alarme",
+        action="store_true",
+        help="roda uma série (arquivo ou --roteiro) pelas regras de alarme em relógio virtual e sai (opções: python _alarmsim.py -h)",
+    )
+    ap.add_argument(
+        "--backtest",
+        action="store_true",
+        help="roda um histórico por métrica, classificação e alarme para vários conjuntos de parâmetros e sai (opções: python _backtest.py -h)",
+    )
+    ap.add_argument(
+        "--bench",
+        action="store_true",
+        help="microbenchmarks de avaliação, HTML e log com saída JSON e sai (opções: python _bench.py -h)",
+    )
+    ap.add_argument(
+        "--soak",
+        action="store_true",
+        help="roda o monitor real contra um PyHMS local com mar sintético, tempo comprimido e falhas de host, e sai (opções: python _soak.py -h)",
+    )
+    ap.add_argument(
+        "--tempo-inicio",
+        action="store_true",
+        help="relatório do tempo de inicialização (imports e etapas do APP) e sai (opções: python _inicio.py -h)",
+    )
     return ap
 
 
+def rodar_ferramenta(args, extras) -> Optional[int]:
+    """
+    Flags que rodam uma ferramenta e saem. Cada uma importa só o próprio
+    módulo (e o que ele usa); devolve o código de saída, ou None se nenhuma
+    foi pedida.
+    """
+    if args.loadtest:
+        import _loadtest
+
+        if args.server:
+            extras = ["--server", args.server] + extras
+        return _loadtest.main(extras)
+    if args.bench_alarme:
+        import _alarmbench
+
+        return _alarmbench.main(extras)
+    if args.simular_alarme:
+        import _alarmsim
+
+        return _alarmsim.main(extras)
+    if args.backtest:
+        import _backtest
+
+        return _backtest.main(extras)
+    if args.bench:
+        import _bench
+
+        return _bench.main(extras)
+    if args.soak:
+        import _soak
+
+        return _soak.main(extras)
+    if args.tempo_inicio:
+        import _inicio
+
+        return _inicio.main(extras)
+    return None
+
+
+def pedir_parada() -> int:
+    ok = signal_quit()
+    print("OK, sinal enviado." if ok else "Nenhuma instância encontrada.")
+    return 0
+
+
 __all__ = [
     "HTML_REFRESH_SEC",
     "HTML_STALE_MAX_AGE_SEC",
+    "STATE_POLL_SEC",
     "HTML_WIN_PITCH",
     "HTML_WIN_ROLL",
     "COLETA_INTERVAL",
@@ -827,28 +1493,62 @@ __all__ = [
     "VENTO_ALARME_THRESHOLD",
     "VENTO_REARME_MIN",
     "MUTE_CTRL_PORT",
+    "CONTROL_SERVER_MODE",
+    "AQUISICAO_MODO",
+    "CONTROL_MAX_CONNS",
+    "CONTROL_KEEPALIVE_SEC",
     "URL_SMP_PITCH_ROLL",
     "WIND_HOSTS_ORDER",
     "WIND_PREF",
     "GET_PATH",
+    "URL_MODELO",
+    "HOST_PITCH_ROLL",
+    "url_dados",
+    "HTTP_RETRY_PAUSA_SEC",
     "KEYS_PR",
     "KEYS_WIND",
     "FILES",
+    "HISTORICO_DIR",
+    "HISTORICO_GRAVAR",
+    "APP",
+    "CICLOS",
+    "MEMORIA",
+    "MEMORIA_TRACEMALLOC",
+    "AppContext",
+    "rodar_ferramenta",
+    "pedir_parada",
     "log",
     "REGEX",
     "keep_screen_on",
     "QuitEvent",
     "signal_quit",
     "obter_mutex",
+    "STOP_EVENT",
+    "INSTANCIA_LOCK",
+    "parando",
+    "parar_processo",
+    "instalar_sinais_parada",
+    "vigiar_quit_evt",
     "coletar_json",
+    "saude_hosts",
     "ordered_wind_hosts",
     "tocar_alerta",
+    "tocar_alarme_composto",
     "falar_wavs",
     "tocar_alarme_vento",
     "tocar_random",
     "run_audio_sequence",
+    "AUDIO_DISPATCHER",
+    "AGENDADOR",
+    "enfileirar_audio",
+    "PRIORIDADE_RANDOM",
+    "PRIORIDADE_VENTO",
+    "PRIORIDADE_PITCH_ROLL_BASE",
     "audio_ok",
     "CHANNELS",
+    "AUDIO_BACKEND",
+    "usar_backend_audio",
+    "SOUND_BANK",
     "_quit_evt",
     "fmt_or_placeholder",
     "safe_float",
@@ -9,6 +9,7 @@ import math
 from heapq import nlargest
 from typing import Iterable, List, Optional
 
+import _metrics as M
 import _part1 as P1
 
 _LAST_WIND_HOST = None
@@ -136,21 +137,25 @@ def coletar_wind_com_fallback(tentativas: int = 1, timeout: int = 10):
 
     algum_host_ok = False
     rejeicoes = []
-    for host in ordem:
-        url = f"http://{host}:8509{P1.GET_PATH}"
-        d = P1.coletar_json(url, tentativas, timeout)
+    for pos, host in enumerate(ordem):
+        url = P1.url_dados(host)
+        with P1.CICLOS.span("host " + host):
+            d = P1.coletar_json(url, tentativas, timeout)
         if not d:
             P1.log.warning("Host %s (%s) sem dados de vento (falha HTTP/JSON).", host, url)
+            M.WIND_FALLTHROUGH.inc(host=host, reason="http")
             continue
         try:
             vm, rj = vento_medio(d), rajada(d)
         except Exception:
             P1.log.exception("Erro interpretando vento de %s", host)
+            M.WIND_FALLTHROUGH.inc(host=host, reason="parse")
             continue
 
         if vm is None or rj is None:
             P1.log.debug("Rejeitando vento de %s: valores ausentes (vm=%s, raj=%s)", host, vm, rj)
             rejeicoes.append((host, "valores ausentes"))
+            M.WIND_FALLTHROUGH.inc(host=host, reason="missing")
             continue
 
         try:
@@ -158,20 +163,24 @@ def coletar_wind_com_fallback(tentativas: int = 1, timeout: int = 10):
         except Exception:
             P1.log.debug("Rejeitando vento de %s: valores não numéricos (vm=%s, raj=%s)", host, vm, rj)
             rejeicoes.append((host, "valores não numéricos"))
+            M.WIND_FALLTHROUGH.inc(host=host, reason="non_numeric")
             continue
 
         if not (math.isfinite(vm_num) and math.isfinite(rj_num)):
             P1.log.debug("Rejeitando vento de %s: valores não finitos (vm=%s, raj=%s)", host, vm, rj)
             rejeicoes.append((host, "valores não finitos"))
+            M.WIND_FALLTHROUGH.inc(host=host, reason="non_finite")
             continue
 
         if vm_num <= 0 or rj_num <= 0:
             P1.log.debug("Rejeitando vento de %s: valores não positivos (vm=%s, raj=%s)", host, vm, rj)
             rejeicoes.append((host, "valores não positivos"))
+            M.WIND_FALLTHROUGH.inc(host=host, reason="non_positive")
             continue
 
         algum_host_ok = True
         d["_wind_source"] = host
+        M.WIND_HOST_USED.inc(host=host, position=pos)
 
         # Loga SOMENTE quando o host muda
         if host != _LAST_WIND_HOST:
@@ -201,6 +210,7 @@ def coletar_wind_com_fallback(tentativas: int = 1, timeout: int = 10):
             P1.log.info("Hosts com dados de vento rejeitados: %s", resumo)
         P1.log.warning("Nenhum host de vento válido após tentar %s.", ", ".join(ordem))
         P1.log_event("WIND_FAIL", hosts=",".join(ordem), rejected=len(rejeicoes))
+        M.WIND_ALL_FAILED.inc()
     return None
 
 
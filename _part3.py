@@ -12,19 +12,26 @@ import time
 import atexit
 from datetime import datetime, timedelta
 
+import _metrics as M
 import _part1 as P1
-import _part2 as P2
 import _part4 as P4
 import _part5 as P5
+import _aquisicao
+import _pipeline
 import threading
 
+from _ciclos import ESPERA
+
 from _part5 import ensure_http_shortcut
 
 
-STOP_EVENT = threading.Event()
+STOP_EVENT = P1.STOP_EVENT  # o mesmo evento da parada (sinais, --stop, quit do Windows)
 SNAP_INTERVAL_SEC = 120     # 2 minutos
 RETENCAO_HORAS = 36
-_last_snap_ts = 0.0
+WIND_FIRST_CHECK_SEC = 9.0
+PARADA_JOIN_SEC = 0.3  # quanto a parada espera o loop terminar o que está fazendo
+PIPELINE_HISTORICO_FILA = 16  # leituras esperando gravação (cheia: descarta a mais antiga)
+PIPELINE_ALARME_FILA = 4  # leituras esperando o alarme (cheia: o loop espera)
 
 
 
@@ -71,14 +78,14 @@ def ler_ultimo_do_log() -> Optional[Tuple[float, float, float]]:
 
 def encerrar_gracioso():
     """Para áudio e libera recursos do evento/quit."""
-    STOP_EVENT.set()
+    P1.parar_processo()
     try:
+        P1.AGENDADOR.parar()
+        P1.AUDIO_DISPATCHER.fechar()
         for nm in ("beep", "voz", "vento"):
-            canal = P1.CHANNELS.get(nm)
-            if canal:
-                canal.stop()
-        if P1.audio_ok and P1.pygame is not None:
-            P1.pygame.mixer.quit()
+            P1._parar_canal(nm)
+        if P1.audio_ok:
+            P1.AUDIO_BACKEND.encerrar()
     except Exception:
         P1.log.debug("Erro ao encerrar mixer/áudio", exc_info=True)
     try:
@@ -89,13 +96,84 @@ def encerrar_gracioso():
         P1.log.debug("Erro ao fechar quit event", exc_info=True)
 
 
+def agendar_tarefas_monitor(ag, atual: dict) -> dict:
+    """
+    Agenda no `ag` o trabalho periódico do monitor, lendo sempre atual["est"]
+    (None = último ciclo sem dados, tarefa não faz nada):
+    - snapshot no log a cada SNAP_INTERVAL_SEC (o primeiro já no início)
+    - checagem do alarme de vento (9 s após o start e depois a cada
+      VENTO_ALARME_CHECK_INTERVAL_MIN)
+    - clip random a cada RANDOM_INTERVAL_HOURS, adiado enquanto houver
+      alarme pitch/roll dentro de RANDOM_SILENCE_PERIOD_MIN
+    Devolve as tarefas (canceláveis) por nome.
+    """
+    wind_alarm_state = {"last_wind_alarm_ts": 0.0}
+    tarefas = {}
+
+    def verificar_alarme_vento(vento_val_atual, raj_val_atual):
+        now = ag.agora()
+        try:
+            vento_num = None if (vento_val_atual is None) else float(vento_val_atual)
+            raj_num = None if (raj_val_atual is None) else float(raj_val_atual)
+        except Exception:
+            vento_num = raj_num = None
+        vento_acima = (vento_num is not None) and (vento_num > P1.VENTO_ALARME_THRESHOLD)
+        rajada_acima = (raj_num is not None) and (raj_num > P1.VENTO_ALARME_THRESHOLD)
+        if vento_acima or rajada_acima:
+            if (now - wind_alarm_state["last_wind_alarm_ts"]) >= (P1.VENTO_REARME_MIN * 60.0):
+                P1.log_event("ALARM_WIND", vento=vento_num, raj=raj_num, threshold=P1.VENTO_ALARME_THRESHOLD)
+
+                P1.tocar_alarme_vento()
+                wind_alarm_state["last_wind_alarm_ts"] = now
+
+    def _tarefa_vento():
+        est = atual.get("est")
+        if est is not None:
+            verificar_alarme_vento(est.get("vento_med"), est.get("raj"))
+
+    def _tarefa_snapshot():
+        est = atual.get("est")
+        if est is not None:
+            with P1.CICLOS.span("snapshot"):
+                P1.log_snapshot(
+                    est.get("pitch_val"),
+                    est.get("roll_val"),
+                    est.get("vento_med"),
+                    est.get("raj"),
+                    est.get("wind_source"),
+                )
+
+    def _tarefa_random():
+        st = P5.alarm_state
+        now = ag.agora()
+        ultimo_alarme = max(st.ultimo_alarme_l2, st.ultimo_alarme_l3, st.ultimo_alarme_l4, st.ultimo_alarme_l5)
+        libera_em = ultimo_alarme + P1.RANDOM_SILENCE_PERIOD_MIN * 60
+        if atual.get("est") is not None and libera_em <= now:
+            P1.tocar_random()
+            st.ultimo_random = now
+            espera = P1.RANDOM_INTERVAL_HOURS * 3600
+        else:
+            # tenta de novo quando o último alarme sair da janela (ou no próximo ciclo com dados)
+            espera = max(float(P1.COLETA_INTERVAL), libera_em - now)
+        tarefas["random"] = ag.agendar(espera, _tarefa_random, nome="random")
+
+    if getattr(P5.alarm_state, "ultimo_random", 0.0) <= 0:
+        P5.alarm_state.ultimo_random = ag.agora()
+    tarefas["snapshot"] = ag.a_cada(SNAP_INTERVAL_SEC, _tarefa_snapshot, nome="snapshot", primeiro=0.0)
+    tarefas["vento"] = ag.a_cada(
+        P1.VENTO_ALARME_CHECK_INTERVAL_MIN * 60.0, _tarefa_vento, nome="wind_check", primeiro=WIND_FIRST_CHECK_SEC
+    )
+    tarefas["random"] = ag.agendar(
+        max(0.0, P5.alarm_state.ultimo_random + P1.RANDOM_INTERVAL_HOURS * 3600 - ag.agora()), _tarefa_random, nome="random"
+    )
+    return tarefas
+
+
 def run_monitor():
     P1.log_event("RUN_START")
 
-    def _coletar_merged():
-        d_pr = P1.coletar_json(P1.URL_SMP_PITCH_ROLL)
-        d_wind = P2.coletar_wind_com_fallback()
-        return P5.merge_dados(d_pr, d_wind)
+    span = P1.CICLOS.span
+    _coletar_merged = _aquisicao.coletar_merged
 
     def _render_html(est_local):
         P5.gerar_html(
@@ -115,20 +193,34 @@ def run_monitor():
             est_local.get("wind_source"),
         )
 
+    tarefas = {}
+    aq = None
+    pipeline = None
     try:
-        dados = None
-        for _ in range(3):
-            if STOP_EVENT.is_set() or (P1._quit_evt and P1._quit_evt.is_signaled()):
-                encerrar_gracioso()
+        est = None
+        if P1.AQUISICAO_MODO == "processo":
+            # coleta + avaliação no processo filho; aqui só lemos o anel
+            aq = _aquisicao.AquisicaoEmProcesso()
+            aq.iniciar()
+            reg = aq.proxima(3 * P1.COLETA_INTERVAL)
+            if P1.parando():
                 return
-            dados = _coletar_merged()
+            est = reg[2].get("est") if reg else None
+        else:
+            dados = None
+            for _ in range(3):
+                if P1.parando():
+                    return
+                dados = _coletar_merged()
+                if dados:
+                    break
+                if STOP_EVENT.wait(0.6):
+                    return
             if dados:
-                break
-            time.sleep(0.6)
+                est = P4.avaliar_de_json(dados)
 
-        if dados:
-            est = P4.avaliar_de_json(dados)
-        else:
+        com_dados = est is not None
+        if not com_dados:
             ult = ler_ultimo_do_log()
             if ult:
                 p, r, w = ult
@@ -161,121 +253,111 @@ def run_monitor():
         _render_html(est)
         P5.abrir_html_no_navegador()
 
-        wind_alarm_state = {
-            "last_wind_alarm_ts": 0.0,
-            "next_wind_check_ts": time.monotonic() + P1.VENTO_ALARME_CHECK_INTERVAL_MIN * 60.0,
-        }
-
-        def verificar_alarme_vento(vento_val_atual, raj_val_atual):
-            now = time.monotonic()
-            try:
-                vento_num = None if (vento_val_atual is None) else float(vento_val_atual)
-                raj_num = None if (raj_val_atual is None) else float(raj_val_atual)
-            except Exception:
-                vento_num = raj_num = None
-            vento_acima = (vento_num is not None) and (vento_num > P1.VENTO_ALARME_THRESHOLD)
-            rajada_acima = (raj_num is not None) and (raj_num > P1.VENTO_ALARME_THRESHOLD)
-            if vento_acima or rajada_acima:
-                if (now - wind_alarm_state["last_wind_alarm_ts"]) >= (P1.VENTO_REARME_MIN * 60.0):
-                    P1.log_event("ALARM_WIND", vento=vento_num, raj=raj_num, threshold=P1.VENTO_ALARME_THRESHOLD)
-
-                    P1.tocar_alarme_vento()
-                    wind_alarm_state["last_wind_alarm_ts"] = now
-
-        wind_alarm_timer = threading.Timer(
-            9.0, lambda: verificar_alarme_vento(est.get("vento_med"), est.get("raj"))
-        )
-        wind_alarm_timer.daemon = True
-        wind_alarm_timer.start()
+        # última leitura com dados, lida pelas tarefas do agendador
+        atual = {"est": est if com_dados else None}
+        tarefas = agendar_tarefas_monitor(P1.AGENDADOR, atual)
 
         def processar_alarme_pitch_roll(est_local):
             P5.processar_alarme_pitch_roll(est_local)
 
-        now_boot = time.monotonic()
-        if not hasattr(P5.alarm_state, "ultimo_random") or P5.alarm_state.ultimo_random <= 0:
-            P5.alarm_state.ultimo_random = now_boot
+        def _gravar_historico(dados_local):
+            import _backtest
 
-        global _last_snap_ts
-        _last_snap_ts = time.monotonic() - SNAP_INTERVAL_SEC
+            _backtest.gravar_leitura(dados_local)
+
+        # sinks com fila própria: a coleta do ciclo N+1 não espera HTML,
+        # histórico nem alarme do ciclo N. Painel e histórico descartam o
+        # mais antigo; o alarme não perde leitura (o loop espera vaga).
+        pipeline = _pipeline.Pipeline(
+            _pipeline.Sink("html", _render_html, capacidade=1),
+            _pipeline.Sink("historico", _gravar_historico, capacidade=PIPELINE_HISTORICO_FILA),
+            _pipeline.Sink("alarme", processar_alarme_pitch_roll, capacidade=PIPELINE_ALARME_FILA, descartar_antigo=False),
+            perfil=P5.PROFILER,
+        ).iniciar()
 
         while not STOP_EVENT.is_set():
-            t0 = time.monotonic()
+            reg = None
+            if aq is not None:
+                aq.preferencia(P1.WIND_PREF)
+                # a espera do ciclo é a espera pela próxima leitura do anel
+                reg = aq.proxima(2 * P1.COLETA_INTERVAL + 1.0)
+                if STOP_EVENT.is_set():
+                    break
 
-            if STOP_EVENT.is_set() or (P1._quit_evt and P1._quit_evt.is_signaled()):
-                encerrar_gracioso()
-                return
-            dados = _coletar_merged()
-            if not dados:
-                _render_html({
-                    "pitch_val": 0,
-                    "roll_val": 0,
-                    "pitch_cor": "amarelo",
-                    "roll_cor": "amarelo",
-                    "rot": "⚠ SEM DADOS",
-                    "raj": 0,
-                    "raj_cor": "verde",
-                    "status_cor": "amarelo",
-                    "wdir_adj": None,
-                    "barometro": None,
-                    "wdir_lbl": None,
-                    "vento_med": None,
-                    "vento_cor": "verde",
-                    "wind_source": None,
-                })
+            t0 = time.monotonic()
+            ciclo = P1.CICLOS.iniciar()
+
+            dados = None
+            if aq is None:
+                dados = _coletar_merged()
+                if STOP_EVENT.is_set():
+                    break  # coleta interrompida pela parada: não pinta "sem dados"
+                est = None
+                if dados:
+                    with span("avaliar"):
+                        est = P4.avaliar_de_json(dados)
             else:
-                est = P4.avaliar_de_json(dados)
-                now = time.monotonic()
-                _render_html(est)
-                if (now - _last_snap_ts) >= SNAP_INTERVAL_SEC:
-                    P1.log_snapshot(
-                        est.get("pitch_val"),
-                        est.get("roll_val"),
-                        est.get("vento_med"),
-                        est.get("raj"),
-                        est.get("wind_source"),
-                    )
-                    _last_snap_ts = now
-                processar_alarme_pitch_roll(est)
-                if (now - P5.alarm_state.ultimo_random) >= (P1.RANDOM_INTERVAL_HOURS * 3600):
-                    tempo_limite = now - (P1.RANDOM_SILENCE_PERIOD_MIN * 60)
-                    sem_alarmes = (
-                        P5.alarm_state.ultimo_alarme_l2 < tempo_limite
-                        and P5.alarm_state.ultimo_alarme_l3 < tempo_limite
-                        and P5.alarm_state.ultimo_alarme_l4 < tempo_limite
-                        and P5.alarm_state.ultimo_alarme_l5 < tempo_limite
-                    )
-                    if sem_alarmes:
-                        P1.tocar_random()
-                        P5.alarm_state.ultimo_random = now
-                if now >= wind_alarm_state["next_wind_check_ts"]:
-                    wind_alarm_state["next_wind_check_ts"] = now + P1.VENTO_ALARME_CHECK_INTERVAL_MIN * 60.0
-                    verificar_alarme_vento(est.get("vento_med"), est.get("raj"))
+                est = reg[2].get("est") if reg else None
+                if reg:
+                    # a coleta e a avaliação foram medidas no filho
+                    P1.CICLOS.anexar(ciclo, reg[2].get("spans") or (), "lite2-aquisicao")
+                    ciclo.info["aquisicao_ms"] = reg[2].get("trabalho_ms")
+
+            atual["est"] = est
+            with span("publicar"):
+                if est is None:
+                    pipeline.publicar(ciclo, html={
+                        "pitch_val": 0,
+                        "roll_val": 0,
+                        "pitch_cor": "amarelo",
+                        "roll_cor": "amarelo",
+                        "rot": "⚠ SEM DADOS",
+                        "raj": 0,
+                        "raj_cor": "verde",
+                        "status_cor": "amarelo",
+                        "wdir_adj": None,
+                        "barometro": None,
+                        "wdir_lbl": None,
+                        "vento_med": None,
+                        "vento_cor": "verde",
+                        "wind_source": None,
+                    })
+                else:
+                    pipeline.publicar(ciclo, html=est, alarme=est)
+                    if dados and P1.HISTORICO_GRAVAR:
+                        pipeline.publicar(ciclo, historico=dados)
 
             elapsed = time.monotonic() - t0
-            rest = max(0.0, P1.COLETA_INTERVAL - elapsed)
-            if P1._quit_evt and getattr(P1._quit_evt, "handle", None) and P1.kernel32 is not None:
-                res = P1.kernel32.WaitForSingleObject(P1._quit_evt.handle, int(rest * 1000))
-                if res == P1.WAIT_OBJECT_0:
-                    encerrar_gracioso()
-                    return
-            else:
-                time.sleep(rest)
-
-        if wind_alarm_timer.is_alive():
-            wind_alarm_timer.cancel()
+            P1.CICLOS.fechar(dados=est is not None, overrun=elapsed > P1.COLETA_INTERVAL)
+            M.CYCLE_SEC.observe(elapsed)
+            if elapsed > P1.COLETA_INTERVAL:
+                M.CYCLE_OVERRUNS.inc()
+            if aq is None:
+                rest = max(0.0, P1.COLETA_INTERVAL - elapsed)
+                with span(ESPERA):
+                    STOP_EVENT.wait(rest)
     finally:
+        for t in tarefas.values():
+            t.cancel()
+        if pipeline is not None:
+            pipeline.parar()
+        if aq is not None:
+            aq.parar()
         P1.log_event("RUN_STOP")
 
 
 def _main():
     ap = P1.base_argparser()
-    args = ap.parse_args()
+    args, extras = ap.parse_known_args()
+
+    rc = P1.rodar_ferramenta(args, extras)
+    if rc is not None:
+        sys.exit(rc)
+    if extras:
+        ap.error("argumentos não reconhecidos: %s" % " ".join(extras))
 
     if args.stop:
-        ok = P1.signal_quit()
-        msg = "OK, sinal enviado." if ok else "Nenhuma instância encontrada."
-        print(msg)
-        sys.exit(0)
+        sys.exit(P1.pedir_parada())
 
     P1.keep_screen_on(True)
     atexit.register(lambda: P1.keep_screen_on(False))
@@ -287,6 +369,8 @@ def _main():
         P1._quit_evt.create()
     except Exception:
         P1._quit_evt = None
+    P1.instalar_sinais_parada()
+    P1.vigiar_quit_evt()
 
     if ja_existe:
         ok = P1.signal_quit()
@@ -298,19 +382,35 @@ def _main():
         print(msg)
         sys.exit(0)
 
+    # Pasta de saída, log (com retenção), requests e áudio: só aqui, depois
+    # dos caminhos rápidos (--stop, ferramentas)
+    P1.APP.iniciar()
+    P1.MEMORIA.iniciar(tracemalloc_ligado=P1.MEMORIA_TRACEMALLOC)
+
     # Inicia servidor
+    if args.server:
+        P1.CONTROL_SERVER_MODE = args.server
+    if args.aquisicao:
+        P1.AQUISICAO_MODO = args.aquisicao
     P5.start_control_server(P1.MUTE_CTRL_PORT)
 
     # Cria atalhos (AGORA, já com FILES e logging prontos)
     P5.ensure_http_shortcut(P1.MUTE_CTRL_PORT)
     P5.ensure_log_shortcut(P1.FILES["events"])
 
+    # O loop roda numa thread daemon: na parada a principal não espera
+    # coleta HTTP em curso (a sessão é fechada e a thread abandonada).
+    monitor = threading.Thread(target=run_monitor, name="lite2-monitor", daemon=True)
     try:
         P1.log_event("START")
-        run_monitor()
+        monitor.start()
+        # espera curta em laço: no Windows o Ctrl+C só chega entre as esperas
+        while monitor.is_alive() and not STOP_EVENT.wait(0.5):
+            pass
     except KeyboardInterrupt:
         P1.log.info("Interrompido por KeyboardInterrupt; encerrando.")
     finally:
         encerrar_gracioso()
+        monitor.join(PARADA_JOIN_SEC)
         P1.log_event("STOP")
 
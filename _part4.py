@@ -5,6 +5,7 @@
 
 from __future__ import annotations
 
+import _metrics as M
 import _part1 as P1
 import _part2 as P2
 
@@ -163,6 +164,7 @@ def avaliar_por_valores(pitch_val, roll_val, raj_val):
     }
 
 
+@M.cronometrar(M.AVALIAR_SEC)
 def avaliar_de_json(dados: dict):
     pitch_val = P2.soma_max_min_pitch(dados.get("ptchwnd", []), P1.HTML_WIN_PITCH)
     roll_val  = P2.soma_max_min_roll(dados.get("rollwnd", []), P1.HTML_WIN_ROLL)
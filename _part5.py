@@ -7,21 +7,25 @@ from __future__ import annotations
 
 from string import Template
 
+import gzip
 import json
 import os
+import queue
 import threading
 import time
-import webbrowser
 from datetime import datetime
 from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
-from typing import Any, Dict, Optional
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
 from urllib.parse import parse_qs, urlparse
 
+import _metrics as M
 import _part1 as P1
 import _part2 as P2
 import _part4 as P4
 from _html_fallback import HTML_TPL
+from _profiler import Profiler
 
 import contextlib
 
@@ -35,42 +39,151 @@ _CLIENT_ABORT_EXC = (BrokenPipeError, ConnectionResetError, ConnectionAbortedErr
 ALARM_CONFIRM_SEC = 6.0
 ALARM_SILENCE_SEC = 13 * 60.0  # 13 minutos
 
+# "dupla":  duas recoletas completas separadas por ALARM_CONFIRM_SEC
+# "rajada": amostra só pitch/roll em ritmo alto e confirma com K de N amostras,
+#           cada uma avaliada só nos pontos novos de ptchwnd/rollwnd
+ALARM_CONFIRM_MODO = "dupla"
+# nível -> (atraso até a 1ª amostra s, N amostras, K mínimo, intervalo entre amostras s)
+ALARM_RAJADA_POR_NIVEL = {
+    2: (3.0, 6, 5, 1.0),
+    3: (2.0, 6, 5, 0.5),
+    4: (1.0, 5, 4, 0.4),
+    5: (0.5, 4, 3, 0.25),
+}
+ALARM_RAJADA_TIMEOUT_SEC = 2.0  # timeout HTTP de cada amostra; depois disso ela conta como sem dados
+ALARM_COLETA_THREADS = 6  # coletas de confirmação em paralelo (rajada L5: até 4 amostras em voo)
+
 
 # =========================================================
 # LIVE VIEW (estado em memória para o painel HTTP + /data.json)
 # =========================================================
 
-_LIVE_LOCK = threading.Lock()
-_LIVE_VIEW: Dict[str, Any] = {
-    "last_epoch_ms": int(time.time() * 1000),
-    "rot": "⚠ SEM DADOS",
-    "status_cor": "amarelo",
-    "pitch_txt": "---",
-    "pitch_cor": "amarelo",
-    "roll_txt": "---",
-    "roll_cor": "amarelo",
-    "vento_med_txt": "---",
-    "vento_cor": "verde",
-    "rajada_txt": "---",
-    "rajada_cor": "verde",
-    "wdir_aj": "---",
-    "wdir_lbl": "---",
-    "barometro": "---",
-    "hora_html": "---",
-}
+GZIP_MIN_BYTES = 512  # abaixo disso o gzip não compensa
+GZIP_LEVEL = 6
+
+
+def _comprimir(bruto: bytes) -> Optional[bytes]:
+    return gzip.compress(bruto, compresslevel=GZIP_LEVEL, mtime=0) if len(bruto) >= GZIP_MIN_BYTES else None
+
+
+class LiveSnapshot:
+    """
+    Foto imutável do live view: versão, campos (somente leitura) e o
+    /data.json já codificado (bruto + gzip). `_set_live_view` monta uma
+    nova e troca a referência `_LIVE`; quem lê pega a referência uma vez e
+    usa sem lock nem cópia, então o tráfego do painel não disputa com o
+    gerar_html.
+    """
+
+    __slots__ = ("versao", "view", "data_json", "data_json_gz")
+
+    def __init__(self, versao: int, campos: Dict[str, Any]):
+        data_json = json.dumps({"ok": True, **campos}).encode("utf-8")
+        setattr_ = object.__setattr__
+        setattr_(self, "versao", versao)
+        setattr_(self, "view", MappingProxyType(dict(campos)))
+        setattr_(self, "data_json", data_json)
+        setattr_(self, "data_json_gz", _comprimir(data_json))
+
+    def __setattr__(self, nome, valor):
+        raise AttributeError("LiveSnapshot é imutável")
+
+
+_LIVE_ESCRITA = threading.Lock()  # só entre escritores; leitores não travam
+_LIVE = LiveSnapshot(
+    0,  # incrementa a cada _set_live_view (chave do cache de respostas)
+    {
+        "last_epoch_ms": int(time.time() * 1000),
+        "rot": "⚠ SEM DADOS",
+        "status_cor": "amarelo",
+        "pitch_txt": "---",
+        "pitch_cor": "amarelo",
+        "roll_txt": "---",
+        "roll_cor": "amarelo",
+        "vento_med_txt": "---",
+        "vento_cor": "verde",
+        "rajada_txt": "---",
+        "rajada_cor": "verde",
+        "wdir_aj": "---",
+        "wdir_lbl": "---",
+        "barometro": "---",
+        "hora_html": "---",
+    },
+)
 
 WRITE_HTML_FILE = False  # <- desliga geração do pitch_roll.html
 
+# Identifica esta execução; o painel recarrega a página se ela mudar (novo template/processo)
+BOOT_ID = str(int(time.time() * 1000))
+
+
+
+def live_snapshot() -> LiveSnapshot:
+    return _LIVE
 
 
-def _get_live_view() -> Dict[str, Any]:
-    with _LIVE_LOCK:
-        return dict(_LIVE_VIEW)
+def _get_live_view() -> Mapping[str, Any]:
+    return _LIVE.view
+
+
+def _get_live_view_versionada() -> Tuple[int, Mapping[str, Any]]:
+    """Devolve (versão, live view) da mesma foto."""
+    snap = _LIVE
+    return snap.versao, snap.view
 
 
 def _set_live_view(**kv) -> None:
-    with _LIVE_LOCK:
-        _LIVE_VIEW.update(kv)
+    global _LIVE
+    with _LIVE_ESCRITA:
+        atual = _LIVE
+        _LIVE = LiveSnapshot(atual.versao + 1, {**atual.view, **kv})
+
+
+# =========================================================
+# Cache de corpos HTTP (bruto + gzip) por versão do live view
+# =========================================================
+
+_BODY_CACHE_LOCK = threading.Lock()
+_BODY_CACHE: Dict[str, Tuple[Any, bytes, Optional[bytes]]] = {}
+
+
+def _corpo_em_cache(chave: str, versao: Any, montar: Callable[[], bytes]) -> Tuple[bytes, Optional[bytes]]:
+    """
+    Devolve (bruto, gzip) para `chave` na `versao` pedida (int ou tupla de contadores).
+    Monta e comprime só uma vez por versão; gzip é None para corpos pequenos.
+    """
+    with _BODY_CACHE_LOCK:
+        hit = _BODY_CACHE.get(chave)
+        if hit is not None and hit[0] == versao:
+            return hit[1], hit[2]
+
+    bruto = montar()
+    gz = _comprimir(bruto)
+
+    with _BODY_CACHE_LOCK:
+        atual = _BODY_CACHE.get(chave)
+        # não regride o cache se outra thread já gravou uma versão mais nova
+        if atual is None or atual[0] <= versao:
+            _BODY_CACHE[chave] = (versao, bruto, gz)
+    return bruto, gz
+
+
+def _aceita_gzip(accept_encoding: Optional[str]) -> bool:
+    """Interpreta Accept-Encoding (respeitando q=0)."""
+    for item in (accept_encoding or "").split(","):
+        partes = [p.strip() for p in item.split(";")]
+        if partes[0].lower() not in ("gzip", "*"):
+            continue
+        q = 1.0
+        for p in partes[1:]:
+            if p.lower().startswith("q="):
+                try:
+                    q = float(p[2:])
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            return True
+    return False
 
 
 # =========================================================
@@ -93,7 +206,117 @@ def _coletar_est_para_confirmacao():
         return None
 
 
-def _tocar_alarme_pitch_roll(nivel: int, est: dict) -> None:
+def _coletar_amostra_pitch_roll():
+    """Uma amostra crua de pitch/roll (sem vento), pela mesma sessão HTTP do loop: (ptchwnd, rollwnd) ou None."""
+    try:
+        d_pr = P1.coletar_json(P1.URL_SMP_PITCH_ROLL, tentativas=1, timeout=ALARM_RAJADA_TIMEOUT_SEC)
+        if not d_pr:
+            return None
+        return P2._only_finite(d_pr.get("ptchwnd")), P2._only_finite(d_pr.get("rollwnd"))
+    except Exception:
+        P1.log.exception("Falha ao amostrar pitch/roll para confirmação")
+        return None
+
+
+def _pontos_novos(anterior: list, atual: list) -> list:
+    """
+    Pontos do fim de `atual` que não estavam em `anterior` (janela deslizante
+    do PyHMS). Janela igual, ou mais velha que a anterior, não tem ponto
+    novo; sem encaixe nenhum (janela trocada inteira), tudo é novo.
+    """
+    n = len(atual)
+    if any(anterior[i : i + n] == atual for i in range(len(anterior) - n + 1)):
+        return []  # a mesma janela (ou uma já vista)
+    for novos in range(1, n):
+        resto = n - novos
+        if resto <= len(anterior) and atual[:resto] == anterior[len(anterior) - resto :]:
+            return atual[resto:]
+    for velhos in range(1, n):
+        if atual[velhos:] == anterior[: n - velhos]:
+            return []  # resposta atrasada, mais velha que a anterior
+    return atual
+
+
+def _est_pontos_novos(anterior: Optional[tuple], bruto: tuple) -> Optional[dict]:
+    """Avaliação da amostra só nos pontos que chegaram desde `anterior`; None se a janela não andou."""
+    if anterior is None:
+        pitch, roll = bruto
+    else:
+        pitch, roll = _pontos_novos(anterior[0], bruto[0]), _pontos_novos(anterior[1], bruto[1])
+    if not pitch and not roll:
+        return None
+    return P4.avaliar_por_valores(P2.soma_max_min_pitch(pitch, len(pitch)), P2.soma_max_min_roll(roll, len(roll)), None)
+
+
+class ColetorConfirmacao:
+    """
+    Threads daemon ("lite2-alarme-coleta-N") para as coletas HTTP das
+    confirmações: o agendador só marca o tempo e entrega a coleta aqui,
+    então um host lento não segura SNAP, vento, random nem outras
+    confirmações. `ao_terminar(resultado)` roda nesta thread; exceção na
+    coleta vira resultado None.
+    """
+
+    def __init__(self, threads: int = ALARM_COLETA_THREADS):
+        self.threads = max(1, int(threads))
+        self._fila: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._vivas: list = []
+        self._lock = threading.Lock()
+
+    def enviar(self, fn: Callable[[], Any], ao_terminar: Callable[[Any], None]) -> None:
+        with self._lock:
+            if not self._vivas:
+                for i in range(self.threads):
+                    th = threading.Thread(target=self._rodar, name="lite2-alarme-coleta-%d" % (i + 1), daemon=True)
+                    th.start()
+                    self._vivas.append(th)
+        self._fila.put((fn, ao_terminar))
+
+    def _rodar(self) -> None:
+        while True:
+            fn, ao_terminar = self._fila.get()
+            try:
+                res = fn()
+            except Exception:
+                P1.log.exception("Coleta de confirmação falhou")
+                res = None
+            try:
+                ao_terminar(res)
+            except Exception:
+                P1.log.exception("Confirmação de alarme falhou")
+
+
+COLETOR_CONFIRMACAO = ColetorConfirmacao()
+
+
+def _decidir_rajada(niveis: list, n: int, k: int, alvo: int) -> Tuple[str, int]:
+    """
+    ("confirma", nível) | ("rejeita", 0) | ("continua", 0) para as amostras até agora
+    (None = amostra sem dados). Nível confirmado = maior nível atingido por
+    pelo menos K amostras; decide cedo quando K amostras já chegaram ao alvo
+    ou quando as que faltam não bastam mais para K.
+    """
+    validos = [x for x in niveis if x is not None]
+
+    def _maior_com_k(minimo: int) -> int:
+        for lv in range(5, minimo - 1, -1):
+            if sum(1 for x in validos if x >= lv) >= k:
+                return lv
+        return 0
+
+    if sum(1 for x in validos if x >= alvo) >= k:
+        return "confirma", _maior_com_k(alvo)
+    restantes = n - len(niveis)
+    acima = sum(1 for x in validos if x >= 2)
+    if acima + restantes < k:
+        return "rejeita", 0
+    if restantes <= 0:
+        lv = _maior_com_k(2)
+        return ("confirma", lv) if lv >= 2 else ("rejeita", 0)
+    return "continua", 0
+
+
+def _tocar_alarme_pitch_roll(nivel: int, est: dict, **extra) -> None:
     cond = []
     if est.get("pitch_nivel", 0) >= 2 and est.get("pitch_rot") != "NIVELADA":
         cond.append(est["pitch_rot"])
@@ -106,13 +329,17 @@ def _tocar_alarme_pitch_roll(nivel: int, est: dict) -> None:
         pitch=est.get("pitch_val"),
         roll=est.get("roll_val"),
         dirs=",".join(cond) if cond else "NONE",
+        **extra,
     )
 
     def _seq():
+        # um único play() com o clip pré-montado; se não houver, clip a clip
+        if P1.tocar_alarme_composto(nivel, cond):
+            return
         P1.tocar_alerta(nivel)
         P1.falar_wavs(cond, incluir_atencao=(nivel >= 3), use_v2=(nivel >= 3))
 
-    P1.run_audio_sequence(_seq, nome="pitch_roll")
+    P1.enfileirar_audio(_seq, "pitch_roll", P1.PRIORIDADE_PITCH_ROLL_BASE + nivel)
 
 
 class AlarmState:
@@ -121,11 +348,56 @@ class AlarmState:
     - L0/L1: nunca toca
     - L2/L3/L4/L5: só toca quando subir (nivel_atual > nivel_anterior)
     - Após tocar nível N: silêncio por 11min para qualquer nível <= N
-    - Confirmação dupla: 5s + 5s (duas recoletas) antes de tocar
+    - Confirmação antes de tocar (ALARM_CONFIRM_MODO):
+      "dupla" (padrão): duas recoletas completas separadas por
+      ALARM_CONFIRM_SEC;
+      "rajada": N amostras rápidas de pitch/roll, toca se K ficarem no nível
+      (tempos por nível em ALARM_RAJADA_POR_NIVEL; L4/L5 mais rápidos). A
+      1ª amostra vale pela janela inteira; as seguintes só pelos pontos
+      novos desde a anterior, e a que não trouxe ponto novo conta como sem
+      dados, para K de N não virar a mesma janela lida N vezes.
+
+    `coletar` (recoleta da dupla), `amostrar` (amostra da rajada, já
+    avaliada: devolve o est e dispensa o corte de pontos novos),
+    `confirm_sec`, `modo` e `rajada` podem ser trocados para
+    benchmark/simulação; o padrão é a coleta HTTP real.
+    As confirmações são marcadas no `agendador` (padrão P1.AGENDADOR), que
+    também fornece o relógio; as coletas HTTP vão para o `coletor` (padrão
+    COLETOR_CONFIRMACAO) e o resultado segue na thread dele. Na rajada as
+    amostras saem em horários fixos desde o início e a que não volta em
+    ALARM_RAJADA_TIMEOUT_SEC conta como sem dados, então a decisão sai no
+    máximo em atraso + (N-1)*intervalo + timeout. Com RelogioVirtual as
+    coletas rodam na hora, na thread de quem avança o relógio: o fluxo todo
+    é testável sem esperar.
+    `mutado()`, `tocar(nivel, est, **extra)` e `log_evento(nome, **kv)`
+    substituem mute do painel, áudio e log de eventos (simulador).
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        coletar=None,
+        confirm_sec: Optional[float] = None,
+        agendador=None,
+        amostrar=None,
+        modo: Optional[str] = None,
+        rajada: Optional[Dict[int, Tuple[float, int, int, float]]] = None,
+        mutado: Optional[Callable[[], bool]] = None,
+        tocar: Optional[Callable[..., None]] = None,
+        log_evento: Optional[Callable[..., None]] = None,
+        coletor: Optional[ColetorConfirmacao] = None,
+    ):
         self.nivel_anterior = 0
+        self.agendador = agendador
+        self.coletor = coletor
+        self._coletar = coletar
+        self._amostrar = amostrar
+        self.confirm_sec = ALARM_CONFIRM_SEC if confirm_sec is None else float(confirm_sec)
+        self.modo = modo or ALARM_CONFIRM_MODO
+        self.rajada_por_nivel = rajada or ALARM_RAJADA_POR_NIVEL
+        self._rajada: Optional[dict] = None
+        self._mutado = mutado
+        self._tocar = tocar
+        self._log_evento = log_evento
 
         # silêncio "até" (por níveis <= silence_level)
         self.silence_level = 0
@@ -148,8 +420,57 @@ class AlarmState:
     def nivel_combinado(self, est: dict) -> int:
         return max(est.get("pitch_nivel", 0), est.get("roll_nivel", 0))
 
+    def _ag(self):
+        return self.agendador or P1.AGENDADOR
+
     def _now(self) -> float:
-        return time.monotonic()
+        return self._ag().agora()
+
+    def _recoletar(self):
+        return (self._coletar or _coletar_est_para_confirmacao)()
+
+    def _is_muted(self) -> bool:
+        return (self._mutado or is_muted_L23)()
+
+    def _tocar_alarme(self, nivel: int, est: dict, **extra) -> None:
+        (self._tocar or _tocar_alarme_pitch_roll)(nivel, est, **extra)
+
+    def _amostra(self):
+        return (self._amostrar or _coletar_amostra_pitch_roll)()
+
+    def _est_amostra_locked(self, r: dict, res) -> Optional[dict]:
+        """est da amostra da rajada: o `amostrar` injetado já devolve o est; a coleta real devolve a janela crua."""
+        if res is None or self._amostrar is not None:
+            return res
+        anterior = r.get("janela")
+        est = _est_pontos_novos(anterior, res)
+        if est is None:
+            P1.log.debug("Amostra da rajada sem pontos novos; conta como sem dados")
+        else:
+            r["janela"] = res
+        return est
+
+    def _em_segundo_plano(self, fn: Callable[[], Any], ao_terminar: Callable[[Any], None]) -> None:
+        """Coleta fora do agendador; com relógio virtual, na hora (simulação determinística)."""
+        if not self._ag().relogio.virtual:
+            (self.coletor or COLETOR_CONFIRMACAO).enviar(fn, ao_terminar)
+            return
+        try:
+            res = fn()
+        except Exception:
+            P1.log.exception("Coleta de confirmação falhou")
+            res = None
+        ao_terminar(res)
+
+    def cancelar(self) -> None:
+        """Cancela confirmações pendentes (fim do soak/testes); coletas em voo são ignoradas ao voltar."""
+        with self._lock:
+            r, self._rajada = self._rajada, None
+            for t in [self._confirm_timer1, self._confirm_timer2] + (r["tarefas"] if r else []):
+                if t is not None:
+                    t.cancel()
+            self._confirm_timer1 = self._confirm_timer2 = None
+            self.confirm_stage = 0
 
     def _is_silenced_locked(self, nivel: int, now: float) -> bool:
         return (nivel >= 2) and (nivel <= self.silence_level) and (now < self.silence_until)
@@ -167,7 +488,12 @@ class AlarmState:
             self.ultimo_alarme_l5 = now
 
     def _log_alarm_skip(self, reason: str, level: int, prev: int | None = None) -> None:
-        P1.log_event("ALARM_SUPPRESS", reason=reason, level=level, prev=prev)
+        (self._log_evento or P1.log_event)("ALARM_SUPPRESS", reason=reason, level=level, prev=prev)
+        M.ALARM_SUPPRESS.inc(reason=reason)
+        if reason.startswith(("confirm1_", "confirm2_")):
+            M.ALARM_CONFIRM.inc(stage=reason[7], result=reason[9:])
+        elif reason.startswith("burst_"):
+            M.ALARM_CONFIRM.inc(stage="burst", result=reason[6:])
 
     def maybe_schedule(self, est: dict) -> None:
         """Chamado no loop principal a cada atualização 'normal'."""
@@ -192,7 +518,7 @@ class AlarmState:
                 return
 
             # Mantém mute manual L2/L3
-            if nivel <= 3 and is_muted_L23():
+            if nivel <= 3 and self._is_muted():
                 self._log_alarm_skip("muted_L23", nivel, prev)
                 return
 
@@ -201,19 +527,113 @@ class AlarmState:
                 self._log_alarm_skip("confirm_pending", nivel, prev)
                 return
 
-            # Agenda 1ª confirmação (5s)
             self.confirm_stage = 1
-            self._confirm_timer1 = threading.Timer(ALARM_CONFIRM_SEC, self._confirm_stage1)
-            self._confirm_timer1.daemon = True
-            self._confirm_timer1.start()
+            if self.modo == "rajada":
+                self._iniciar_rajada_locked(nivel)
+                return
+
+            # Agenda 1ª confirmação (5s)
+            self._confirm_timer1 = self._ag().agendar(self.confirm_sec, self._confirm_stage1, nome="alarm_confirm1")
+
+    # -----------------------------------------------------
+    # confirmação por rajada
+    # -----------------------------------------------------
+    def _iniciar_rajada_locked(self, alvo: int) -> None:
+        atraso, n, k, intervalo = self.rajada_por_nivel.get(alvo) or self.rajada_por_nivel[max(self.rajada_por_nivel)]
+        r = {"alvo": alvo, "n": n, "k": k, "amostras": {}, "tarefas": [], "fim": False, "t0": self._now()}
+        self._rajada = r
+        # horários fixos desde o início: amostra lenta não empurra as seguintes
+        ag = self._ag()
+        r["tarefas"] = [ag.agendar(atraso + i * intervalo, self._amostra_rajada, r, i, nome="alarm_burst") for i in range(n)]
+
+    def _amostra_rajada(self, r: dict, i: int) -> None:
+        """Tarefa do agendador: manda a amostra i para o coletor e marca o prazo dela."""
+        if r["fim"]:
+            return
+        if P1.parando():
+            self._log_alarm_skip("quit_signal", level=0)
+            self._fechar_rajada(r)
+            return
+        self._em_segundo_plano(self._amostra, lambda est: self._registrar_amostra(r, i, est))
+        with self._lock:
+            if not r["fim"] and i not in r["amostras"]:
+                r["tarefas"].append(self._ag().agendar(ALARM_RAJADA_TIMEOUT_SEC, self._registrar_amostra, r, i, None, nome="alarm_burst_timeout"))
 
+    def _registrar_amostra(self, r: dict, i: int, res) -> None:
+        """Resultado (ou prazo vencido, None) da amostra i; decide quando já dá."""
+        with self._lock:
+            if r["fim"] or i in r["amostras"]:
+                return  # rajada encerrada ou amostra já contada (prazo x resposta atrasada)
+            r["amostras"][i] = self._est_amostra_locked(r, res)
+            niveis = [self.nivel_combinado(e) if e else None for _, e in sorted(r["amostras"].items())]
+            decisao, nivel = _decidir_rajada(niveis, r["n"], r["k"], r["alvo"])
+            if decisao == "continua":
+                return
+            self._encerrar_rajada_locked(r)
+        try:
+            if decisao == "rejeita":
+                vazio = all(x is None for x in niveis)
+                self._log_alarm_skip("burst_no_data" if vazio else "burst_low_level", level=max([x or 0 for x in niveis]))
+            else:
+                self._tocar_confirmado_rajada(nivel, r)
+        finally:
+            self._fechar_rajada(r)
+
+    def _encerrar_rajada_locked(self, r: dict) -> None:
+        r["fim"] = True
+        for t in r["tarefas"]:
+            t.cancel()
+
+    def _fechar_rajada(self, r: dict) -> None:
+        with self._lock:
+            self._encerrar_rajada_locked(r)
+            if self._rajada is r:
+                self.confirm_stage = 0
+                self._confirm_timer1 = None
+                self._rajada = None
+
+    def _tocar_confirmado_rajada(self, nivel: int, r: dict) -> None:
+        if nivel <= 3 and self._is_muted():
+            self._log_alarm_skip("burst_muted_L23", level=nivel)
+            return
+
+        now = self._now()
+        with self._lock:
+            if self._is_silenced_locked(nivel, now):
+                self._log_alarm_skip("burst_silenced", level=nivel)
+                return
+            self._apply_silence_locked(nivel, now)
+
+        # direções da amostra mais recente (em ordem de horário) que atingiu o nível confirmado
+        ests = [e for _, e in sorted(r["amostras"].items())]
+        niveis = [self.nivel_combinado(e) if e else None for e in ests]
+        est = next(e for e, lv in zip(reversed(ests), reversed(niveis)) if lv is not None and lv >= nivel)
+        acima = sum(1 for x in niveis if x is not None and x >= nivel)
+        M.ALARM_CONFIRM.inc(stage="burst", result="ok")
+        M.ALARM_PLAYED.inc(level=nivel)
+        self._tocar_alarme(
+            nivel,
+            est,
+            confirm="burst",
+            samples=f"{acima}/{len(niveis)}",
+            confirm_ms=round((now - r["t0"]) * 1000.0),
+        )
+
+    # -----------------------------------------------------
+    # confirmação dupla (tarefas do agendador só disparam a recoleta)
+    # -----------------------------------------------------
     def _confirm_stage1(self) -> None:
+        if P1.parando():
+            self._confirm_stage1_resultado(None)  # registra quit_signal e libera
+        else:
+            self._em_segundo_plano(self._recoletar, self._confirm_stage1_resultado)
+
+    def _confirm_stage1_resultado(self, est2: Optional[dict]) -> None:
         try:
-            if P1._quit_evt and P1._quit_evt.is_signaled():
+            if P1.parando():
                 self._log_alarm_skip("quit_signal", level=0)
                 return
 
-            est2 = _coletar_est_para_confirmacao()
             if not est2:
                 self._log_alarm_skip("confirm1_no_data", level=0)
                 return
@@ -223,7 +643,7 @@ class AlarmState:
                 self._log_alarm_skip("confirm1_low_level", level=nivel2)
                 return
 
-            if nivel2 <= 3 and is_muted_L23():
+            if nivel2 <= 3 and self._is_muted():
                 self._log_alarm_skip("confirm1_muted_L23", level=nivel2)
                 return
 
@@ -234,10 +654,9 @@ class AlarmState:
                     return
 
                 # Agenda 2ª confirmação
+                M.ALARM_CONFIRM.inc(stage="1", result="ok")
                 self.confirm_stage = 2
-                self._confirm_timer2 = threading.Timer(ALARM_CONFIRM_SEC, self._confirm_stage2)
-                self._confirm_timer2.daemon = True
-                self._confirm_timer2.start()
+                self._confirm_timer2 = self._ag().agendar(self.confirm_sec, self._confirm_stage2, nome="alarm_confirm2")
 
         finally:
             # se não avançou para estágio 2, libera
@@ -247,12 +666,17 @@ class AlarmState:
                 self._confirm_timer1 = None
 
     def _confirm_stage2(self) -> None:
+        if P1.parando():
+            self._confirm_stage2_resultado(None)
+        else:
+            self._em_segundo_plano(self._recoletar, self._confirm_stage2_resultado)
+
+    def _confirm_stage2_resultado(self, est3: Optional[dict]) -> None:
         try:
-            if P1._quit_evt and P1._quit_evt.is_signaled():
+            if P1.parando():
                 self._log_alarm_skip("quit_signal", level=0)
                 return
 
-            est3 = _coletar_est_para_confirmacao()
             if not est3:
                 self._log_alarm_skip("confirm2_no_data", level=0)
                 return
@@ -262,7 +686,7 @@ class AlarmState:
                 self._log_alarm_skip("confirm2_low_level", level=nivel3)
                 return
 
-            if nivel3 <= 3 and is_muted_L23():
+            if nivel3 <= 3 and self._is_muted():
                 self._log_alarm_skip("confirm2_muted_L23", level=nivel3)
                 return
 
@@ -275,7 +699,9 @@ class AlarmState:
                 # aplica silêncio ANTES de tocar
                 self._apply_silence_locked(nivel3, now)
 
-            _tocar_alarme_pitch_roll(nivel3, est3)
+            M.ALARM_CONFIRM.inc(stage="2", result="ok")
+            M.ALARM_PLAYED.inc(level=nivel3)
+            self._tocar_alarme(nivel3, est3)
 
         finally:
             with self._lock:
@@ -284,8 +710,6 @@ class AlarmState:
                 self._confirm_timer2 = None
 
 
-
-
 alarm_state = AlarmState()
 
 
@@ -301,6 +725,15 @@ def processar_alarme_pitch_roll(est: dict) -> None:
 MUTE_L23_UNTIL_TS = 0.0
 _mute_lock = threading.Lock()
 
+# muda a cada mute/unmute/wind_pref (entra na chave do cache do /state)
+_CTRL_VERSION = 0
+
+
+def _bump_ctrl_version() -> None:
+    global _CTRL_VERSION
+    with _mute_lock:
+        _CTRL_VERSION += 1
+
 
 def is_muted_L23() -> bool:
     with _mute_lock:
@@ -312,6 +745,7 @@ def _set_mute_L23_for_minutes(mins: float):
     until = time.time() + max(0, float(mins)) * 60.0
     with _mute_lock:
         MUTE_L23_UNTIL_TS = until
+    _bump_ctrl_version()
     return until
 
 
@@ -319,6 +753,7 @@ def _clear_mute_L23():
     global MUTE_L23_UNTIL_TS
     with _mute_lock:
         MUTE_L23_UNTIL_TS = 0.0
+    _bump_ctrl_version()
 
 
 # =========================================================
@@ -389,6 +824,195 @@ def refresh_html_now():
 # HTTP server
 # =========================================================
 
+def _state_doc() -> Tuple[bytes, Optional[bytes]]:
+    """Documento do /state, pré-codificado uma vez por combinação de versões."""
+    versao_view, view = _get_live_view_versionada()
+    versao_saude, hosts = P1.saude_hosts()
+    muted = is_muted_L23()  # expira sozinho, sem bump: entra na chave
+    chave = (versao_view, _CTRL_VERSION, versao_saude, muted)
+
+    def _montar() -> bytes:
+        doc = {
+            "ok": True,
+            "boot": BOOT_ID,
+            "version": "%d.%d.%d" % chave[:3],
+            "view": dict(view),
+            "muted": muted,
+            "muted_until": MUTE_L23_UNTIL_TS if muted else 0.0,
+            "wind_pref": P1.WIND_PREF,
+            "hosts": hosts,
+        }
+        return json.dumps(doc, ensure_ascii=False).encode("utf-8")
+
+    return _corpo_em_cache("state", chave, _montar)
+
+
+def _render_painel(view: Mapping[str, Any]) -> str:
+    """Preenche o HTML_TPL com um live view."""
+    return Template(HTML_TPL).safe_substitute(
+        refresh_ms=int(P1.HTML_REFRESH_SEC * 1000),
+        state_poll_ms=int(P1.STATE_POLL_SEC * 1000),
+        boot_id=BOOT_ID,
+        stale_sec=int(P1.HTML_STALE_MAX_AGE_SEC),
+        port=int(P1.MUTE_CTRL_PORT),
+        last_epoch_ms=view.get("last_epoch_ms", int(time.time() * 1000)),
+        rot=view.get("rot", "⚠ SEM DADOS"),
+        status_cor=view.get("status_cor", "amarelo"),
+        pitch_txt=view.get("pitch_txt", "---"),
+        pitch_cor=view.get("pitch_cor", "amarelo"),
+        roll_txt=view.get("roll_txt", "---"),
+        roll_cor=view.get("roll_cor", "amarelo"),
+        vento_med_txt=view.get("vento_med_txt", "---"),
+        vento_cor=view.get("vento_cor", "verde"),
+        rajada_txt=view.get("rajada_txt", "---"),
+        rajada_cor=view.get("rajada_cor", "verde"),
+        wdir_aj=view.get("wdir_aj", "---"),
+        wdir_lbl=view.get("wdir_lbl", "---"),
+        barometro=view.get("barometro", "---"),
+        hora=view.get("hora_html", "---"),
+    )
+
+
+# /debug/profile: captura sob demanda amarrada aos ciclos do run_monitor
+PROFILER = Profiler(P1.CICLOS, log=P1.log)
+
+_JSON_CT = "application/json; charset=utf-8"
+_HTML_CT = "text/html; charset=utf-8"
+
+
+class _Resposta:
+    """Resposta já codificada, independente do servidor (thread ou asyncio)."""
+
+    __slots__ = ("code", "content_type", "data", "gz", "cors")
+
+    def __init__(self, code: int, content_type: str, data: bytes, gz: Optional[bytes] = None, cors: bool = False):
+        self.code, self.content_type, self.data, self.gz, self.cors = code, content_type, data, gz, cors
+
+    def corpo_e_cabecalhos(self, accept_encoding: Optional[str]):
+        """Escolhe bruto/gzip e devolve (corpo, [(header, valor), ...])."""
+        usar_gz = self.gz is not None and _aceita_gzip(accept_encoding)
+        corpo = self.gz if usar_gz else self.data
+        headers = [("Content-Type", self.content_type), ("Content-Length", str(len(corpo)))]
+        if self.gz is not None:
+            headers.append(("Vary", "Accept-Encoding"))
+        if usar_gz:
+            headers.append(("Content-Encoding", "gzip"))
+        if self.cors:
+            headers.append(("Access-Control-Allow-Origin", "*"))
+        headers.append(("Cache-Control", "no-store, no-cache, must-revalidate, max-age=0"))
+        headers.append(("Pragma", "no-cache"))
+        return corpo, headers
+
+
+def _resp_json(obj: dict, code: int = 200) -> _Resposta:
+    return _Resposta(code, _JSON_CT, json.dumps(obj).encode("utf-8"), cors=True)
+
+
+def _rotear_get(raw_path: str) -> _Resposta:
+    """Roteia um GET do servidor de controle (compartilhado pelos dois servidores)."""
+    parsed = urlparse(raw_path)
+    path, qs = parsed.path, parse_qs(parsed.query or "")
+
+    # Painel HTTP principal (corpo montado/comprimido 1x por versão)
+    if path in ("/", "/index.html"):
+        versao, view = _get_live_view_versionada()
+        data, gz = _corpo_em_cache("painel", versao, lambda: _render_painel(view).encode("utf-8"))
+        return _Resposta(200, _HTML_CT, data, gz=gz)
+
+    # Dados do painel (polling JS)
+    if path == "/data.json":
+        snap = _LIVE  # já codificado na publicação
+        return _Resposta(200, _JSON_CT, snap.data_json, gz=snap.data_json_gz, cors=True)
+
+    # Estado combinado do painel (live view + mute + vento + saúde dos hosts)
+    if path == "/state":
+        data, gz = _state_doc()
+        return _Resposta(200, _JSON_CT, data, gz=gz, cors=True)
+
+    # Métricas (formato texto do Prometheus)
+    if path == "/metrics":
+        return _Resposta(200, M.CONTENT_TYPE, M.exposicao().encode("utf-8"))
+
+    # Spans dos últimos ciclos do run_monitor + flame dos mais lentos
+    if path == "/debug/cycles":
+        n = int(qs.get("n", ["30"])[0])
+        lentos = int(qs.get("lentos", ["5"])[0])
+        if qs.get("formato", [""])[0] == "colapsado":
+            return _Resposta(200, "text/plain; charset=utf-8", P1.CICLOS.colapsado(lentos).encode("utf-8"))
+        return _resp_json({"ok": True, **P1.CICLOS.resumo(n, lentos)})
+
+    # Perfil dos próximos N ciclos: 202 enquanto captura, 200 (texto) quando pronto
+    if path == "/debug/profile":
+        if qs.get("cancelar"):
+            PROFILER.cancelar()
+            return _resp_json({"ok": True, **PROFILER.status()})
+        pronto = PROFILER.coletar()
+        if pronto is not None:
+            return _Resposta(200, "text/plain; charset=utf-8", pronto.encode("utf-8"))
+        try:
+            st = PROFILER.pedir(int(qs.get("cycles", ["3"])[0]), qs.get("mode", ["cprofile"])[0])
+        except ValueError as e:
+            return _resp_json({"ok": False, "error": str(e)}, 400)
+        return _resp_json({"ok": True, **st}, 202)
+
+    # Memória, threads e objetos ao longo das últimas amostras (+ diff do tracemalloc)
+    if path == "/debug/memory":
+        liga = qs.get("tracemalloc", [""])[0]
+        if liga == "1":
+            P1.MEMORIA.ligar_tracemalloc()
+        elif liga == "0":
+            P1.MEMORIA.desligar_tracemalloc()
+        if liga or qs.get("amostrar"):
+            P1.MEMORIA.amostrar()
+        return _resp_json({"ok": True, **P1.MEMORIA.resumo(int(qs.get("top", ["15"])[0]))})
+
+    # Endpoints existentes
+    if path == "/mute":
+        mins = float(qs.get("mins", ["360"])[0])
+        until = _set_mute_L23_for_minutes(mins)
+        P1.log_event("MUTE", minutes=mins, until=until)
+        return _resp_json({"ok": True, "muted": True, "muted_until": until})
+
+    if path == "/unmute":
+        _clear_mute_L23()
+        P1.log_event("UNMUTE")
+        return _resp_json({"ok": True, "muted": False})
+
+    if path == "/mute_status":
+        return _resp_json({"ok": True, "muted": is_muted_L23(), "muted_until": MUTE_L23_UNTIL_TS})
+
+    if path == "/wind_pref":
+        prev = P1.WIND_PREF
+        if qs.get("host"):
+            val = qs.get("host", ["auto"])[0]
+            if val == "auto":
+                P1.WIND_PREF = None
+            else:
+                P1.WIND_PREF = val
+        if P1.WIND_PREF != prev:
+            _bump_ctrl_version()
+            P1.log_event("WIND_PREF", host=P1.WIND_PREF)
+        return _resp_json({"ok": True, "host": P1.WIND_PREF})
+
+    return _resp_json({"ok": False, "error": "unknown"}, 404)
+
+
+_ROTAS_CONHECIDAS = frozenset(
+    ("/", "/index.html", "/data.json", "/state", "/metrics", "/debug/cycles", "/debug/profile", "/debug/memory", "/mute", "/unmute", "/mute_status", "/wind_pref")
+)
+
+
+def _rotear_get_seguro(raw_path: str) -> _Resposta:
+    try:
+        resp = _rotear_get(raw_path)
+    except Exception:
+        P1.log.debug("Exceção ao rotear %s", raw_path, exc_info=True)
+        resp = _resp_json({"ok": False, "error": "exception"}, 500)
+    path = urlparse(raw_path).path
+    M.HTTP_REQUESTS.inc(path=path if path in _ROTAS_CONHECIDAS else "other", code=resp.code)
+    return resp
+
+
 class _ControlHandler(BaseHTTPRequestHandler):
     def log_message(self, *args, **kwargs):
         pass
@@ -396,127 +1020,44 @@ class _ControlHandler(BaseHTTPRequestHandler):
     def address_string(self):
         return "127.0.0.1"
 
-    def _reply_json(self, obj: dict, code=200):
-        data = json.dumps(obj).encode("utf-8")
+    def _enviar(self, resp: _Resposta):
+        corpo, headers = resp.corpo_e_cabecalhos(self.headers.get("Accept-Encoding"))
         try:
-            self.send_response(code)
-            self.send_header("Content-Type", "application/json; charset=utf-8")
-            self.send_header("Content-Length", str(len(data)))
-            self.send_header("Access-Control-Allow-Origin", "*")
-            self.send_header("Cache-Control", "no-store, no-cache, must-revalidate, max-age=0")
-            self.send_header("Pragma", "no-cache")
+            self.send_response(resp.code)
+            for k, v in headers:
+                self.send_header(k, v)
             self.end_headers()
-            self.wfile.write(data)
+            self.wfile.write(corpo)
         except _CLIENT_ABORT_EXC:
             # cliente (browser) cancelou/fechou/abortou: ignora
             return
         except Exception:
             # se der erro real aqui, não tente responder novamente (pode gerar loop de erro)
-            P1.log.debug("Falha ao responder JSON", exc_info=True)
+            P1.log.debug("Falha ao responder %s", resp.content_type, exc_info=True)
             return
 
-   
-
+    def _reply_json(self, obj: dict, code=200):
+        self._enviar(_resp_json(obj, code))
 
     def _reply_html(self, html: str, code: int = 200):
-        data = html.encode("utf-8")
-        try:
-            self.send_response(code)
-            self.send_header("Content-Type", "text/html; charset=utf-8")
-            self.send_header("Content-Length", str(len(data)))
-            self.send_header("Cache-Control", "no-store, no-cache, must-revalidate, max-age=0")
-            self.send_header("Pragma", "no-cache")
-            self.end_headers()
-            self.wfile.write(data)
-        except _CLIENT_ABORT_EXC:
-            return
-        except Exception:
-            P1.log.debug("Falha ao responder HTML", exc_info=True)
-            return
-
+        self._enviar(_Resposta(code, _HTML_CT, html.encode("utf-8")))
 
     def do_GET(self):
-        try:
-            parsed = urlparse(self.path)
-            path, qs = parsed.path, parse_qs(parsed.query or "")
-
-            # Painel HTTP principal
-            if path in ("/", "/index.html"):
-                view = _get_live_view()
-                html = Template(HTML_TPL).safe_substitute(
-                    refresh_ms=int(P1.HTML_REFRESH_SEC * 1000),
-                    stale_sec=int(P1.HTML_STALE_MAX_AGE_SEC),
-                    port=int(P1.MUTE_CTRL_PORT),
-                    last_epoch_ms=view.get("last_epoch_ms", int(time.time() * 1000)),
-                    rot=view.get("rot", "⚠ SEM DADOS"),
-                    status_cor=view.get("status_cor", "amarelo"),
-                    pitch_txt=view.get("pitch_txt", "---"),
-                    pitch_cor=view.get("pitch_cor", "amarelo"),
-                    roll_txt=view.get("roll_txt", "---"),
-                    roll_cor=view.get("roll_cor", "amarelo"),
-                    vento_med_txt=view.get("vento_med_txt", "---"),
-                    vento_cor=view.get("vento_cor", "verde"),
-                    rajada_txt=view.get("rajada_txt", "---"),
-                    rajada_cor=view.get("rajada_cor", "verde"),
-                    wdir_aj=view.get("wdir_aj", "---"),
-                    wdir_lbl=view.get("wdir_lbl", "---"),
-                    barometro=view.get("barometro", "---"),
-                    hora=view.get("hora_html", "---"),
-                )
-                self._reply_html(html, 200)
-                return
-
-            # Dados do painel (polling JS)
-            if path == "/data.json":
-                view = _get_live_view()
-                view = {"ok": True, **view}
-                self._reply_json(view, 200)
-                return
-
-            # Endpoints existentes
-            if path == "/mute":
-                mins = float(qs.get("mins", ["360"])[0])
-                until = _set_mute_L23_for_minutes(mins)
-                P1.log_event("MUTE", minutes=mins, until=until)
-                self._reply_json({"ok": True, "muted": True, "muted_until": until})
-                return
-
-            if path == "/unmute":
-                _clear_mute_L23()
-                P1.log_event("UNMUTE")
-                self._reply_json({"ok": True, "muted": False})
-                return
-
-            if path == "/mute_status":
-                self._reply_json({"ok": True, "muted": is_muted_L23(), "muted_until": MUTE_L23_UNTIL_TS})
-                return
-
-            if path == "/wind_pref":
-                prev = P1.WIND_PREF
-                if qs.get("host"):
-                    val = qs.get("host", ["auto"])[0]
-                    if val == "auto":
-                        P1.WIND_PREF = None
-                    else:
-                        P1.WIND_PREF = val
-                if P1.WIND_PREF != prev:
-                    P1.log_event("WIND_PREF", host=P1.WIND_PREF)
-                self._reply_json({"ok": True, "host": P1.WIND_PREF})
-                return
-
-            self._reply_json({"ok": False, "error": "unknown"}, 404)
-        except _CLIENT_ABORT_EXC:
-            return
-        except Exception:
-            # Evita tentar responder numa conexão já quebrada
-            P1.log.debug("Exceção em do_GET", exc_info=True)
-            self._reply_json({"ok": False, "error": "exception"}, 500)
+        self._enviar(_rotear_get_seguro(self.path))
 
-            return
 
+def start_control_server(port: int = P1.MUTE_CTRL_PORT, modo: Optional[str] = None):
+    """
+    Sobe o servidor de controle em background e devolve o objeto servidor (ou None).
+    modo: "thread" (ThreadingHTTPServer, 1 thread por conexão) ou "asyncio"
+    (1 thread só, keep-alive, limite de conexões). Padrão: P1.CONTROL_SERVER_MODE.
+    """
+    modo = (modo or P1.CONTROL_SERVER_MODE or "thread").lower()
+    if modo == "asyncio":
+        import _aserver
 
+        return _aserver.start_async_control_server(port)
 
-def start_control_server(port: int = P1.MUTE_CTRL_PORT):
     try:
         srv = ThreadingHTTPServer(("127.0.0.1", port), _ControlHandler)
     except Exception:
@@ -540,6 +1081,7 @@ def _fmt_or_dash(val, fmt: str) -> str:
         return "---"
 
 
+@M.cronometrar(M.GERAR_HTML_SEC)
 def gerar_html(
     p,
     r,
@@ -558,7 +1100,7 @@ def gerar_html(
 ):
     """
     Atualiza:
-    1) Estado em memória (_LIVE_VIEW) -> painel HTTP (blindado)
+    1) Estado em memória (nova LiveSnapshot em _LIVE) -> painel HTTP (blindado)
     2) Arquivo HTML (opcional). Se travar por OneDrive/lock, não derruba o painel HTTP.
     """
     last_epoch_ms = int(time.time() * 1000)
@@ -598,6 +1140,8 @@ def gerar_html(
     try:
         html = Template(HTML_TPL).safe_substitute(
             refresh_ms=int(P1.HTML_REFRESH_SEC * 1000),
+            state_poll_ms=int(P1.STATE_POLL_SEC * 1000),
+            boot_id=BOOT_ID,
             stale_sec=int(P1.HTML_STALE_MAX_AGE_SEC),
             last_epoch_ms=last_epoch_ms,
             port=int(P1.MUTE_CTRL_PORT),
@@ -638,6 +1182,8 @@ def gerar_html(
 def abrir_html_no_navegador():
     """Abre o painel HTTP (mais blindado, sem file:// e sem reload)."""
     try:
+        import webbrowser
+
         url = f"http://127.0.0.1:{P1.MUTE_CTRL_PORT}/"
         webbrowser.open(url, new=0, autoraise=True)
     except Exception:
@@ -647,6 +1193,8 @@ def abrir_html_no_navegador():
 def abrir_html_file_no_navegador():
     """Opcional: abre o HTML por file:// (fallback/manual)."""
     try:
+        import webbrowser
+
         uri = Path(P1.FILES["html"]).resolve().as_uri()
         webbrowser.open(uri, new=0, autoraise=True)
     except Exception:
@@ -837,6 +1385,8 @@ $Shortcut.Save()
 
 __all__ = [
     "AlarmState",
+    "ColetorConfirmacao",
+    "COLETOR_CONFIRMACAO",
     "alarm_state",
     "processar_alarme_pitch_roll",
     "is_muted_L23",
@@ -845,6 +1395,8 @@ __all__ = [
     "ensure_http_shortcut",
     "refresh_html_now",
     "gerar_html",
+    "LiveSnapshot",
+    "live_snapshot",
     "abrir_html_no_navegador",
     "abrir_html_file_no_navegador",
 ]
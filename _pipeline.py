@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Estágios do run_monitor: o loop coleta e avalia; cada leitura vai para sinks com fila limitada (painel/HTML, histórico, alarme)."""
+
+from __future__ import annotations
+
+import contextlib
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+import _metrics as M
+import _part1 as P1
+from _ciclos import Ciclo
+
+PARADA_SEC = 0.2  # espera cada sink sair no parar()
+
+DESCARTES = M.counter("lite2_pipeline_dropped_total", "Itens descartados (o mais antigo) por fila cheia", ("sink",))
+BLOQUEIOS = M.counter("lite2_pipeline_blocked_total", "Vezes que o loop esperou vaga num sink crítico", ("sink",))
+FILA = M.gauge("lite2_pipeline_queue_depth", "Itens esperando em cada sink", ("sink",))
+
+
+class Sink:
+    """
+    Uma thread ("lite2-sink-<nome>") e uma fila limitada por destino.
+
+    - `descartar_antigo=True` (painel, histórico): com a fila cheia o item
+      mais antigo sai (DESCARTES) e o publicador nunca espera; com
+      capacidade 1 fica só a leitura mais nova.
+    - `descartar_antigo=False` (alarme): nada se perde; o publicador espera
+      vaga (BLOQUEIOS) até a parada.
+    - `fn(item)` roda no span `nome` do ciclo que publicou o item; exceção
+      é logada e o sink segue.
+    - `perfil` (o Profiler do /debug/profile): `fn(item)` roda dentro de
+      `perfil.na_thread()`, para o cprofile enxergar também esta thread.
+    """
+
+    def __init__(self, nome: str, fn: Callable[[Any], Any], capacidade: int = 1, descartar_antigo: bool = True, perfil=None):
+        self.nome = nome
+        self.fn = fn
+        self.perfil = perfil
+        self.capacidade = max(1, int(capacidade))
+        self.descartar_antigo = descartar_antigo
+        self._fila: deque = deque()
+        self._cond = threading.Condition()
+        self._ocupado = False
+        self._parar = False
+        self._thread: Optional[threading.Thread] = None
+        self.processados = 0
+        self.descartados = 0
+
+    def iniciar(self) -> None:
+        self._thread = threading.Thread(target=self._rodar, name="lite2-sink-%s" % self.nome, daemon=True)
+        self._thread.start()
+
+    def publicar(self, item: Any, ciclo: Optional[Ciclo] = None) -> bool:
+        """Enfileira; False se o sink está parando (ou a parada chegou esperando vaga)."""
+        with self._cond:
+            if len(self._fila) >= self.capacidade:
+                if self.descartar_antigo:
+                    self._fila.popleft()
+                    self.descartados += 1
+                    DESCARTES.inc(sink=self.nome)
+                else:
+                    BLOQUEIOS.inc(sink=self.nome)
+                    while len(self._fila) >= self.capacidade and not self._parar and not P1.parando():
+                        self._cond.wait(0.25)
+            if self._parar or P1.parando():
+                return False
+            self._fila.append((item, ciclo))
+            FILA.set(len(self._fila), sink=self.nome)
+            self._cond.notify_all()
+            return True
+
+    def _rodar(self) -> None:
+        while True:
+            with self._cond:
+                while not self._fila and not self._parar:
+                    self._cond.wait()
+                if self._parar:
+                    return
+                item, ciclo = self._fila.popleft()
+                FILA.set(len(self._fila), sink=self.nome)
+                self._ocupado = True
+                self._cond.notify_all()
+            perfilar = self.perfil.na_thread() if self.perfil is not None else contextlib.nullcontext()
+            try:
+                with P1.CICLOS.span(self.nome, ciclo), perfilar:
+                    self.fn(item)
+            except Exception:
+                P1.log.exception("Sink %s falhou", self.nome)
+            finally:
+                with self._cond:
+                    self._ocupado = False
+                    self.processados += 1
+                    self._cond.notify_all()
+
+    def drenar(self, timeout: float) -> bool:
+        """Espera a fila esvaziar e o item em curso terminar; True se conseguiu."""
+        fim = time.monotonic() + timeout
+        with self._cond:
+            while self._fila or self._ocupado:
+                resto = fim - time.monotonic()
+                if resto <= 0:
+                    return False
+                self._cond.wait(resto)
+        return True
+
+    def parar(self, timeout: float = PARADA_SEC) -> None:
+        """Descarta o que está na fila; o item em curso termina na thread daemon."""
+        with self._cond:
+            self._parar = True
+            self._fila.clear()
+            FILA.set(0, sink=self.nome)
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+class Pipeline:
+    """Fan-out do loop: `publicar(ciclo, html=..., alarme=...)` entrega cada item ao sink de mesmo nome; `perfil` vale para todos os sinks."""
+
+    def __init__(self, *sinks: Sink, perfil=None):
+        self.sinks: Dict[str, Sink] = {s.nome: s for s in sinks}
+        if perfil is not None:
+            for s in sinks:
+                s.perfil = perfil
+
+    def iniciar(self) -> "Pipeline":
+        for s in self.sinks.values():
+            s.iniciar()
+        return self
+
+    def publicar(self, ciclo: Optional[Ciclo] = None, **itens: Any) -> None:
+        for nome, item in itens.items():
+            self.sinks[nome].publicar(item, ciclo)
+
+    def drenar(self, timeout: float) -> bool:
+        fim = time.monotonic() + timeout
+        return all(s.drenar(max(0.0, fim - time.monotonic())) for s in self.sinks.values())
+
+    def parar(self, timeout: float = PARADA_SEC) -> None:
+        for s in self.sinks.values():
+            s.parar(timeout)
+
+
+__all__ = [
+    "Sink",
+    "Pipeline",
+]
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Captura de perfil sob demanda (/debug/profile): cProfile do loop e dos sinks ou amostragem de pilhas de todas as threads."""
+
+from __future__ import annotations
+
+import io
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+MODOS = ("cprofile", "sample")
+MAX_CICLOS = 50
+AMOSTRA_SEC = 0.005  # intervalo do amostrador
+PSTATS_LINHAS = 60  # funções listadas no texto do cprofile
+
+
+class Profiler:
+    """
+    Uma captura por vez, amarrada aos ciclos do run_monitor (é ouvinte do
+    RegistroCiclos):
+
+    - `pedir(ciclos, modo)` arma a captura; ela começa no próximo ciclo.
+    - cprofile: cProfile na thread do loop, ligado do início ao fim do
+      trabalho de cada ciclo (a espera entre ciclos fica de fora), e um
+      Profile por thread de sink, ligado por `na_thread()` enquanto o
+      sink processa um item (Sink._rodar). As estatísticas são somadas no
+      texto do pstats (tempo acumulado), montado no `coletar()` depois
+      que o último sink em curso desligou o seu.
+    - sample: uma thread lê sys._current_frames() a cada AMOSTRA_SEC,
+      do início do primeiro ao fim do último ciclo, em todas as threads
+      (esperas incluídas); resultado em pilhas colapsadas
+      ("thread;arquivo:função;... contagem"), formato do flamegraph.pl.
+    - Estados: ocioso -> aguardando -> capturando -> pronto; `coletar()`
+      entrega o resultado pronto uma vez e volta a ocioso.
+    """
+
+    def __init__(self, ciclos_reg=None, log=None, amostra_sec: float = AMOSTRA_SEC):
+        self.log = log
+        self.amostra_sec = amostra_sec
+        self._lock = threading.Lock()
+        self._estado = "ocioso"
+        self._modo = None
+        self._ciclos = 0
+        self._feitos = 0
+        self._inicio = None
+        self._prof = None
+        self._prof_loop = None  # o Profile ligado na thread do loop (só ela desliga)
+        self._perfis: Dict[str, object] = {}  # Profile de cada thread de sink, por nome
+        self._ativos = 0  # Profiles de sink ligados agora
+        self._cab = ""
+        self._amostras: Dict[str, int] = {}
+        self._n_amostras = 0
+        self._parar_amostra = threading.Event()
+        self._thread_amostra: Optional[threading.Thread] = None
+        self._resultado: Optional[str] = None
+        if ciclos_reg is not None:
+            ciclos_reg.ouvir(self)
+
+    # -----------------------------------------------------
+    # API (thread do servidor)
+    # -----------------------------------------------------
+    def pedir(self, ciclos: int, modo: str) -> Dict:
+        """Arma uma captura se não houver outra em andamento; devolve o status."""
+        ciclos = max(1, min(int(ciclos), MAX_CICLOS))
+        with self._lock:
+            if self._estado == "ocioso":
+                if modo not in MODOS:
+                    raise ValueError("modo deve ser cprofile ou sample")
+                self._estado, self._modo, self._ciclos, self._feitos = "aguardando", modo, ciclos, 0
+                self._resultado, self._perfis = None, {}
+        return self.status()
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {
+                "estado": self._estado,
+                "modo": self._modo,
+                "ciclos": self._ciclos,
+                "feitos": self._feitos,
+                "amostras": self._n_amostras if self._modo == "sample" else None,
+            }
+
+    def coletar(self) -> Optional[str]:
+        """Resultado pronto (uma vez); None se não há ou se um sink ainda está com o perfil ligado."""
+        with self._lock:
+            if self._estado != "pronto" or self._ativos:
+                return None
+            if self._resultado is None:
+                self._resultado = self._cab + self._texto_pstats()
+            self._prof, self._perfis = None, {}
+            res, self._resultado = self._resultado, None
+            self._estado, self._modo = "ocioso", None
+            return res
+
+    def cancelar(self) -> None:
+        with self._lock:
+            self._prof, self._perfis = None, {}
+            self._estado, self._modo, self._resultado = "ocioso", None, None
+            self._parar_amostra.set()
+
+    @contextmanager
+    def na_thread(self) -> Iterator[None]:
+        """Liga o Profile desta thread durante o bloco se há captura cprofile em andamento; senão não faz nada."""
+        prof = None
+        # no 3.12+ o cProfile usa sys.monitoring, global: um segundo Profile
+        # ligado derrubaria o do loop, então lá os sinks ficam de fora
+        if sys.version_info < (3, 12) and self._estado == "capturando" and self._modo == "cprofile":
+            with self._lock:
+                if self._estado == "capturando" and self._prof is not None:
+                    nome = threading.current_thread().name
+                    prof = self._perfis.get(nome)
+                    if prof is None:
+                        import cProfile
+
+                        prof = self._perfis[nome] = cProfile.Profile()
+                    self._ativos += 1
+        if prof is not None:
+            try:
+                prof.enable()
+            except ValueError:
+                # outro profiler ativo na thread
+                with self._lock:
+                    self._ativos -= 1
+                prof = None
+        try:
+            yield
+        finally:
+            if prof is not None:
+                prof.disable()
+                with self._lock:
+                    self._ativos -= 1
+
+    # -----------------------------------------------------
+    # ouvinte dos ciclos (thread do loop)
+    # -----------------------------------------------------
+    def ao_iniciar(self, ciclo) -> None:
+        if self._estado == "ocioso" or self._estado == "pronto":
+            return
+        with self._lock:
+            if self._estado == "aguardando":
+                self._estado, self._inicio = "capturando", time.perf_counter()
+                if self._modo == "cprofile":
+                    import cProfile
+
+                    self._prof = cProfile.Profile()
+                else:
+                    self._iniciar_amostragem()
+            if self._estado == "capturando" and self._prof is not None:
+                try:
+                    self._prof.enable()
+                    self._prof_loop = self._prof
+                except ValueError:
+                    # outro profiler ativo na thread
+                    self._finalizar_locked("erro: outro profiler já está ativo no loop\n")
+
+    def ao_fechar(self, ciclo) -> None:
+        if self._prof_loop is not None:
+            self._prof_loop.disable()
+            self._prof_loop = None
+        if self._estado != "capturando":
+            return
+        with self._lock:
+            if self._estado != "capturando":
+                return
+            self._feitos += 1
+            if self._feitos >= self._ciclos:
+                self._finalizar_locked(None)
+
+    # -----------------------------------------------------
+    # interno
+    # -----------------------------------------------------
+    def _finalizar_locked(self, erro: Optional[str]) -> None:
+        dur = time.perf_counter() - (self._inicio or time.perf_counter())
+        cab = "# %s, %d ciclo(s), %.2f s\n" % (self._modo, self._feitos, dur)
+        if erro is not None:
+            texto = erro
+        elif self._modo == "cprofile":
+            # o pstats sai no coletar(): os sinks ainda podem estar no item do último ciclo
+            self._cab, texto = cab, None
+        else:
+            self._parar_amostra.set()  # o amostrador confere isto sob o lock e sai
+            texto = "".join("%s %d\n" % (p, n) for p, n in sorted(self._amostras.items(), key=lambda x: x[1], reverse=True))
+            cab += "# %d amostras a cada %.0f ms\n" % (self._n_amostras, self.amostra_sec * 1000.0)
+        if texto is not None:
+            self._prof, self._perfis = None, {}
+            self._resultado = cab + texto
+        self._estado = "pronto"
+        if self.log:
+            self.log.info("Perfil %s pronto (%d ciclos, %.2f s)", self._modo, self._feitos, dur)
+
+    def _texto_pstats(self) -> str:
+        import pstats
+
+        buf = io.StringIO()
+        st = pstats.Stats(self._prof, stream=buf)
+        for prof in self._perfis.values():
+            st.add(prof)
+        st.strip_dirs().sort_stats("cumulative").print_stats(PSTATS_LINHAS)
+        return buf.getvalue()
+
+    def _iniciar_amostragem(self) -> None:
+        self._amostras, self._n_amostras = {}, 0
+        self._parar_amostra = threading.Event()
+        self._thread_amostra = threading.Thread(target=self._amostrar, args=(self._parar_amostra,), name="lite2-profiler", daemon=True)
+        self._thread_amostra.start()
+
+    def _amostrar(self, parar: threading.Event) -> None:
+        eu = threading.get_ident()
+        while not parar.wait(self.amostra_sec):
+            nomes = {t.ident: t.name for t in threading.enumerate()}
+            pilhas = []
+            for ident, frame in sys._current_frames().items():
+                if ident == eu:
+                    continue
+                funcs = []
+                while frame is not None:
+                    co = frame.f_code
+                    funcs.append("%s:%s" % (os.path.basename(co.co_filename), co.co_name))
+                    frame = frame.f_back
+                pilhas.append(";".join([nomes.get(ident, str(ident))] + funcs[::-1]))
+            with self._lock:
+                if parar.is_set():
+                    return
+                for p in pilhas:
+                    self._amostras[p] = self._amostras.get(p, 0) + 1
+                self._n_amostras += 1
+
+
+__all__ = [
+    "MODOS",
+    "MAX_CICLOS",
+    "Profiler",
+]
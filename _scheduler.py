@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Agendador único (heap + 1 thread) para trabalho atrasado/periódico, com relógio virtual para testes."""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+import threading
+import time
+from typing import Any, Callable, List, Optional, Tuple
+
+import _metrics as M
+
+SCHED_TASKS = M.counter("lite2_scheduler_tasks_total", "Tarefas executadas pelo agendador", ("task", "result"))
+SCHED_LAG_SEC = M.histogram("lite2_scheduler_lag_seconds", "Atraso entre o horário previsto e o início da tarefa")
+
+
+class RelogioReal:
+    virtual = False
+
+    def agora(self) -> float:
+        return time.monotonic()
+
+
+class RelogioVirtual:
+    """Só anda quando o Agendador.avancar() manda; tudo roda na thread de quem avança."""
+
+    virtual = True
+
+    def __init__(self, inicio: float = 0.0):
+        self._t = float(inicio)
+
+    def agora(self) -> float:
+        return self._t
+
+    def _ir_para(self, t: float) -> None:
+        if t > self._t:
+            self._t = t
+
+
+class Tarefa:
+    __slots__ = ("nome", "quando", "intervalo", "fn", "args", "kwargs", "cancelada", "execucoes")
+
+    def __init__(self, nome: str, quando: float, fn: Callable, args: tuple, kwargs: dict, intervalo: Optional[float]):
+        self.nome = nome
+        self.quando = quando
+        self.intervalo = intervalo
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.cancelada = False
+        self.execucoes = 0
+
+    def cancel(self) -> None:
+        self.cancelada = True
+
+    # compat com threading.Timer
+    def is_alive(self) -> bool:
+        return not self.cancelada and (self.intervalo is not None or self.execucoes == 0)
+
+
+class Agendador:
+    """
+    - `agendar(atraso, fn, ...)` / `a_cada(intervalo, fn, ...)` devolvem uma
+      Tarefa cancelável (`tarefa.cancel()`); cancelar é O(1), a entrada
+      cancelada só é descartada quando chega ao topo do heap.
+    - Relógio real: uma thread daemon (criada no primeiro agendamento) dorme
+      até o próximo horário. Tarefas rodam em sequência nessa thread, então
+      devem ser curtas; áudio vai para a fila de áudio, não toca aqui.
+    - Relógio virtual: não há thread; `avancar(seg)` executa, em ordem, tudo
+      que vence no intervalo, movendo o relógio para o horário de cada tarefa.
+    - Periódicas são reagendadas a partir do horário previsto (sem deriva);
+      se atrasarem mais de um intervalo, pulam para agora + intervalo.
+    """
+
+    def __init__(self, relogio=None, log=None):
+        self.relogio = relogio or RelogioReal()
+        self.log = log
+        self._heap: List[Tuple[float, int, Tarefa]] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._parado = False
+
+    def agora(self) -> float:
+        return self.relogio.agora()
+
+    # -----------------------------------------------------
+    # API
+    # -----------------------------------------------------
+    def agendar(self, atraso: float, fn: Callable, *args: Any, nome: Optional[str] = None, **kwargs: Any) -> Tarefa:
+        return self._inserir(atraso, fn, args, kwargs, nome, None)
+
+    def a_cada(self, intervalo: float, fn: Callable, *args: Any, nome: Optional[str] = None, primeiro: Optional[float] = None, **kwargs: Any) -> Tarefa:
+        """Periódica; a primeira execução é em `primeiro` s (padrão: um intervalo)."""
+        return self._inserir(intervalo if primeiro is None else primeiro, fn, args, kwargs, nome, float(intervalo))
+
+    def pendentes(self) -> int:
+        with self._cond:
+            return sum(1 for _, _, t in self._heap if not t.cancelada)
+
+    def parar(self, timeout: float = 1.0) -> None:
+        """Cancela tudo e encerra a thread (relógio real)."""
+        with self._cond:
+            self._parado = True
+            for _, _, t in self._heap:
+                t.cancelada = True
+            self._heap.clear()
+            self._cond.notify_all()
+        th = self._thread
+        if th is not None and th is not threading.current_thread():
+            th.join(timeout)
+
+    def avancar(self, seg: float) -> int:
+        """Relógio virtual: executa o que vence em [agora, agora+seg]; devolve quantas rodaram."""
+        if not self.relogio.virtual:
+            raise RuntimeError("avancar() só vale com RelogioVirtual")
+        limite = self.relogio.agora() + seg
+        n = 0
+        while True:
+            with self._cond:
+                tarefa = self._retirar_vencida(limite)
+            if tarefa is None:
+                break
+            self.relogio._ir_para(tarefa.quando)
+            self._executar(tarefa)
+            n += 1
+        self.relogio._ir_para(limite)
+        return n
+
+    # -----------------------------------------------------
+    # interno
+    # -----------------------------------------------------
+    def _inserir(self, atraso, fn, args, kwargs, nome, intervalo) -> Tarefa:
+        tarefa = Tarefa(nome or getattr(fn, "__name__", "tarefa"), self.agora() + max(0.0, float(atraso)), fn, args, kwargs, intervalo)
+        with self._cond:
+            if self._parado:
+                tarefa.cancelada = True
+                return tarefa
+            heapq.heappush(self._heap, (tarefa.quando, next(self._seq), tarefa))
+            if not self.relogio.virtual and (self._thread is None or not self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._loop, name="lite2-agendador", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return tarefa
+
+    def _retirar_vencida(self, limite: float) -> Optional[Tarefa]:
+        while self._heap:
+            quando, _, tarefa = self._heap[0]
+            if tarefa.cancelada:
+                heapq.heappop(self._heap)
+                continue
+            if quando > limite:
+                return None
+            heapq.heappop(self._heap)
+            return tarefa
+        return None
+
+    def _executar(self, tarefa: Tarefa) -> None:
+        if tarefa.cancelada:
+            return
+        SCHED_LAG_SEC.observe(max(0.0, self.agora() - tarefa.quando))
+        tarefa.execucoes += 1
+        try:
+            tarefa.fn(*tarefa.args, **tarefa.kwargs)
+            SCHED_TASKS.inc(task=tarefa.nome, result="ok")
+        except Exception:
+            SCHED_TASKS.inc(task=tarefa.nome, result="error")
+            if self.log:
+                self.log.exception("Tarefa agendada %s falhou", tarefa.nome)
+        if tarefa.intervalo is not None and not tarefa.cancelada:
+            agora = self.agora()
+            prox = tarefa.quando + tarefa.intervalo
+            tarefa.quando = prox if prox > agora else agora + tarefa.intervalo
+            with self._cond:
+                if not self._parado:
+                    heapq.heappush(self._heap, (tarefa.quando, next(self._seq), tarefa))
+                    self._cond.notify()
+
+    def _loop(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    if self._parado:
+                        return
+                    agora = self.agora()
+                    tarefa = self._retirar_vencida(agora)
+                    if tarefa is not None:
+                        break
+                    espera = (self._heap[0][0] - agora) if self._heap else None
+                    self._cond.wait(espera)
+            self._executar(tarefa)
+
+
+__all__ = [
+    "RelogioReal",
+    "RelogioVirtual",
+    "Tarefa",
+    "Agendador",
+]
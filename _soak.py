@@ -0,0 +1,571 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Soak test: o run_monitor real contra um PyHMS local com mar sintético, tempo comprimido e hosts falhando."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import ExitStack, contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import _part1 as P1
+import _part3 as P3
+import _part5 as P5
+from _audiobackend import criar_backend
+from _memoria import rss_bytes
+
+# (nome, horas, pitch alvo, roll alvo, amplitude da onda, vento médio kn) — alvos na métrica do painel
+Estado = Tuple[str, float, float, float, float, float]
+ESTADOS_PADRAO: Tuple[Estado, ...] = (
+    ("calmo", 2.0, 0.2, 0.2, 0.3, 10.0),
+    ("moderado", 2.0, 0.6, 0.4, 0.8, 16.0),
+    ("agitado", 1.5, 1.1, 0.8, 1.5, 22.0),
+    ("severo", 0.5, 1.6, 1.2, 2.5, 28.0),
+    ("calmo", 2.0, 0.2, 0.2, 0.3, 10.0),
+)
+AMOSTRAS_JANELA = 120  # amostras (1 s virtual cada) em ptchwnd/rollwnd/windwnd
+MODOS_FALHA = ("fora", "lento", "lixo", "nulos")
+FALHA_MIN = (1, 10)  # duração de cada falha, minutos virtuais
+LENTO_FRACAO_CICLO = 0.25  # atraso do modo "lento", em fração do ciclo comprimido
+
+COMPRESSAO_PADRAO = 60.0
+TAXA_FALHAS_PADRAO = 0.02  # chance por host e por minuto virtual de começar uma falha
+MEM_MB_PADRAO = 24.0
+THREADS_MAX_PADRAO = 8
+OVERRUN_MAX_PADRAO = 0.01  # fração de ciclos acima do COLETA_INTERVAL comprimido
+AQUECIMENTO = 0.2  # fração inicial da execução fora da comparação de memória/threads
+
+_RE_LINHA_LOG = re.compile(r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}")
+
+# tempos comprimidos: (módulo, nome) divididos pela compressão
+_TEMPOS = (
+    (P1, "COLETA_INTERVAL"),
+    (P1, "RANDOM_INTERVAL_HOURS"),
+    (P1, "RANDOM_SILENCE_PERIOD_MIN"),
+    (P1, "VENTO_ALARME_CHECK_INTERVAL_MIN"),
+    (P1, "VENTO_REARME_MIN"),
+    (P1, "HTTP_RETRY_PAUSA_SEC"),
+    (P3, "SNAP_INTERVAL_SEC"),
+    (P3, "WIND_FIRST_CHECK_SEC"),
+    (P5, "ALARM_CONFIRM_SEC"),
+    (P5, "ALARM_SILENCE_SEC"),
+)
+
+
+# =========================================================
+# Mar sintético e roteiro de falhas
+# =========================================================
+class MarSintetico:
+    """
+    Estados de mar em sequência (ESTADOS_PADRAO por padrão). Em cada
+    instante virtual `t` (s) gera a janela que o PyHMS entregaria: onda
+    senoidal com ruído em torno de um deslocamento que leva a métrica do
+    painel ao alvo do estado, ~2% de null, e vento com rajada.
+    """
+
+    def __init__(self, estados: Sequence[Estado] = ESTADOS_PADRAO, semente: int = 1):
+        self.estados = list(estados)
+        self.semente = semente
+        self._fins = []
+        acum = 0.0
+        for e in self.estados:
+            acum += e[1] * 3600.0
+            self._fins.append(acum)
+
+    @property
+    def duracao(self) -> float:
+        return self._fins[-1] if self._fins else 0.0
+
+    def estado(self, t: float) -> Estado:
+        for fim, e in zip(self._fins, self.estados):
+            if t < fim:
+                return e
+        return self.estados[-1]
+
+    def _serie(self, t: float, desloc: float, amp: float, periodo: float, canal: int) -> List[Optional[float]]:
+        out: List[Optional[float]] = []
+        for k in range(AMOSTRAS_JANELA):
+            tk = int(t) - (AMOSTRAS_JANELA - 1 - k)
+            rng = random.Random(self.semente * 1_000_003 + tk * 7 + canal)
+            if rng.random() < 0.02:
+                out.append(None)
+            else:
+                out.append(round(desloc + amp * math.sin(2.0 * math.pi * tk / periodo) + rng.uniform(-0.05, 0.05), 3))
+        return out
+
+    def payload(self, t: float) -> Dict:
+        _, _, pitch, roll, amp, vento = self.estado(t)
+        d_pitch = (pitch / P1.FATOR_CORRECAO_PITCH - P1.AA_PITCH) / 2.0
+        d_roll = (roll / P1.FATOR_CORRECAO_ROLL - P1.AA_ROLL) / 2.0
+        rng = random.Random(self.semente * 7919 + int(t // 60))
+        vm = round(vento * rng.uniform(0.85, 1.15), 1)
+        return {
+            "ptchwnd": self._serie(t, d_pitch, amp, 9.0, 1),
+            "rollwnd": self._serie(t, d_roll, amp * 1.3, 11.0, 2),
+            "windwnd": [None if v is None else abs(v) for v in self._serie(t, vm, vm * 0.2, 17.0, 3)],
+            "windspdmean": {"med. 2 min": vm},
+            "gustspdmax": {"instantaneo op.": round(vm * rng.uniform(1.2, 1.5), 1)},
+            "winddirmeanv": round((200.0 + t / 120.0) % 360.0, 1),
+            "airpresslmeanv": round(1013.0 + 3.0 * math.sin(t / 7200.0), 1),
+        }
+
+
+def roteiro_falhas(hosts: Sequence[str], duracao: float, taxa: float, semente: int = 1) -> Dict[str, List[Tuple[float, float, str]]]:
+    """host -> [(início, fim, modo), ...] em s virtuais; sem falhas sobrepostas no mesmo host."""
+    rng = random.Random(semente)
+    out: Dict[str, List[Tuple[float, float, str]]] = {}
+    for host in hosts:
+        faixas, minuto = [], 0
+        while minuto * 60.0 < duracao:
+            if rng.random() < taxa:
+                dur = rng.randint(*FALHA_MIN)
+                faixas.append((minuto * 60.0, (minuto + dur) * 60.0, rng.choice(MODOS_FALHA)))
+                minuto += dur
+            minuto += 1
+        out[host] = faixas
+    return out
+
+
+def falha_em(faixas: Sequence[Tuple[float, float, str]], t: float) -> Optional[str]:
+    for ini, fim, modo in faixas:
+        if ini <= t < fim:
+            return modo
+        if ini > t:
+            break
+    return None
+
+
+# =========================================================
+# PyHMS local
+# =========================================================
+class PyhmsSimulado:
+    """
+    Servidor HTTP em 127.0.0.1 que responde `/<host>/get/data` com o mar
+    sintético no tempo virtual (`relogio()`), aplicando o roteiro de falhas
+    do host: "fora" = 503, "lento" = responde depois de `atraso_lento` s,
+    "lixo" = corpo que não é JSON, "nulos" = janelas e vento só com null.
+    """
+
+    def __init__(self, mar: MarSintetico, falhas: Dict[str, List[Tuple[float, float, str]]], relogio: Callable[[], float], atraso_lento: float):
+        self.mar = mar
+        self.falhas = falhas
+        self.relogio = relogio
+        self.atraso_lento = atraso_lento
+        self.contagem: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+        sim = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args, **kwargs):
+                pass
+
+            def do_GET(self):
+                sim._responder(self)
+
+        self._srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._srv.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def porta(self) -> int:
+        return self._srv.server_address[1]
+
+    @property
+    def url_modelo(self) -> str:
+        return "http://127.0.0.1:%d/{host}%s" % (self.porta, P1.GET_PATH)
+
+    def iniciar(self) -> None:
+        self._thread = threading.Thread(target=self._srv.serve_forever, kwargs={"poll_interval": 0.1}, name="lite2-soak-pyhms", daemon=True)
+        self._thread.start()
+
+    def parar(self) -> None:
+        self._srv.shutdown()
+        self._srv.server_close()
+
+    def _responder(self, req: BaseHTTPRequestHandler) -> None:
+        host = req.path.lstrip("/").split("/", 1)[0]
+        t = self.relogio()
+        modo = falha_em(self.falhas.get(host, ()), t)
+        with self._lock:
+            c = self.contagem.setdefault(host, {})
+            c[modo or "ok"] = c.get(modo or "ok", 0) + 1
+        if modo == "fora":
+            req.send_response(503)
+            req.send_header("Content-Length", "0")
+            req.end_headers()
+            return
+        if modo == "lento":
+            time.sleep(self.atraso_lento)
+        if modo == "lixo":
+            corpo = b"<html>erro interno</html>"
+        else:
+            d = self.mar.payload(t)
+            if modo == "nulos":
+                d = {k: ([None] * len(v) if isinstance(v, list) else None) for k, v in d.items()}
+            corpo = json.dumps(d).encode("utf-8")
+        req.send_response(200)
+        req.send_header("Content-Type", "application/json")
+        req.send_header("Content-Length", str(len(corpo)))
+        req.end_headers()
+        req.wfile.write(corpo)
+
+
+# =========================================================
+# Instrumentação
+# =========================================================
+@contextmanager
+def tempos_comprimidos(fator: float) -> Iterator[None]:
+    """Divide os intervalos/timers do monitor e do alarme por `fator` (e os do alarm_state em uso)."""
+    antes = [(m, n, getattr(m, n)) for m, n in _TEMPOS]
+    rajada_antes = P5.ALARM_RAJADA_POR_NIVEL
+    estado_antes = (P5.alarm_state.confirm_sec, P5.alarm_state.rajada_por_nivel)
+    try:
+        for m, n, v in antes:
+            setattr(m, n, v / fator)
+        P5.ALARM_RAJADA_POR_NIVEL = {k: (a / fator, n, kk, i / fator) for k, (a, n, kk, i) in rajada_antes.items()}
+        P5.alarm_state.confirm_sec = P5.ALARM_CONFIRM_SEC
+        P5.alarm_state.rajada_por_nivel = P5.ALARM_RAJADA_POR_NIVEL
+        yield
+    finally:
+        for m, n, v in antes:
+            setattr(m, n, v)
+        P5.ALARM_RAJADA_POR_NIVEL = rajada_antes
+        P5.alarm_state.confirm_sec, P5.alarm_state.rajada_por_nivel = estado_antes
+
+
+@contextmanager
+def _atributos(**trocas) -> Iterator[None]:
+    """_atributos(P1=dict(nome=valor), ...) troca atributos dos módulos e devolve no fim."""
+    mods = {"P1": P1, "P3": P3, "P5": P5}
+    antes = [(mods[m], n, getattr(mods[m], n)) for m, d in trocas.items() for n in d]
+    try:
+        for m, d in trocas.items():
+            for n, v in d.items():
+                setattr(mods[m], n, v)
+        yield
+    finally:
+        for m, n, v in antes:
+            setattr(m, n, v)
+
+
+def _nome_linha(linha: str) -> str:
+    """"EVENT  | NAME: WIND_HOST | ..." -> "WIND_HOST"; "SNAP   | ..." -> "SNAP"."""
+    partes = linha.split("|")
+    if partes[0].strip() == "EVENT" and len(partes) > 1:
+        return partes[1].split(":", 1)[-1].strip()
+    return partes[0].strip()
+
+
+class ContadorLog(logging.Handler):
+    """Conta o que foi mandado para o log único: linhas do append_log_line (EVENT/SNAP) e registros do logger."""
+
+    def __init__(self):
+        super().__init__()
+        self.linhas = 0
+        self.registros = 0
+        self.eventos: Dict[str, int] = {}
+        self._trava = threading.Lock()
+
+    def emit(self, record) -> None:
+        with self._trava:
+            self.registros += 1
+
+    @contextmanager
+    def instalar(self) -> Iterator[None]:
+        original = P1.append_log_line
+
+        def _contando(entry_type, *parts):
+            nome = _nome_linha(str(entry_type))
+            with self._trava:
+                self.linhas += 1
+                self.eventos[nome] = self.eventos.get(nome, 0) + 1
+            return original(entry_type, *parts)
+
+        P1.append_log_line = _contando
+        P1.log.addHandler(self)
+        try:
+            yield
+        finally:
+            P1.log.removeHandler(self)
+            P1.append_log_line = original
+
+    @property
+    def esperadas(self) -> int:
+        return self.linhas + self.registros
+
+
+class ContadorCiclos:
+    """Ouvinte do P1.CICLOS: ciclos fechados, overruns e o pior tempo de trabalho."""
+
+    def __init__(self):
+        self.ciclos = 0
+        self.overruns = 0
+        self.sem_dados = 0
+        self.pior_ms = 0.0
+
+    def ao_iniciar(self, ciclo) -> None:
+        pass
+
+    def ao_fechar(self, ciclo) -> None:
+        self.ciclos += 1
+        self.overruns += bool(ciclo.info.get("overrun"))
+        self.sem_dados += not ciclo.info.get("dados")
+        self.pior_ms = max(self.pior_ms, (ciclo.trabalho or 0.0) * 1000.0)
+
+
+class Sonda:
+    """Thread que registra (t, RSS, threads, tracemalloc) a cada `intervalo` s."""
+
+    def __init__(self, intervalo: float):
+        self.intervalo = intervalo
+        self.amostras: List[Tuple[float, Optional[int], int, Optional[int]]] = []
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="lite2-soak-sonda", daemon=True)
+
+    def iniciar(self) -> None:
+        self._thread.start()
+
+    def parar(self) -> None:
+        self._parar.set()
+        self._thread.join(2.0)
+
+    def _loop(self) -> None:
+        t0 = time.monotonic()
+        while True:
+            traced = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+            self.amostras.append((time.monotonic() - t0, rss_bytes(), threading.active_count(), traced))
+            if self._parar.wait(self.intervalo):
+                return
+
+
+@contextmanager
+def _log_em(pasta: str) -> Iterator[str]:
+    """Log único (eventos + logging) num arquivo da pasta do soak; devolve o caminho."""
+    path = os.path.join(pasta, "lite2_events.log")
+    handler_antes = P1._LOG_HANDLER if P1._LOGGING_CONFIGURED else None
+    with _atributos(P1=dict(FILES={**P1.FILES, "events": path, "log": path, "html": os.path.join(pasta, "pitch_roll.html")})):
+        if handler_antes is None:
+            P1.APP.garantir("logging")
+            novo = None
+        else:
+            # logging já de pé (uso dentro de outro processo): troca o arquivo só durante o soak
+            novo = logging.FileHandler(path, encoding="utf-8")
+            novo.setFormatter(handler_antes.formatter)
+            P1.log.removeHandler(handler_antes)
+            P1.log.addHandler(novo)
+        try:
+            yield path
+        finally:
+            if novo is not None:
+                P1.log.removeHandler(novo)
+                novo.close()
+                P1.log.addHandler(handler_antes)
+            elif P1._LOG_HANDLER is not None:
+                P1._LOG_HANDLER.flush()
+
+
+def _contar_linhas(path: str) -> int:
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            return sum(1 for li in f if _RE_LINHA_LOG.match(li))
+    except OSError:
+        return 0
+
+
+def _mediana(vals: Sequence[Optional[float]]) -> Optional[float]:
+    vals = [v for v in vals if v is not None]
+    return statistics.median(vals) if vals else None
+
+
+# =========================================================
+# Execução
+# =========================================================
+def soak(
+    horas: Optional[float] = None,
+    compressao: float = COMPRESSAO_PADRAO,
+    taxa_falhas: float = TAXA_FALHAS_PADRAO,
+    semente: int = 1,
+    pasta: Optional[str] = None,
+    mem_mb: float = MEM_MB_PADRAO,
+    threads_max: int = THREADS_MAX_PADRAO,
+    overrun_max: float = OVERRUN_MAX_PADRAO,
+    usar_tracemalloc: bool = False,
+    estados: Sequence[Estado] = ESTADOS_PADRAO,
+) -> Dict:
+    """
+    Roda o run_monitor numa thread por `horas` virtuais (padrão: a duração
+    dos estados de mar) em horas/compressao reais e devolve o relatório;
+    `falhas` lista as verificações que não passaram (vazio = ok).
+    """
+    if P1.requests_spec is None:
+        raise RuntimeError("o soak coleta pelo HTTP real do monitor e precisa do pacote requests")
+    mar = MarSintetico(estados, semente)
+    duracao_virtual = (horas * 3600.0) if horas is not None else mar.duracao
+    duracao_real = duracao_virtual / compressao
+    hosts = sorted(set([P1.HOST_PITCH_ROLL] + list(P1.WIND_HOSTS_ORDER)))
+    falhas = roteiro_falhas(hosts, duracao_virtual, taxa_falhas, semente)
+    pasta = pasta or tempfile.mkdtemp(prefix="lite2-soak-")
+    os.makedirs(pasta, exist_ok=True)
+
+    t0 = [time.monotonic()]
+    srv = PyhmsSimulado(mar, falhas, lambda: (time.monotonic() - t0[0]) * compressao, LENTO_FRACAO_CICLO * P1.COLETA_INTERVAL / compressao)
+    log_cont, ciclos = ContadorLog(), ContadorCiclos()
+    sonda = Sonda(max(0.05, duracao_real / 200.0))
+    if usar_tracemalloc:
+        tracemalloc.start(1)
+
+    P1.APP.garantir("http")
+    P1.usar_backend_audio(criar_backend("null", log=P1.log))
+    threads_antes = threading.active_count()
+    monitor = threading.Thread(target=P3.run_monitor, name="lite2-soak-monitor", daemon=True)
+    srv.iniciar()
+    try:
+        with ExitStack() as pilha:
+            log_path = pilha.enter_context(_log_em(pasta))
+            pilha.enter_context(
+                _atributos(
+                    P1=dict(URL_MODELO=srv.url_modelo, URL_SMP_PITCH_ROLL=srv.url_modelo.format(host=P1.HOST_PITCH_ROLL)),
+                    P5=dict(abrir_html_no_navegador=lambda: None),
+                )
+            )
+            pilha.enter_context(tempos_comprimidos(compressao))
+            pilha.enter_context(log_cont.instalar())
+            P1.CICLOS.ouvir(ciclos)
+            pilha.callback(P1.CICLOS.deixar_de_ouvir, ciclos)
+
+            P1.log.info("Soak: %.1f h virtuais em %.0f s (x%.0f), falhas %.0f%%/min, pasta %s", duracao_virtual / 3600.0, duracao_real, compressao, taxa_falhas * 100, pasta)
+            P3.STOP_EVENT.clear()
+            t0[0] = time.monotonic()
+            sonda.iniciar()
+            monitor.start()
+            P3.STOP_EVENT.wait(duracao_real)
+            P3.STOP_EVENT.set()
+            monitor.join(3.0 * P1.COLETA_INTERVAL + 10.0)
+            sonda.parar()
+            P5.alarm_state.cancelar()
+            gravadas = _contar_linhas(log_path)
+    finally:
+        P3.STOP_EVENT.clear()
+        srv.parar()
+        if usar_tracemalloc:
+            tracemalloc.stop()
+    real = time.monotonic() - t0[0]
+
+    # memória/threads: mediana logo após o aquecimento x mediana do último décimo
+    am = sonda.amostras
+    ini = [a for a in am if AQUECIMENTO * duracao_real <= a[0] < (AQUECIMENTO + 0.1) * duracao_real] or am[:1]
+    fim = [a for a in am if a[0] >= 0.9 * duracao_real] or am[-1:]
+    rss_ini, rss_fim = _mediana([a[1] for a in ini]), _mediana([a[1] for a in fim])
+    tr_ini, tr_fim = _mediana([a[3] for a in ini]), _mediana([a[3] for a in fim])
+    thr_base = max(a[2] for a in ini) if ini else threads_antes
+    thr_pico = max((a[2] for a in am if a[0] >= AQUECIMENTO * duracao_real), default=thr_base)
+    threads_depois = threading.active_count()
+
+    rel = {
+        "horas_virtuais": round(duracao_virtual / 3600.0, 2),
+        "compressao": compressao,
+        "real_s": round(real, 1),
+        "pasta": pasta,
+        "ciclos": ciclos.ciclos,
+        "ciclos_sem_dados": ciclos.sem_dados,
+        "overruns": ciclos.overruns,
+        "pior_ciclo_ms": round(ciclos.pior_ms, 1),
+        "ciclo_orcamento_ms": round(P1.COLETA_INTERVAL / compressao * 1000.0, 1),
+        "rss_mb": [None if v is None else round(v / 1e6, 1) for v in (rss_ini, rss_fim)],
+        "tracemalloc_mb": [None if v is None else round(v / 1e6, 1) for v in (tr_ini, tr_fim)],
+        "threads": {"antes": threads_antes, "apos_aquecimento": thr_base, "pico": thr_pico, "depois": threads_depois},
+        "log": {"esperadas": log_cont.esperadas, "gravadas": gravadas, "eventos": dict(sorted(log_cont.eventos.items()))},
+        "pyhms": srv.contagem,
+        "falhas_injetadas": {h: len(f) for h, f in falhas.items()},
+    }
+
+    falhou: List[str] = []
+    if monitor.is_alive():
+        falhou.append("run_monitor não parou depois do STOP_EVENT")
+    if ciclos.ciclos == 0:
+        falhou.append("nenhum ciclo fechado")
+    elif ciclos.overruns > overrun_max * ciclos.ciclos:
+        falhou.append("overrun em %d de %d ciclos (máx. %.1f%%)" % (ciclos.overruns, ciclos.ciclos, overrun_max * 100))
+    for nome, a, b in (("RSS", rss_ini, rss_fim), ("tracemalloc", tr_ini, tr_fim)):
+        if a is not None and b is not None and (b - a) / 1e6 > mem_mb:
+            falhou.append("%s cresceu %.1f MB depois do aquecimento (máx. %.0f)" % (nome, (b - a) / 1e6, mem_mb))
+    if thr_pico - thr_base > threads_max:
+        falhou.append("threads subiram de %d para %d (máx. +%d)" % (thr_base, thr_pico, threads_max))
+    if threads_depois - threads_antes > threads_max:
+        falhou.append("%d threads a mais depois de parar (máx. +%d)" % (threads_depois - threads_antes, threads_max))
+    if gravadas != log_cont.esperadas:
+        falhou.append("log: %d linhas esperadas, %d gravadas" % (log_cont.esperadas, gravadas))
+    rel["falhas"] = falhou
+    rel["ok"] = not falhou
+    return rel
+
+
+def formatar(rel: Dict) -> str:
+    th = rel["threads"]
+    out = [
+        "%.1f h virtuais em %.1f s (x%.0f) — %s" % (rel["horas_virtuais"], rel["real_s"], rel["compressao"], "OK" if rel["ok"] else "FALHOU"),
+        "ciclos: %d (%d sem dados), overruns: %d, pior: %.1f ms (orçamento %.1f ms)"
+        % (rel["ciclos"], rel["ciclos_sem_dados"], rel["overruns"], rel["pior_ciclo_ms"], rel["ciclo_orcamento_ms"]),
+        "RSS: %s -> %s MB; tracemalloc: %s -> %s MB" % tuple(rel["rss_mb"] + rel["tracemalloc_mb"]),
+        "threads: antes %d, após aquecimento %d, pico %d, depois %d" % (th["antes"], th["apos_aquecimento"], th["pico"], th["depois"]),
+        "log: %d linhas esperadas, %d gravadas (%s)" % (rel["log"]["esperadas"], rel["log"]["gravadas"], rel["pasta"]),
+        "eventos: " + ", ".join("%s=%d" % kv for kv in rel["log"]["eventos"].items()),
+        "falhas injetadas por host: " + ", ".join("%s=%d" % kv for kv in rel["falhas_injetadas"].items()),
+    ]
+    out += ["FALHA: " + f for f in rel["falhas"]]
+    return "\n".join(out)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Soak test do run_monitor contra um PyHMS local com mar sintético")
+    ap.add_argument("--horas", type=float, help="horas virtuais (padrão: a sequência de estados de mar, 8 h)")
+    ap.add_argument("--compressao", type=float, default=COMPRESSAO_PADRAO, help="quantas vezes mais rápido que o real")
+    ap.add_argument("--falhas", type=float, default=TAXA_FALHAS_PADRAO, help="chance por host e minuto virtual de começar uma falha")
+    ap.add_argument("--semente", type=int, default=1)
+    ap.add_argument("--pasta", help="onde ficam o log e o HTML do soak (padrão: pasta temporária)")
+    ap.add_argument("--mem-mb", type=float, default=MEM_MB_PADRAO, help="crescimento de memória aceito depois do aquecimento")
+    ap.add_argument("--threads-max", type=int, default=THREADS_MAX_PADRAO, help="threads a mais aceitas depois do aquecimento")
+    ap.add_argument("--overrun-max", type=float, default=OVERRUN_MAX_PADRAO, help="fração de ciclos acima do intervalo aceita")
+    ap.add_argument("--tracemalloc", action="store_true", help="também mede a memória alocada pelo tracemalloc (mais lento)")
+    ap.add_argument("--json", action="store_true")
+    a = ap.parse_args(argv)
+
+    try:
+        rel = soak(
+            a.horas, a.compressao, a.falhas, a.semente, a.pasta, a.mem_mb, a.threads_max, a.overrun_max, a.tracemalloc
+        )
+    except RuntimeError as e:
+        print("soak: %s" % e, file=sys.stderr)
+        return 2
+    print(json.dumps(rel, indent=2, ensure_ascii=False) if a.json else formatar(rel))
+    return 0 if rel["ok"] else 1
+
+
+__all__ = [
+    "ESTADOS_PADRAO",
+    "MarSintetico",
+    "roteiro_falhas",
+    "falha_em",
+    "PyhmsSimulado",
+    "tempos_comprimidos",
+    "soak",
+    "main",
+]
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
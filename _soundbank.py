@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Banco de sons: manifesto de arquivos, cache e pré-carga priorizada em background."""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+import warnings
+from array import array
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+import _metrics as M
+
+try:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)  # removido no 3.13
+        import audioop
+except ImportError:
+    audioop = None
+
+# ordem de preferência quando o mesmo nome existe em mais de um formato:
+# WAV já é PCM; OGG/FLAC são decodificados uma vez e guardados no cache PCM
+EXTENSOES = (".wav", ".ogg", ".flac")
+COMPRIMIDOS = (".ogg", ".flac")
+
+# Ordem de pré-carga: o que um alarme L2–L5 pede primeiro vem antes.
+PRIORIDADE_ALARME = (
+    "l5", "l4", "l3", "l2",
+    "atencao2", "atencao",
+    "proabombordo2", "proaboreste2", "popabombordo2", "popaboreste2",
+    "proabombordo", "proaboreste", "popabombordo", "popaboreste",
+    "proa2", "popa2", "bombordo2", "boreste2",
+    "proa", "popa", "bombordo", "boreste",
+    "av1", "av2", "av3",
+)  # fmt: skip
+# extras (random, chorando, risada...) entram depois, em ordem alfabética
+
+SOUND_LOAD_SEC = M.histogram("lite2_sound_load_seconds", "Leitura+decodificação de um som do banco", ("origem",))
+SOUNDS_LOADED = M.counter("lite2_sounds_loaded_total", "Sons carregados no banco", ("origem",))
+SOUND_PCM_CACHE = M.counter("lite2_sound_pcm_cache_total", "Consultas ao cache PCM de sons comprimidos", ("result",))
+
+
+def _pref_ext(nome_arquivo: str) -> int:
+    ext = os.path.splitext(nome_arquivo)[1].lower()
+    return EXTENSOES.index(ext) if ext in EXTENSOES else len(EXTENSOES)
+
+
+class SoundBank:
+    """
+    - `manifesto`: nome_base -> caminho, montado uma vez (um scandir) na criação;
+      `existe()` consulta só o manifesto, sem tocar no disco.
+    - `get()` devolve o som em cache; se ainda não foi pré-carregado, carrega
+      na hora (uma vez só, com lock por nome para não duplicar com o preload).
+    - `preload_async()` carrega tudo em uma thread daemon, na ordem de
+      PRIORIDADE_ALARME e depois os extras, medindo o tempo de cada arquivo.
+    - OGG/FLAC: com `cache_dir`, `to_raw` e `from_raw`, o primeiro load
+      decodifica e grava o PCM em `cache_dir`; os seguintes leem o PCM direto.
+      O nome do arquivo de cache leva mtime/tamanho da origem e o `formato`
+      do mixer, então trocar o asset ou o mixer invalida sozinho.
+    """
+
+    def __init__(
+        self,
+        audio_dir: str,
+        loader: Optional[Callable[[str], Any]] = None,
+        log=None,
+        cache_dir: Optional[str] = None,
+        formato: Optional[Tuple[int, int, int]] = None,
+        to_raw: Optional[Callable[[Any], bytes]] = None,
+        from_raw: Optional[Callable[[bytes], Any]] = None,
+    ):
+        self.audio_dir = audio_dir
+        self.loader = loader
+        self.log = log
+        self.cache_dir = cache_dir
+        self.formato = formato
+        self.to_raw = to_raw
+        self.from_raw = from_raw
+        self.sons: Dict[str, Any] = {}
+        self.tempos_ms: Dict[str, float] = {}
+        self.falhas: Dict[str, str] = {}
+        self.preload_ms: Optional[float] = None
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.pronto = threading.Event()
+        self.manifesto: Dict[str, str] = self._montar_manifesto()
+
+    # -----------------------------------------------------
+    # manifesto
+    # -----------------------------------------------------
+    def _montar_manifesto(self) -> Dict[str, str]:
+        out: Dict[str, str] = {}
+        try:
+            with os.scandir(self.audio_dir) as it:
+                for e in sorted(it, key=lambda e: _pref_ext(e.name)):
+                    base, ext = os.path.splitext(e.name)
+                    if ext.lower() in EXTENSOES and e.is_file():
+                        out.setdefault(base, e.path)
+        except OSError:
+            if self.log:
+                self.log.warning("Pasta de áudio indisponível: %s", self.audio_dir)
+        return out
+
+    def existe(self, nome_base: str) -> bool:
+        return nome_base in self.manifesto
+
+    def disponivel(self, nome_base: str) -> bool:
+        """Existe no manifesto e não falhou ao carregar (sem acesso a disco)."""
+        return nome_base in self.manifesto and nome_base not in self.falhas
+
+    def ordem_preload(self) -> List[str]:
+        criticos = [n for n in PRIORIDADE_ALARME if n in self.manifesto]
+        extras = sorted(n for n in self.manifesto if n not in PRIORIDADE_ALARME)
+        return criticos + extras
+
+    # -----------------------------------------------------
+    # carga
+    # -----------------------------------------------------
+    def _lock_de(self, nome_base: str) -> threading.Lock:
+        with self._locks_lock:
+            lk = self._locks.get(nome_base)
+            if lk is None:
+                lk = self._locks[nome_base] = threading.Lock()
+            return lk
+
+    def _carregar(self, nome_base: str, origem: str):
+        path = self.manifesto.get(nome_base)
+        if path is None or self.loader is None:
+            return None
+        with self._lock_de(nome_base):
+            snd = self.sons.get(nome_base)
+            if snd is not None:
+                return snd
+            t0 = time.perf_counter()
+            try:
+                if self._usa_cache_pcm(path):
+                    snd = self._carregar_via_cache(nome_base, path)
+                else:
+                    snd = self.loader(path)
+            except Exception as exc:
+                self.falhas[nome_base] = repr(exc)
+                if self.log:
+                    self.log.warning("Falha ao carregar áudio %s", path, exc_info=True)
+                return None
+            dur = time.perf_counter() - t0
+            self.tempos_ms[nome_base] = round(dur * 1000.0, 2)
+            SOUND_LOAD_SEC.observe(dur, origem=origem)
+            SOUNDS_LOADED.inc(origem=origem)
+            self.sons[nome_base] = snd
+            return snd
+
+    # -----------------------------------------------------
+    # cache PCM (OGG/FLAC decodificados)
+    # -----------------------------------------------------
+    def _usa_cache_pcm(self, path: str) -> bool:
+        return (
+            os.path.splitext(path)[1].lower() in COMPRIMIDOS
+            and bool(self.cache_dir and self.formato and self.to_raw and self.from_raw)
+        )
+
+    def _arquivo_pcm(self, nome_base: str, path: str) -> str:
+        st = os.stat(path)
+        fmt = "-".join(str(x) for x in self.formato)
+        return os.path.join(self.cache_dir, f"{nome_base}.{st.st_mtime_ns:x}.{st.st_size:x}.{fmt}.pcm")
+
+    def _carregar_via_cache(self, nome_base: str, path: str):
+        arq = self._arquivo_pcm(nome_base, path)
+        try:
+            with open(arq, "rb") as f:
+                raw = f.read()
+        except OSError:
+            raw = None
+        if raw:
+            SOUND_PCM_CACHE.inc(result="hit")
+            return self.from_raw(raw)
+
+        SOUND_PCM_CACHE.inc(result="miss")
+        snd = self.loader(path)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = f"{arq}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(self.to_raw(snd))
+            os.replace(tmp, arq)
+            self._limpar_pcm_antigos(nome_base, manter=arq)
+        except Exception:
+            # sem cache o som continua tocando; só decodifica de novo no próximo start
+            if self.log:
+                self.log.warning("Falha ao gravar cache PCM de %s", nome_base, exc_info=True)
+        return snd
+
+    def _limpar_pcm_antigos(self, nome_base: str, manter: str) -> None:
+        prefixo = f"{nome_base}."
+        with os.scandir(self.cache_dir) as it:
+            for e in it:
+                if e.name.startswith(prefixo) and e.name.endswith(".pcm") and e.path != manter:
+                    # "proa." não casa com "proa2.": o resto do nome é hex.hex.fmt.pcm
+                    if e.name[len(prefixo):].count(".") == 3:
+                        try:
+                            os.remove(e.path)
+                        except OSError:
+                            pass
+
+    def get(self, nome_base: str):
+        """Som pronto para tocar (ou None se não existir/falhar)."""
+        snd = self.sons.get(nome_base)
+        if snd is not None:
+            return snd
+        if nome_base not in self.manifesto or nome_base in self.falhas:
+            return None
+        return self._carregar(nome_base, "sob_demanda")
+
+    def preload(self, nomes: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        for nome in (list(nomes) if nomes is not None else self.ordem_preload()):
+            if nome not in self.sons:
+                self._carregar(nome, "preload")
+        self.preload_ms = round((time.perf_counter() - t0) * 1000.0, 1)
+        self.pronto.set()
+        return self.relatorio()
+
+    def preload_async(self, depois: Optional[Callable[[], None]] = None) -> threading.Thread:
+        """Pré-carga em thread daemon; `depois` roda na mesma thread ao terminar."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._preload_e_reportar, args=(depois,), name="lite2-soundbank", daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def _preload_e_reportar(self, depois: Optional[Callable[[], None]] = None) -> None:
+        rel = self.preload()
+        if self.log:
+            self.log.info(
+                "SoundBank: %s sons em %.1f ms (críticos prontos em %.1f ms; falhas: %s; faltando: %s)",
+                rel["carregados"],
+                rel["total_ms"] or 0.0,
+                rel["criticos_ms"],
+                ",".join(rel["falhas"]) or "-",
+                ",".join(rel["faltando_criticos"]) or "-",
+            )
+        if depois is not None:
+            try:
+                depois()
+            except Exception:
+                if self.log:
+                    self.log.warning("SoundBank: falha pós-preload", exc_info=True)
+
+    def relatorio(self) -> Dict[str, Any]:
+        criticos = [n for n in PRIORIDADE_ALARME if n in self.manifesto]
+        return {
+            "arquivos": len(self.manifesto),
+            "carregados": len(self.sons),
+            "total_ms": self.preload_ms,
+            "criticos_ms": round(sum(self.tempos_ms.get(n, 0.0) for n in criticos), 1),
+            "faltando_criticos": [n for n in PRIORIDADE_ALARME if n not in self.manifesto],
+            "falhas": sorted(self.falhas),
+            "tempos_ms": dict(self.tempos_ms),
+        }
+
+
+# =========================================================
+# Compositor: beep + atenção + direções num único buffer
+# =========================================================
+
+CLIP_COMPOSE_SEC = M.histogram("lite2_clip_compose_seconds", "Montagem de um clip composto de alarme")
+
+# (nome_base, ganho 0..1, silêncio em s depois da peça)
+Peca = Tuple[str, float, float]
+
+
+def _aplicar_ganho_s16(raw: bytes, ganho: float) -> bytes:
+    """Ganho em PCM de 16 bits: audioop.mul (em C) quando existe; senão amostra a amostra."""
+    if ganho >= 0.999:
+        return raw
+    raw = raw[: len(raw) - (len(raw) % 2)]
+    g = max(0.0, ganho)
+    if audioop is not None:
+        return audioop.mul(raw, 2, g)
+    amostras = array("h")
+    amostras.frombytes(raw)
+    return array("h", [int(x * g) for x in amostras]).tobytes()
+
+
+class ClipCompositor:
+    """
+    Concatena PCM cru (16 bits, formato do mixer) das peças de um alarme num
+    só buffer, com o ganho de cada peça aplicado e os silêncios entre elas,
+    para o alarme virar um único play(). Resultado em cache por chave.
+
+    `to_raw(som) -> bytes` e `make_sound(bytes) -> som` isolam o backend.
+    `formato` = (freq, bytes_por_amostra, canais); só 16 bits é suportado —
+    fora disso `compor()` devolve None e quem chama usa o caminho antigo.
+    """
+
+    def __init__(self, bank: SoundBank, formato: Optional[Tuple[int, int, int]], to_raw: Callable[[Any], bytes], make_sound: Callable[[bytes], Any], log=None):
+        self.bank = bank
+        self.formato = formato
+        self.to_raw = to_raw
+        self.make_sound = make_sound
+        self.log = log
+        self._cache: Dict[Hashable, Any] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def suportado(self) -> bool:
+        return bool(self.formato) and self.formato[1] == 2
+
+    def _silencio(self, seg: float) -> bytes:
+        freq, _, canais = self.formato
+        return b"\x00\x00" * int(round(seg * freq)) * canais
+
+    def compor(self, chave: Hashable, pecas: Sequence[Peca]):
+        """Devolve o som composto (do cache, se já montado) ou None."""
+        with self._lock:
+            if chave in self._cache:
+                return self._cache[chave]
+        if not self.suportado or not pecas:
+            return None
+
+        t0 = time.perf_counter()
+        partes: List[bytes] = []
+        for nome, ganho, gap in pecas:
+            snd = self.bank.get(nome)
+            if snd is None:
+                return None  # peça faltando: não cacheia, caminho antigo resolve
+            try:
+                partes.append(_aplicar_ganho_s16(self.to_raw(snd), ganho))
+            except Exception:
+                if self.log:
+                    self.log.debug("Compositor: falha lendo PCM de %s", nome, exc_info=True)
+                return None
+            if gap > 0:
+                partes.append(self._silencio(gap))
+        try:
+            som = self.make_sound(b"".join(partes))
+        except Exception:
+            if self.log:
+                self.log.warning("Compositor: falha criando clip %s", chave, exc_info=True)
+            return None
+        CLIP_COMPOSE_SEC.observe(time.perf_counter() - t0)
+
+        with self._lock:
+            self._cache.setdefault(chave, som)
+            return self._cache[chave]
+
+    def em_cache(self) -> int:
+        with self._lock:
+            return len(self._cache)
+
+
+__all__ = [
+    "PRIORIDADE_ALARME",
+    "SoundBank",
+    "ClipCompositor",
+]
@@ -1,8 +1,31 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from _part3 import _main
+import sys
 
+import _part1 as P1
+
+
+def main():
+    if getattr(sys, "frozen", False):
+        # EXE do PyInstaller: o processo de --aquisicao processo (spawn) sai por aqui
+        import multiprocessing
+
+        multiprocessing.freeze_support()
+
+    # Caminhos rápidos (--stop e ferramentas) antes de importar o runtime
+    # (_part3 -> painel HTTP, avaliação, alarmes)
+    args, extras = P1.base_argparser().parse_known_args()
+    rc = P1.rodar_ferramenta(args, extras)
+    if rc is not None:
+        sys.exit(rc)
+    if args.stop and not extras:
+        sys.exit(P1.pedir_parada())
+
+    from _part3 import _main
 
-if __name__ == "__main__":
     _main()
+
+
+if __name__ == "__main__":
+    main()
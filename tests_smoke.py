@@ -1,5 +1,9 @@
 """Smoke test mínimo para validar vento/rajada, HTML e serialização de áudio."""
 
+import gzip
+import http.client
+import json
+import sys
 import threading
 import time
 from pathlib import Path
@@ -86,6 +90,1092 @@ def run_smoke_audio_serialization():
     print("Smoke serialização OK ->", eventos)
 
 
+def run_smoke_gzip():
+    """Painel e /data.json saem comprimidos quando pedidos e o gzip é reaproveitado por versão."""
+
+    srv = P5.start_control_server(0)
+    assert srv is not None, "Servidor de controle não subiu"
+    port = srv.server_address[1]
+    try:
+        P5._set_live_view(pitch_txt="1.2", roll_txt="-0.4")
+
+        def _get(path, enc):
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            conn.request("GET", path, headers={"Accept-Encoding": enc})
+            resp = conn.getresponse()
+            body = resp.read()
+            conn.close()
+            return resp, body
+
+        for path in ("/", "/data.json"):
+            r_raw, raw = _get(path, "identity")
+            r_gz, gz = _get(path, "gzip, deflate")
+            assert r_raw.getheader("Content-Encoding") is None, f"{path} comprimido sem pedir"
+            if len(raw) < P5.GZIP_MIN_BYTES:
+                assert gz == raw, f"{path}: corpo pequeno deveria sair sem gzip"
+                continue
+            assert r_gz.getheader("Content-Encoding") == "gzip", f"{path} sem gzip"
+            assert gzip.decompress(gz) == raw, f"{path}: gzip difere do corpo bruto"
+
+        versao, _ = P5._get_live_view_versionada()
+        antes = P5._BODY_CACHE["painel"]
+        _get("/", "gzip")
+        assert P5._BODY_CACHE["painel"] is antes and antes[0] == versao, "Painel recomprimido sem mudança de versão"
+    finally:
+        srv.shutdown()
+        srv.server_close()
+    print("Smoke gzip OK")
+
+
+def run_smoke_async_server():
+    """Servidor asyncio atende as rotas do painel numa única conexão keep-alive."""
+
+    srv = P5.start_control_server(0, modo="asyncio")
+    assert srv is not None, "Servidor asyncio não subiu"
+    try:
+        conn = http.client.HTTPConnection("127.0.0.1", srv.server_address[1], timeout=5)
+        for path in ("/", "/data.json", "/mute_status", "/wind_pref", "/nao_existe"):
+            conn.request("GET", path)
+            resp = conn.getresponse()
+            resp.read()
+            esperado = 404 if path == "/nao_existe" else 200
+            assert resp.status == esperado, f"{path}: status {resp.status}"
+        assert srv.requisicoes == 5, "Requisições não passaram pelo servidor asyncio"
+        conn.close()
+
+        # corpo acima do limite: 413 e a conexão fecha, sem ler o corpo
+        import _aserver
+
+        conn = http.client.HTTPConnection("127.0.0.1", srv.server_address[1], timeout=5)
+        conn.putrequest("GET", "/")
+        conn.putheader("Content-Length", str(_aserver.MAX_HEADER_BYTES + 1))
+        conn.endheaders()
+        resp = conn.getresponse()
+        resp.read()
+        assert resp.status == 413 and resp.getheader("Connection") == "close", resp.status
+        conn.close()
+    finally:
+        srv.shutdown()
+    print("Smoke servidor asyncio OK")
+
+
+def run_smoke_state():
+    """/state junta live view, mute e vento; só é recodificado quando algo muda."""
+
+    P5._set_live_view(pitch_txt="0.7")
+    doc = json.loads(P5._rotear_get("/state").data)
+    for chave in ("view", "muted", "muted_until", "wind_pref", "hosts", "boot"):
+        assert chave in doc, f"/state sem {chave}"
+    assert doc["view"]["pitch_txt"] == "0.7"
+
+    assert P5._rotear_get("/state").data is P5._rotear_get("/state").data, "/state recodificado sem mudança"
+
+    P5._rotear_get("/mute?mins=1")
+    try:
+        assert json.loads(P5._rotear_get("/state").data)["muted"] is True, "/state não refletiu o mute"
+    finally:
+        P5._rotear_get("/unmute")
+    assert json.loads(P5._rotear_get("/state").data)["muted"] is False
+    print("Smoke /state OK")
+
+
+def run_smoke_metrics():
+    """/metrics expõe contadores e histogramas dos caminhos instrumentados."""
+
+    P4.avaliar_de_json({"ptchwnd": [0.1], "rollwnd": [0.2]})
+    P5.alarm_state._log_alarm_skip("confirm1_low_level", level=1)
+    resp = P5._rotear_get("/metrics")
+    assert resp.code == 200 and resp.content_type.startswith("text/plain")
+    txt = resp.data.decode("utf-8")
+    for trecho in (
+        "# TYPE lite2_avaliar_de_json_seconds histogram",
+        'lite2_avaliar_de_json_seconds_bucket{le="+Inf"}',
+        'lite2_alarm_suppress_total{reason="confirm1_low_level"}',
+        'lite2_alarm_confirm_total{stage="1",result="low_level"}',
+        "lite2_threads ",
+    ):
+        assert trecho in txt, f"/metrics sem {trecho!r}"
+    print("Smoke /metrics OK")
+
+
+def run_smoke_soundbank():
+    """Banco de sons pré-carrega alarmes antes dos extras e responde 'existe' pelo manifesto."""
+
+    from _soundbank import PRIORIDADE_ALARME, SoundBank
+
+    ordem_carga = []
+
+    def _loader(path):
+        ordem_carga.append(Path(path).stem)
+        return Path(path).stat().st_size
+
+    bank = SoundBank(P1.AUDIO_DIR, loader=_loader)
+    bank.preload_async().join(30)
+    rel = bank.relatorio()
+    assert bank.pronto.is_set() and rel["carregados"] == rel["arquivos"], rel
+    assert not rel["faltando_criticos"], f"Sons críticos ausentes: {rel['faltando_criticos']}"
+    criticos = [n for n in PRIORIDADE_ALARME if bank.existe(n)]
+    assert ordem_carga[: len(criticos)] == criticos, "Extras carregados antes dos sons de alarme"
+    assert bank.get("nao_existe") is None and not bank.existe("nao_existe")
+    print(f"Smoke soundbank OK -> {rel['carregados']} sons em {rel['total_ms']} ms")
+
+
+def run_smoke_soundbank_pcm_cache():
+    """OGG/FLAC decodificam uma vez; o start seguinte lê o PCM do cache sem chamar o decoder."""
+
+    import tempfile
+
+    from _soundbank import SoundBank
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pasta, cache = Path(tmp, "audio"), Path(tmp, "pcm")
+        pasta.mkdir()
+        Path(pasta, "proa.ogg").write_bytes(b"OGG-proa")
+        Path(pasta, "popa.flac").write_bytes(b"FLAC-popa")
+        Path(pasta, "l2.ogg").write_bytes(b"OGG-l2")
+        Path(pasta, "l2.wav").write_bytes(b"WAV-l2")
+
+        decodificados = []
+
+        def _loader(path):
+            decodificados.append(Path(path).name)
+            return b"PCM:" + Path(path).read_bytes()
+
+        def _banco():
+            return SoundBank(str(pasta), loader=_loader, cache_dir=str(cache), formato=(44100, 2, 2), to_raw=bytes, from_raw=bytes)
+
+        bank = _banco()
+        assert bank.manifesto["l2"].endswith(".wav"), "WAV deveria ter preferência sobre OGG"
+        assert bank.get("proa") == b"PCM:OGG-proa" and bank.get("popa") == b"PCM:FLAC-popa"
+        assert len(list(cache.glob("*.pcm"))) == 2, list(cache.iterdir())
+
+        decodificados.clear()
+        bank = _banco()
+        assert bank.get("proa") == b"PCM:OGG-proa" and bank.get("l2") == b"PCM:WAV-l2"
+        assert decodificados == ["l2.wav"], f"Comprimido decodificado de novo: {decodificados}"
+        assert bank.disponivel("proa") and not bank.disponivel("proa2")
+    print("Smoke cache PCM OK")
+
+
+class _FakeSom:
+    def __init__(self, dur):
+        self.dur = dur
+
+    def get_length(self):
+        return self.dur
+
+
+class _FakeCanal:
+    def set_volume(self, v):
+        pass
+
+    def play(self, snd):
+        pass
+
+    def stop(self):
+        pass
+
+    def get_busy(self):
+        return False
+
+
+def run_smoke_audio_deadlines():
+    """Espera pelo fim do clip usa o prazo calculado e acorda na hora com stop()."""
+
+    canais_orig, ok_orig = P1.CHANNELS, P1.audio_ok
+    P1.CHANNELS, P1.audio_ok = {"voz": _FakeCanal(), "beep": _FakeCanal()}, True
+    try:
+        t0 = time.monotonic()
+        P1._tocar_snd("beep", _FakeSom(0.2), 0.5)
+        assert P1._any_channel_busy()
+        assert P1._wait_all_channels_free(2.0)
+        dt = time.monotonic() - t0
+        assert 0.2 <= dt < 0.4, f"Espera fora do prazo do clip: {dt:.3f}s"
+
+        P1._tocar_snd("voz", _FakeSom(5.0), 1.0)
+        threading.Timer(0.1, P1._parar_canal, args=("voz",)).start()
+        t0 = time.monotonic()
+        assert P1._esperar_canal("voz", 6.0)
+        assert time.monotonic() - t0 < 0.5, "stop() não acordou quem esperava o canal"
+        assert not P1._any_channel_busy()
+    finally:
+        P1.CHANNELS, P1.audio_ok = canais_orig, ok_orig
+    print("Smoke prazos de áudio OK")
+
+
+def run_smoke_clip_compositor():
+    """Compositor concatena as peças com ganho e silêncio, e reaproveita o clip montado."""
+
+    from array import array
+
+    from _soundbank import ClipCompositor
+
+    class _Bank:
+        sons = {"beep": array("h", [1000] * 4).tobytes(), "voz": array("h", [-2000] * 2).tobytes()}
+
+        def get(self, nome):
+            return self.sons.get(nome)
+
+    montados = []
+
+    def _make(raw):
+        montados.append(raw)
+        return raw
+
+    comp = ClipCompositor(_Bank(), (1000, 2, 1), to_raw=bytes, make_sound=_make)
+    clip = comp.compor("k", [("beep", 0.5, 0.003), ("voz", 1.0, 0.0)])
+    assert array("h", clip).tolist() == [500] * 4 + [0] * 3 + [-2000] * 2, array("h", clip).tolist()
+    assert comp.compor("k", []) is clip and len(montados) == 1, "Clip composto não veio do cache"
+    assert comp.compor("falta", [("beep", 1.0, 0.0), ("nao_existe", 1.0, 0.0)]) is None
+    assert comp.em_cache() == 1
+    assert ClipCompositor(_Bank(), (1000, 1, 1), bytes, _make).compor("k", [("beep", 1.0, 0.0)]) is None
+
+    assert set(P1.COMPOSITOR_AQUECER_NIVEIS) == {2, 3, 4, 5}, "nível sem clip aquecido monta na hora do alarme"
+
+    pecas = P1._pecas_alarme(4, ["PROA", "BORESTE"])
+    assert pecas[0][0] == "l4" and pecas[1][0] == "atencao2" and pecas[-1][0] == "proaboreste2", pecas
+    print("Smoke compositor de clips OK")
+
+
+def run_smoke_audio_dispatcher():
+    """Fila de áudio: enviar() não bloqueia, prioridade maior interrompe e nada se sobrepõe."""
+
+    eventos = []
+    tocando = {"flag": False}
+
+    def _sequencia(nome, dur):
+        def _inner():
+            assert not tocando["flag"], f"Sobreposição detectada em {nome}"
+            tocando["flag"] = True
+            eventos.append(f"{nome}-start")
+            P1._pausa(dur)
+            eventos.append(f"{nome}-{'cut' if P1._interromper() else 'end'}")
+            tocando["flag"] = False
+
+        return _inner
+
+    t0 = time.monotonic()
+    p_random = P1.enfileirar_audio(_sequencia("random", 3.0), "random", P1.PRIORIDADE_RANDOM)
+    assert time.monotonic() - t0 < 0.05, "enfileirar_audio bloqueou quem chama"
+    time.sleep(0.1)
+    p_vento = P1.enfileirar_audio(_sequencia("vento", 0.1), "alarme_vento", P1.PRIORIDADE_VENTO)
+    p_l5 = P1.enfileirar_audio(_sequencia("l5", 0.1), "pitch_roll", P1.PRIORIDADE_PITCH_ROLL_BASE + 5)
+
+    assert p_l5.aguardar(2.0) and p_vento.aguardar(2.0), (p_l5.motivo, p_vento.motivo)
+    assert p_random.aguardar(1.0) is False and p_random.motivo == "preempted", p_random.motivo
+    assert time.monotonic() - t0 < 1.0, "L5 esperou o random terminar"
+    assert eventos == ["random-start", "random-cut", "l5-start", "l5-end", "vento-start", "vento-end"], eventos
+
+    # mesmo nome na fila: L2 depois de L5 não substitui o L5
+    from _audioqueue import AudioDispatcher
+
+    liberar, tocados = threading.Event(), []
+    disp = AudioDispatcher(lambda seq, nome, timeout_s: seq() or True, lambda: None)
+    try:
+        ocupado = disp.enviar(lambda: liberar.wait(5.0), "ocupado", 1000)
+        time.sleep(0.05)
+        p5 = disp.enviar(lambda: tocados.append("l5"), "pitch_roll", P1.PRIORIDADE_PITCH_ROLL_BASE + 5)
+        p2 = disp.enviar(lambda: tocados.append("l2"), "pitch_roll", P1.PRIORIDADE_PITCH_ROLL_BASE + 2)
+        assert p2.aguardar(0.1) is False and p2.motivo == "lower_priority", p2.motivo
+        liberar.set()
+        assert ocupado.aguardar(2.0) and p5.aguardar(2.0), p5.motivo
+        assert tocados == ["l5"], tocados
+    finally:
+        disp.fechar()
+    print("Smoke fila de áudio OK ->", eventos)
+
+
+def run_smoke_audio_backend():
+    """Backend recording: alarme L5 chega ao play() sem pygame e o backend original volta no fim."""
+
+    import _alarmbench
+
+    anterior = P1.AUDIO_BACKEND
+    out = _alarmbench.medir_latencia_alarme(repeticoes=2, niveis=(5,), escala=0.01)
+    r = out["niveis"]["5"]
+    assert r["amostras"] == 2 and r["perdidos"] == 0, out
+    assert r["ate_play_ms_max"] < 1000, out
+    assert P1.AUDIO_BACKEND is anterior, "Backend de áudio não foi restaurado"
+    print(f"Smoke backend de áudio OK -> L5 em {r['ate_play_ms_p50']} ms (p50)")
+
+
+def run_smoke_scheduler():
+    """Agendador com relógio virtual: confirmações do AlarmState e tarefas do monitor sem esperar."""
+
+    import _part3 as P3
+    from _scheduler import Agendador, RelogioVirtual
+
+    ag = Agendador(relogio=RelogioVirtual(1000.0))
+    ordem = []
+    t_cancel = ag.agendar(5.0, ordem.append, "cancelada")
+    ag.agendar(2.0, ordem.append, "b")
+    ag.agendar(1.0, ordem.append, "a")
+    periodica = ag.a_cada(10.0, ordem.append, "p")
+    t_cancel.cancel()
+    assert ag.avancar(25.0) == 4 and ordem == ["a", "b", "p", "p"], ordem
+    assert ag.agora() == 1025.0 and ag.pendentes() == 1
+    periodica.cancel()
+
+    est_l5 = P4.avaliar_por_valores(P1.L5_LEVELS[0] + 0.1, 0.0, 0.0)
+    threads_antes = threading.active_count()
+    tocados = []
+    orig = P5._tocar_alarme_pitch_roll
+    P5._tocar_alarme_pitch_roll = lambda nivel, est: tocados.append((ag.agora(), nivel))
+    try:
+        alarme = P5.AlarmState(coletar=lambda: est_l5, agendador=ag, modo="dupla")
+        alarme.maybe_schedule(est_l5)
+        ag.avancar(alarme.confirm_sec - 0.01)
+        assert not tocados and alarme.confirm_stage == 1
+        ag.avancar(alarme.confirm_sec + 0.02)
+        assert tocados == [(1025.0 + 2 * alarme.confirm_sec, 5)], tocados
+        alarme.maybe_schedule(est_l5)  # mesmo nível: não sobe, não agenda
+        assert ag.pendentes() == 0
+    finally:
+        P5._tocar_alarme_pitch_roll = orig
+    assert threading.active_count() == threads_antes, "Confirmação criou thread"
+
+    snaps = []
+    log_snapshot_orig = P1.log_snapshot
+    P1.log_snapshot = lambda *a: snaps.append(ag.agora())
+    try:
+        tarefas = P3.agendar_tarefas_monitor(ag, {"est": est_l5})
+        ag.avancar(3 * P3.SNAP_INTERVAL_SEC)
+        assert len(snaps) == 4 and tarefas["vento"].execucoes >= 1, (snaps, tarefas["vento"].execucoes)
+    finally:
+        P1.log_snapshot = log_snapshot_orig
+        for t in tarefas.values():
+            t.cancel()
+    print("Smoke agendador OK")
+
+
+def run_smoke_alarm_burst():
+    """Confirmação por rajada: L5 toca com K de N amostras e amostras baixas rejeitam cedo."""
+
+    from _scheduler import Agendador, RelogioVirtual
+
+    assert P5._decidir_rajada([5, 5, 5], 4, 3, 5) == ("confirma", 5)
+    assert P5._decidir_rajada([4, 4, None, 4], 4, 3, 5) == ("confirma", 4)
+    assert P5._decidir_rajada([1, None], 4, 3, 5) == ("rejeita", 0)
+    assert P5._decidir_rajada([5, 1], 4, 3, 5) == ("continua", 0)
+
+    est_l5 = P4.avaliar_por_valores(P1.L5_LEVELS[0] + 0.1, 0.0, 0.0)
+    est_l0 = P4.avaliar_por_valores(0.0, 0.0, 0.0)
+    atraso, n, k, intervalo = P5.ALARM_RAJADA_POR_NIVEL[5]
+
+    tocados, suprimidos = [], []
+    orig_tocar, orig_skip = P5._tocar_alarme_pitch_roll, P5.AlarmState._log_alarm_skip
+    P5._tocar_alarme_pitch_roll = lambda nivel, est, **extra: tocados.append((nivel, extra))
+    P5.AlarmState._log_alarm_skip = lambda self, reason, level, prev=None: suprimidos.append(reason)
+    try:
+        ag = Agendador(relogio=RelogioVirtual())
+        amostras = iter([est_l5, None, est_l5, est_l5])
+        alarme = P5.AlarmState(agendador=ag, amostrar=lambda: next(amostras), modo="rajada")
+        alarme.maybe_schedule(est_l5)
+        ag.avancar(atraso + (k - 1) * intervalo + 0.001)
+        assert not tocados, "Tocou antes de K amostras"
+        ag.avancar(intervalo)
+        assert tocados and tocados[0][0] == 5 and tocados[0][1]["samples"] == "3/4", tocados
+        assert alarme.confirm_stage == 0 and ag.pendentes() == 0
+
+        alarme = P5.AlarmState(agendador=ag, amostrar=lambda: est_l0, modo="rajada")
+        alarme.maybe_schedule(est_l5)
+        ag.avancar(atraso + n * intervalo)
+        assert suprimidos == ["burst_low_level"] and len(tocados) == 1, suprimidos
+
+        # coleta real: só os pontos novos contam; uma leitura alta e a janela parada não confirmam
+        alto = ((P1.L5_LEVELS[0] + 0.5) / P1.FATOR_CORRECAO_PITCH - P1.AA_PITCH) / 2.0
+        base = [0.0] * 38 + [alto]
+        janelas = []
+        orig_coletar = P1.coletar_json
+        P1.coletar_json = lambda url, **kw: {"ptchwnd": janelas.pop(0) if len(janelas) > 1 else janelas[0], "rollwnd": [0.0] * 39}
+        try:
+            janelas[:] = [base]
+            alarme = P5.AlarmState(agendador=ag, modo="rajada")
+            alarme.maybe_schedule(est_l5)
+            ag.avancar(atraso + n * intervalo)
+            assert len(tocados) == 1 and suprimidos[-1] == "burst_low_level", (tocados, suprimidos)
+
+            janelas[:] = [base[i:] + [alto] * i for i in range(n)]  # cada amostra traz um ponto novo alto
+            alarme = P5.AlarmState(agendador=ag, modo="rajada")
+            alarme.maybe_schedule(est_l5)
+            ag.avancar(atraso + n * intervalo)
+            assert len(tocados) == 2 and tocados[-1][0] == 5, (tocados, suprimidos)
+        finally:
+            P1.coletar_json = orig_coletar
+        assert P5._pontos_novos([1, 2, 3], [2, 3, 4]) == [4] and P5._pontos_novos([2, 3, 4], [1, 2, 3]) == []
+    finally:
+        P5._tocar_alarme_pitch_roll, P5.AlarmState._log_alarm_skip = orig_tocar, orig_skip
+
+    # relógio real: amostras em horário fixo, a travada conta como sem dados no prazo
+    from _scheduler import Agendador as AgendadorReal
+
+    def _travada():
+        time.sleep(2.0)
+        return est_l5
+
+    ag = AgendadorReal()
+    coletor = P5.ColetorConfirmacao(threads=8)
+    orig_timeout = P5.ALARM_RAJADA_TIMEOUT_SEC
+    P5.ALARM_RAJADA_TIMEOUT_SEC = 0.3
+    try:
+        eventos, tocados_real = [], []
+        cont = iter(range(100))
+        alarme = P5.AlarmState(
+            agendador=ag,
+            coletor=coletor,
+            modo="rajada",
+            rajada={5: (0.05, 4, 2, 0.05)},
+            amostrar=lambda: _travada() if next(cont) == 0 else est_l5,  # só a 1ª trava
+            tocar=lambda nivel, est, **extra: tocados_real.append((time.monotonic(), extra)),
+            log_evento=lambda nome, **kv: eventos.append(kv["reason"]),
+        )
+        t0 = time.monotonic()
+        alarme.maybe_schedule(est_l5)
+        fim = t0 + 1.5
+        while not tocados_real and time.monotonic() < fim:
+            time.sleep(0.01)
+        assert tocados_real and tocados_real[0][1]["samples"] == "2/2", (tocados_real, eventos)
+        l5_ms = (tocados_real[0][0] - t0) * 1000.0
+        assert l5_ms < 500.0, l5_ms  # 1ª amostra travada não empurrou as seguintes
+
+        alarme = P5.AlarmState(
+            agendador=ag,
+            coletor=coletor,
+            modo="rajada",
+            rajada={5: (0.05, 4, 3, 0.05)},
+            amostrar=_travada,
+            tocar=lambda nivel, est, **extra: tocados_real.append((time.monotonic(), extra)),
+            log_evento=lambda nome, **kv: eventos.append(kv["reason"]),
+        )
+        t0 = time.monotonic()
+        alarme.maybe_schedule(est_l5)
+        while alarme.confirm_stage and time.monotonic() < t0 + 1.5:
+            time.sleep(0.01)
+        sem_dados_ms = (time.monotonic() - t0) * 1000.0
+        assert eventos == ["burst_no_data"] and len(tocados_real) == 1, eventos
+        assert sem_dados_ms < 1000.0, sem_dados_ms  # 2 prazos vencidos já bastam (limite: atraso + timeout + intervalo)
+    finally:
+        P5.ALARM_RAJADA_TIMEOUT_SEC = orig_timeout
+        ag.parar()
+    print(f"Smoke confirmação por rajada OK -> L5 em {atraso + (k - 1) * intervalo:.2f}s; real com amostra travada {l5_ms:.0f} ms, sem dados em {sem_dados_ms:.0f} ms")
+
+
+def run_smoke_alarm_sim():
+    """Simulador: borda de subida, silêncio, mute L2/L3 e replay de SNAPs, tudo em relógio virtual."""
+
+    import tempfile
+
+    import _alarmsim
+
+    l3, l4, l5 = P1.L3_LEVELS[0] + 0.1, P1.L4_LEVELS[0] + 0.1, P1.L5_LEVELS[0] + 0.1
+    serie = _alarmsim.roteiro([(60, 0, 0), (140, l5, 0), (100, 0, 0), (100, l5, 0), (800, 0, 0), (100, l3, 0), (300, 0, 0), (100, l4, 0)])
+    t0 = time.perf_counter()
+    linha = _alarmsim.simular(serie, ciclo=20.0, modo="rajada", mutes=[(1100.0, 1400.0)])
+    real = time.perf_counter() - t0
+    resumo = [(ev["evento"], ev.get("nivel"), ev.get("reason")) for ev in linha]
+    assert resumo == [
+        ("CONFIRM_START", 5, None),
+        ("PLAY", 5, None),
+        ("SUPPRESS", 5, "silenced"),
+        ("SUPPRESS", 3, "muted_L23"),
+        ("CONFIRM_START", 4, None),
+        ("PLAY", 4, None),
+    ], resumo
+    assert linha[1]["t"] == 60.0 + 0.5 + 2 * 0.25, linha[1]
+    assert real < 2.0, f"Simulação lenta: {real:.2f}s"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log = Path(tmp, "ev.log")
+        log.write_text(
+            "2026-01-01 00:00:00; SNAP   | PITCH: 0.1 | ROLL: 0.0 | VENTO: 10.0\n"
+            "2026-01-01 00:02:00; EVENT  | NAME: RUN_START\n"
+            f"2026-01-01 00:02:00; SNAP   | PITCH: {l5} | ROLL: 0.0 | VENTO: 10.0\n",
+            encoding="utf-8",
+        )
+        gravada = _alarmsim.carregar_serie(str(log))
+        assert gravada.pontos == [(0.0, 0.1, 0.0), (120.0, l5, 0.0)], gravada.pontos
+        assert [ev["evento"] for ev in _alarmsim.simular(gravada, modo="dupla")] == ["CONFIRM_START", "PLAY"]
+    print(f"Smoke simulador de alarme OK -> {serie.fim:.0f}s simulados em {real * 1000:.1f} ms")
+
+
+def run_smoke_backtest():
+    """Backtest: histórico gravado (janelas) x três conjuntos de parâmetros, com pool de processos."""
+
+    import tempfile
+
+    import _backtest
+
+    alvo = P1.L5_LEVELS[0] + 0.1
+    desloc = (alvo / P1.FATOR_CORRECAO_PITCH - P1.AA_PITCH) / 2.0
+    l3_antes = list(P1.L3_LEVELS)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(200):  # 30 min a 9 s; pico L5 entre 300 s e 600 s
+            t = 9.0 * i
+            d = desloc if 300 <= t < 600 else 0.0
+            dados = {"ptchwnd": [d + 0.2 * ((k % 9) - 4) for k in range(60)], "rollwnd": [0.0] * 60}
+            _backtest.gravar_leitura(dados, agora=1_800_000_000.0 + t, pasta=tmp)
+        hist = _backtest.carregar_historico(tmp)
+    assert len(hist) == 200 and hist.tem_janelas and hist.ciclo() == 9.0, (len(hist), hist.ciclo())
+
+    rel = _backtest.backtest(
+        hist,
+        [{"nome": "atual"}, {"FATOR_CORRECAO_PITCH": 0.5}, {"nome": "surdo", "L2_LEVELS": 3.0, "L3_LEVELS": 3.5}],
+        modo="dupla",
+        processos=2,
+    )
+    atual, fator, surdo = rel["configs"]
+    assert atual["alarmes"]["5"] == 1 and atual["total_alarmes"] == 1 and atual["picos_perdidos"] == 0, atual
+    assert atual["picos"] == 1 and 250 <= atual["tempo_em_nivel_s"]["5"] <= 320, atual
+    assert fator["alarmes"]["3"] == 1 and fator["tempo_em_nivel_s"]["5"] == 0.0, fator
+    assert surdo["total_alarmes"] == 0 and surdo["picos_perdidos"] == 1, surdo
+    assert P1.L3_LEVELS == l3_antes, "parâmetros não restaurados"
+    assert "surdo" in _backtest.formatar_relatorio(rel)
+    print(f"Smoke backtest OK -> {len(rel['configs'])} conjuntos em {rel['real_ms']:.0f} ms")
+
+
+def run_smoke_lazy_startup():
+    """Import sem efeitos colaterais; --stop sem o runtime; etapas do APP sob demanda."""
+
+    import os
+    import subprocess
+    import sys
+    import tempfile
+
+    base = os.path.dirname(os.path.abspath(__file__))
+    sonda = (
+        "import sys, os, _part1 as P1\n"
+        "print(os.path.exists(P1.OUTPUT_DIR), 'requests' in sys.modules, 'pygame' in sys.modules, P1.audio_ok, P1.APP.tempos)\n"
+        "P1.log.warning('sonda')\n"
+        "print(os.path.exists(P1.FILES['events']), sorted(P1.APP.tempos))\n"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, LITE2_HOME=tmp)
+        env.pop("LITE2_AUDIO", None)
+        out = subprocess.run([sys.executable, "-c", sonda], cwd=base, env=env, capture_output=True, text=True, timeout=30)
+        assert out.returncode == 0, out.stderr
+        antes, depois = out.stdout.splitlines()
+        assert antes == "False False False False {}", antes
+        assert depois == "True ['logging']", depois
+        assert "sonda" in Path(tmp, "runtime", "lite2_events.log").read_text(encoding="utf-8")
+
+        parar = "import sys, lite2\nsys.argv = ['lite2.py', '--stop']\ntry:\n    lite2.main()\nexcept SystemExit:\n    pass\nprint(sorted(m for m in sys.modules if m.startswith('_part')))\n"
+        out = subprocess.run([sys.executable, "-c", parar], cwd=base, env=env, capture_output=True, text=True, timeout=30)
+        assert out.stdout.splitlines()[-1] == "['_part1']", out.stdout + out.stderr
+
+    import _inicio
+
+    rel = _inicio.medir_imports("_part1")
+    assert rel["ok"] and rel["import_ms"] and any(x["modulo"] == "_metrics" for x in rel["modulos"]), rel
+    print(f"Smoke inicialização preguiçosa OK -> import _part1 {rel['import_ms']:.1f} ms")
+
+
+def _span_em_thread(reg, nome):
+    with reg.span(nome):
+        pass
+
+
+def run_smoke_cycle_spans():
+    """Spans por ciclo: aninhamento, thread do agendador, anel limitado, flame e /debug/cycles."""
+
+    from _ciclos import RegistroCiclos
+
+    reg = RegistroCiclos(capacidade=3)
+    for pausa_vento in (0.001, 0.03, 0.002, 0.004):
+        reg.iniciar()
+        with reg.span("pitch_roll"):
+            time.sleep(0.001)
+        with reg.span("vento"):
+            with reg.span("host a"):
+                time.sleep(pausa_vento)
+            with reg.span("host b"):
+                time.sleep(0.001)
+        th = threading.Thread(target=_span_em_thread, args=(reg, "snapshot"), name="lite2-agendador")
+        th.start()
+        th.join()
+        reg.fechar(dados=True)
+        with reg.span("espera"):
+            time.sleep(0.001)
+    assert len(reg.ultimos()) == 3, "anel não limitou"
+    res = reg.resumo(n=2, lentos=1)
+    lento = res["lentos"][0]
+    assert lento["n"] == 2 and lento["dados"] is True, lento
+    pilhas = [s["pilha"] for s in lento["spans"]]
+    assert pilhas[:4] == ["pitch_roll", "vento;host a", "vento;host b", "vento"], pilhas
+    assert "[lite2-agendador];snapshot" in pilhas and "espera" in pilhas, pilhas
+    flame = {f["pilha"]: f["ms"] for f in res["flame_lentos"]}
+    assert res["flame_lentos"][0]["pilha"] == "ciclo;vento;host a" and flame["ciclo;vento;host a"] >= 30.0, flame
+    assert flame["ciclo;vento"] < 5.0 and not any("espera" in p for p in flame), flame
+    assert reg.colapsado(1).splitlines()[0].startswith("ciclo;vento;host a "), reg.colapsado(1)
+
+    P1.CICLOS.limpar()
+    P1.CICLOS.iniciar()
+    with P1.CICLOS.span("avaliar"):
+        pass
+    P1.CICLOS.fechar()
+    resp = P5._rotear_get("/debug/cycles?n=5")
+    doc = json.loads(resp.data)
+    assert resp.code == 200 and doc["ok"] and doc["ultimos"][-1]["spans"][0]["pilha"] == "avaliar", doc
+    P1.CICLOS.limpar()
+    print(f"Smoke spans por ciclo OK -> ciclo mais lento {lento['trabalho_ms']:.0f} ms")
+
+
+def _trabalho_do_ciclo():
+    fim = time.perf_counter() + 0.02
+    while time.perf_counter() < fim:
+        sum(range(200))
+
+
+def run_smoke_profiler():
+    """Perfil sob demanda: cprofile e amostragem amarrados aos ciclos, e o fluxo 202 -> 200 do /debug/profile."""
+
+    from _ciclos import RegistroCiclos
+    from _profiler import Profiler
+
+    reg = RegistroCiclos()
+    prof = Profiler(reg, amostra_sec=0.002)
+    for modo in ("cprofile", "sample"):
+        assert prof.pedir(2, modo)["estado"] == "aguardando"
+        for _ in range(3):
+            reg.iniciar()
+            _trabalho_do_ciclo()
+            reg.fechar()
+            time.sleep(0.005)
+        texto = prof.coletar()
+        assert texto and texto.startswith("# %s, 2 ciclo(s)" % modo), texto
+        assert "_trabalho_do_ciclo" in texto, texto[:500]
+        if modo == "sample":
+            assert any(li.startswith("MainThread;") for li in texto.splitlines()), texto[:500]
+        assert prof.coletar() is None and prof.status()["estado"] == "ocioso"
+
+    # cprofile também na thread do sink, mesmo terminando depois do ciclo
+    import _pipeline
+
+    def _trabalho_no_sink(_item):
+        _trabalho_do_ciclo()
+        time.sleep(0.05)
+
+    sink = _pipeline.Sink("perfil", _trabalho_no_sink, capacidade=2, descartar_antigo=False, perfil=prof)
+    sink.iniciar()
+    try:
+        prof.pedir(1, "cprofile")
+        reg.iniciar()
+        sink.publicar(1)
+        _trabalho_do_ciclo()
+        reg.fechar()
+        texto, fim = None, time.monotonic() + 5.0
+        while texto is None and time.monotonic() < fim:
+            texto = prof.coletar()
+            time.sleep(0.01)
+    finally:
+        sink.parar()
+    assert texto and "_trabalho_do_ciclo" in texto, texto
+    if sys.version_info < (3, 12):
+        assert "_trabalho_no_sink" in texto, texto[:1500]
+
+    resp = P5._rotear_get("/debug/profile?cycles=1&mode=cprofile")
+    assert resp.code == 202 and json.loads(resp.data)["estado"] == "aguardando", resp.data
+    assert P5._rotear_get("/debug/profile?mode=xyz").code == 202  # captura já armada: só status
+    P1.CICLOS.iniciar()
+    _trabalho_do_ciclo()
+    P1.CICLOS.fechar()
+    resp = P5._rotear_get("/debug/profile?cycles=1&mode=cprofile")
+    assert resp.code == 200 and b"_trabalho_do_ciclo" in resp.data, resp.data[:300]
+    assert P5._rotear_get("/debug/profile?mode=xyz").code == 400
+    P1.CICLOS.limpar()
+    print("Smoke profiler sob demanda OK")
+
+
+def run_smoke_bench():
+    """Bench: rodada curta de alguns casos, JSON com chaves estáveis e comparação contra si mesmo."""
+
+    import _bench
+
+    log_antes = P1.FILES["log"]
+    rel = _bench.rodar(janelas=(39,), linhas_log=(200,), tempo_min=0.001, repeticoes=2)
+    assert P1.FILES["log"] == log_antes
+    chaves = {r["chave"] for r in rel["resultados"]}
+    for esperado in ("avaliar_de_json[n=39]", "rajada[fonte=windwnd][n=39]", "gerar_html", "ler_ultimo_do_log[linhas=200]"):
+        assert esperado in chaves, sorted(chaves)
+    assert all(r["us_min"] <= r["us_mediana"] <= r["us_max"] for r in rel["resultados"])
+    cmp = _bench.comparar(rel, rel)
+    assert not cmp["regressoes"] and len(cmp["casos"]) == len(rel["resultados"])
+    lento = {"resultados": [dict(r, us_mediana=r["us_mediana"] / 10.0) for r in rel["resultados"]]}
+    assert _bench.comparar(rel, lento)["regressoes"]
+    print("Smoke bench OK")
+
+
+def run_smoke_memory():
+    """Memória: threads que não terminam viram aviso; diff do tracemalloc aponta a linha que alocou."""
+
+    from _memoria import MonitorMemoria
+
+    eventos = []
+    mem = MonitorMemoria(janela=3, alerta_threads=2, log_event=lambda nome, **kv: eventos.append((nome, kv)))
+    mem.ligar_tracemalloc()
+    try:
+        mem.amostrar()
+        mem.amostrar()
+        solta = threading.Event()
+        presas = [threading.Thread(target=solta.wait, name="vaza-%d" % i, daemon=True) for i in range(4)]
+        for t in presas:
+            t.start()
+        retidos = [bytes(4096) for _ in range(500)]  # ~2 MB alocados nesta linha
+        mem.amostrar()
+        mem.amostrar()  # aviso ativo não repete
+        res = mem.resumo()
+        solta.set()
+    finally:
+        mem.desligar_tracemalloc()
+    assert res["avisos"]["threads"]["por_nome"].get("vaza-N") == 4, res["avisos"]
+    assert [e for e in eventos if e[0] == "MEM_GROWTH"] == [("MEM_GROWTH", {"kind": "threads", "de": eventos[0][1]["de"], "para": eventos[0][1]["para"]})], eventos
+    assert any(d["onde"].startswith("tests_smoke.py") and d["kb_diff"] > 1000 for d in res["tracemalloc_diff_inicio"]), res["tracemalloc_diff_inicio"]
+    assert len(retidos) == 500 and res["threads"]["vaza-N"] == 4 and res["amostras"][-1]["objetos_gc"] > 0
+
+    resp = P5._rotear_get("/debug/memory?amostrar=1&top=5")
+    doc = json.loads(resp.data)
+    assert resp.code == 200 and doc["ok"] and doc["amostras"] and len(doc["objetos_top"]) == 5, doc.keys()
+
+    # amostragem periódica na thread própria, fora do agendador
+    periodico = MonitorMemoria(intervalo=0.05, janela=50)
+    periodico.iniciar()
+    try:
+        fim = time.monotonic() + 5.0
+        while len(periodico.resumo()["amostras"]) < 3 and time.monotonic() < fim:
+            time.sleep(0.02)
+        assert any(t.name == "lite2-memoria" for t in threading.enumerate())
+    finally:
+        periodico.parar()
+    assert len(periodico.resumo()["amostras"]) >= 3 and not any(t.name == "lite2-memoria" for t in threading.enumerate())
+    print("Smoke memória OK")
+
+
+def run_smoke_soak():
+    """Soak: mar sintético no nível pedido, falhas do PyHMS local e tempos comprimidos voltando ao normal."""
+
+    import urllib.error
+    import urllib.request
+
+    import _soak
+
+    mar = _soak.MarSintetico(semente=3)
+    for nome, horas, pitch, roll, _, vento in mar.estados:
+        t = sum(e[1] for e in mar.estados[: mar.estados.index((nome, horas, pitch, roll, _, vento))]) * 3600.0 + 600.0
+        est = P4.avaliar_de_json(mar.payload(t))
+        assert abs(est["pitch_val"] - pitch) < 0.2 and abs(est["roll_val"] - roll) < 0.2, (nome, est["pitch_val"], est["roll_val"])
+
+    falhas = _soak.roteiro_falhas(["a", "b"], 8 * 3600.0, 0.05, semente=2)
+    assert falhas == _soak.roteiro_falhas(["a", "b"], 8 * 3600.0, 0.05, semente=2) and falhas["a"]
+    ini, fim, modo = falhas["a"][0]
+    assert _soak.falha_em(falhas["a"], (ini + fim) / 2.0) == modo and _soak.falha_em(falhas["a"], -1.0) is None
+
+    roteiro = {"ok": [], "fora": [(0.0, 1e9, "fora")], "lixo": [(0.0, 1e9, "lixo")], "nulos": [(0.0, 1e9, "nulos")]}
+    srv = _soak.PyhmsSimulado(mar, roteiro, lambda: 3600.0, 0.0)
+    srv.iniciar()
+    try:
+        def _get(host):
+            try:
+                with urllib.request.urlopen(srv.url_modelo.format(host=host), timeout=5) as r:
+                    return r.status, r.read()
+            except urllib.error.HTTPError as e:
+                return e.code, b""
+
+        code, corpo = _get("ok")
+        assert code == 200 and len(json.loads(corpo)["ptchwnd"]) == _soak.AMOSTRAS_JANELA
+        assert _get("fora")[0] == 503
+        assert _get("lixo")[1].startswith(b"<html>")
+        assert json.loads(_get("nulos")[1])["windspdmean"] is None
+    finally:
+        srv.parar()
+    assert srv.contagem == {"ok": {"ok": 1}, "fora": {"fora": 1}, "lixo": {"lixo": 1}, "nulos": {"nulos": 1}}, srv.contagem
+
+    with _soak.tempos_comprimidos(60.0):
+        assert P1.COLETA_INTERVAL == 9 / 60.0 and P5.alarm_state.confirm_sec == P5.ALARM_CONFIRM_SEC == 0.1
+    assert P1.COLETA_INTERVAL == 9 and P5.alarm_state.confirm_sec == 6.0 and P5.ALARM_RAJADA_POR_NIVEL[2][0] == 3.0
+
+    if P1.requests_spec is None:
+        try:
+            _soak.soak(horas=0.1)
+            raise AssertionError("soak sem requests deveria recusar")
+        except RuntimeError:
+            pass
+        print("Smoke soak OK (sem requests: só mar/PyHMS/tempos)")
+        return
+    rel = _soak.soak(horas=0.25, compressao=240.0, taxa_falhas=0.05, semente=1)
+    assert rel["ok"] and rel["ciclos"] > 50, _soak.formatar(rel)
+    print("Smoke soak OK")
+
+
+def run_smoke_stop():
+    """Parada: --stop encerra a instância em menos de 1 s, também com o loop esperando o próximo ciclo."""
+
+    import os
+    import subprocess
+    import sys
+    import tempfile
+
+    base = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, LITE2_HOME=tmp, BROWSER="true")
+        log_path = Path(tmp, "runtime", "lite2_events.log")
+        proc = subprocess.Popen([sys.executable, "lite2.py"], cwd=base, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            fim = time.monotonic() + 20.0
+            while time.monotonic() < fim and not (log_path.exists() and "MERGE_EMPTY" in log_path.read_text(encoding="utf-8")):
+                time.sleep(0.05)  # primeiro ciclo feito: o loop está na espera de COLETA_INTERVAL
+            assert proc.poll() is None, "monitor saiu antes do --stop"
+            t0 = time.monotonic()
+            out = subprocess.run([sys.executable, "lite2.py", "--stop"], cwd=base, env=env, capture_output=True, text=True, timeout=30)
+            assert "OK" in out.stdout, out.stdout + out.stderr
+            proc.wait(10.0)
+            dur = time.monotonic() - t0
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+        eventos = log_path.read_text(encoding="utf-8")
+    assert dur < 1.0 and "NAME: STOP" in eventos, (dur, eventos[-500:])
+    print(f"Smoke parada OK -> encerrou {dur * 1000:.0f} ms depois de chamar --stop")
+
+
+def run_smoke_aquisicao():
+    """Aquisição em processo: anel (sobrescrita, leitura pulada) e um filho real publicando leituras."""
+
+    import _aquisicao as A
+
+    anel = A.AnelCompartilhado(capacidade=4, slot_bytes=256)
+    leitor = A.AnelCompartilhado(anel.nome, 4, 256)
+    try:
+        for i in range(6):
+            anel.publicar({"i": i})
+        assert leitor.ultimo() == 6 and leitor.ler(6)[1] == {"i": 5}
+        assert leitor.ler(2) is None and leitor.ler(7) is None  # sobrescrita / ainda não existe
+        try:
+            anel.publicar({"x": "y" * 400})
+            raise AssertionError("leitura maior que o slot deveria falhar")
+        except ValueError:
+            pass
+    finally:
+        leitor.fechar()
+        anel.fechar()
+
+    aq = A.AquisicaoEmProcesso(intervalo=0.2)
+    t0 = time.monotonic()
+    aq.iniciar()
+    try:
+        aq.preferencia("smp53ocn01")
+        primeiro = aq.proxima(20.0)
+        assert primeiro is not None, "processo de aquisição não publicou"
+        seq, epoch, leitura = primeiro
+        assert set(leitura) >= {"dados", "est", "trabalho_ms", "spans"} and abs(epoch - time.time()) < 30, leitura
+        from _ciclos import RegistroCiclos
+
+        reg = RegistroCiclos()
+        ciclo = reg.iniciar()
+        reg.anexar(ciclo, leitura["spans"], "lite2-aquisicao")
+        reg.fechar()
+        pilhas = [s["pilha"] for s in reg.resumo(1)["ultimos"][0]["spans"]]
+        assert "[lite2-aquisicao];pitch_roll" in pilhas and "[lite2-aquisicao];vento" in pilhas, pilhas
+        segundo = aq.proxima(5.0)
+        assert segundo is not None and segundo[0] > seq, (primeiro, segundo)
+        dur = time.monotonic() - t0
+    finally:
+        aq.parar()
+    aq.parar()  # idempotente
+    assert not aq.vivo()
+    print(f"Smoke aquisição OK -> anel ok; filho publicou seq {segundo[0]} ({dur:.2f} s)")
+
+
+def run_smoke_pipeline():
+    """Pipeline do run_monitor: sink lento não atrasa o publicador, descarta o mais antigo, crítico não perde item, span no ciclo certo."""
+
+    import _pipeline
+    from _ciclos import RegistroCiclos
+
+    liberar, comecou = threading.Event(), threading.Event()
+    vistos, criticos = [], []
+
+    def _lento(item):
+        comecou.set()
+        liberar.wait(5.0)
+        vistos.append(item)
+
+    def _critico(item):
+        if item == 2:
+            raise RuntimeError("falha de propósito")  # logada; o sink segue
+        criticos.append(item)
+
+    reg = RegistroCiclos()
+    antes = P1.CICLOS
+    P1.CICLOS = reg
+    pipe = _pipeline.Pipeline(
+        _pipeline.Sink("html", _lento, capacidade=1),
+        _pipeline.Sink("alarme", _critico, capacidade=2, descartar_antigo=False),
+    ).iniciar()
+    try:
+        t0 = time.monotonic()
+        for i in range(5):
+            ciclo = reg.iniciar()
+            pipe.publicar(ciclo, html=i, alarme=i)
+            reg.fechar()
+            comecou.wait(5.0)
+        publicar_ms = (time.monotonic() - t0) * 1000.0
+        assert publicar_ms < 500.0, publicar_ms  # o sink html está parado em liberar.wait
+        liberar.set()
+        assert pipe.drenar(5.0)
+    finally:
+        pipe.parar()
+        P1.CICLOS = antes
+    # o 0 já estava em curso; da fila de 1 sobra só o mais novo
+    assert vistos == [0, 4] and pipe.sinks["html"].descartados == 3, vistos
+    assert criticos == [0, 1, 3, 4] and pipe.sinks["alarme"].descartados == 0, criticos
+    assert _pipeline.DESCARTES.valor(sink="html") >= 3
+    primeiro = reg.ultimos()[0]
+    pilhas = [p for p, _, _ in primeiro.spans]
+    assert "[lite2-sink-html];html" in pilhas and "[lite2-sink-alarme];alarme" in pilhas, pilhas
+    assert not any(t.name.startswith("lite2-sink-") and t.is_alive() for t in threading.enumerate())
+    print(f"Smoke pipeline OK -> 5 publicações em {publicar_ms:.1f} ms com o painel travado; html viu {vistos}")
+
+
+def run_smoke_live_snapshot():
+    """Live view imutável: troca de referência, /data.json pré-codificado, leitores sem lock e sempre consistentes."""
+
+    P5._set_live_view(pitch_txt="1.0", roll_txt="1.0")
+    antiga = P5.live_snapshot()
+    try:
+        antiga.versao = 0
+        raise AssertionError("LiveSnapshot aceitou atribuição")
+    except AttributeError:
+        pass
+    try:
+        antiga.view["pitch_txt"] = "9"
+        raise AssertionError("view da foto aceitou atribuição")
+    except TypeError:
+        pass
+    assert P5._rotear_get("/data.json").data is antiga.data_json, "/data.json recodificado por requisição"
+
+    P5._set_live_view(pitch_txt="2.0", roll_txt="2.0")
+    nova = P5.live_snapshot()
+    assert nova is not antiga and nova.versao == antiga.versao + 1
+    assert antiga.view["pitch_txt"] == "1.0" and nova.view["pitch_txt"] == "2.0", "foto antiga mudou"
+
+    # escritor parado com o lock na mão: leitura não espera
+    with P5._LIVE_ESCRITA:
+        t0 = time.perf_counter()
+        doc = json.loads(P5._rotear_get("/data.json").data)
+        espera_ms = (time.perf_counter() - t0) * 1000.0
+    assert doc["pitch_txt"] == "2.0" and espera_ms < 100.0, (doc, espera_ms)
+
+    # leitores concorrentes com o escritor: pitch e roll sempre da mesma publicação
+    parar, ruins, leituras = threading.Event(), [], [0]
+
+    def _ler():
+        while not parar.is_set():
+            d = json.loads(P5._rotear_get("/data.json").data)
+            leituras[0] += 1
+            if d["pitch_txt"] != d["roll_txt"]:
+                ruins.append(d)
+
+    leitores = [threading.Thread(target=_ler) for _ in range(3)]
+    for th in leitores:
+        th.start()
+    for i in range(300):
+        P5._set_live_view(pitch_txt=str(i), roll_txt=str(i))
+    parar.set()
+    for th in leitores:
+        th.join()
+    assert not ruins and leituras[0] > 0, ruins[:3]
+    print(f"Smoke live snapshot OK -> {leituras[0]} leituras concorrentes consistentes; leitura com escritor travado {espera_ms:.2f} ms")
+
+
+def run_smoke_loadtest():
+    """Gerador de carga: rodada curta (2 clientes, 1 s) nos dois modos, relatório completo e sem erros."""
+
+    import _loadtest
+
+    sat = _loadtest.medir_servidor("thread", clientes=2, duracao_s=1.0)
+    assert sat["erros"] == 0 and sat["requisicoes"] > 0, sat
+
+    rel = _loadtest.executar_carga("thread", clientes=2, duracao_s=1.0, acelerar=20.0, ciclo_s=0.2)
+    for chave in ("requisicoes", "req_por_s", "erros", "taxa_erro", "p50_ms", "p99_ms", "por_rota", "ciclo_sem_carga", "ciclo_com_carga", "ciclo_delta"):
+        assert chave in rel, f"relatório sem {chave}"
+    assert rel["erros"] == 0 and rel["taxa_erro"] == 0.0 and rel["requisicoes"] > 0, rel
+
+    # processo de clientes que morre: erro claro com o exit code, sem esperar o timeout
+    import multiprocessing as mp
+
+    fila, proc = mp.Queue(), mp.Process(target=sys.exit, args=(3,), daemon=True)
+    proc.start()
+    t0 = time.monotonic()
+    try:
+        _loadtest._esperar_stats(fila, proc, 30.0)
+        raise AssertionError("processo morto deveria virar erro")
+    except RuntimeError as e:
+        assert "código 3" in str(e) and time.monotonic() - t0 < 10.0, e
+    print(f"Smoke loadtest OK -> saturação {sat['req_por_s']} req/s; painel {rel['requisicoes']} req, p99 {rel['p99_ms']} ms")
+
+
+def run_smoke_alarm_confirm_worker():
+    """Confirmação dupla com coleta lenta: o agendador segue livre e o alarme toca quando a coleta volta."""
+
+    from _scheduler import Agendador
+
+    est_l5 = P4.avaliar_por_valores(P1.L5_LEVELS[0] + 0.1, 0.0, 0.0)
+
+    def _lenta():
+        time.sleep(0.4)
+        return est_l5
+
+    ag = Agendador()
+    tocados, outras = [], []
+    try:
+        alarme = P5.AlarmState(
+            coletar=_lenta,
+            confirm_sec=0.05,
+            agendador=ag,
+            modo="dupla",
+            coletor=P5.ColetorConfirmacao(threads=2),
+            tocar=lambda nivel, est, **extra: tocados.append(nivel),
+            log_evento=lambda nome, **kv: None,
+        )
+        t0 = time.monotonic()
+        alarme.maybe_schedule(est_l5)
+        ag.agendar(0.15, lambda: outras.append(time.monotonic() - t0), nome="snapshot")
+        while not tocados and time.monotonic() < t0 + 3.0:
+            time.sleep(0.01)
+        total = time.monotonic() - t0
+    finally:
+        ag.parar()
+    assert tocados == [5] and alarme.confirm_stage == 0, tocados
+    assert outras and outras[0] < 0.3, outras  # não esperou a recoleta de 0.4 s em curso
+    print(f"Smoke confirmação fora do agendador OK -> outra tarefa em {outras[0] * 1000:.0f} ms, alarme em {total * 1000:.0f} ms")
+
+
 if __name__ == "__main__":
     run_smoke()
     run_smoke_audio_serialization()
+    run_smoke_gzip()
+    run_smoke_async_server()
+    run_smoke_state()
+    run_smoke_metrics()
+    run_smoke_soundbank()
+    run_smoke_soundbank_pcm_cache()
+    run_smoke_audio_deadlines()
+    run_smoke_clip_compositor()
+    run_smoke_audio_dispatcher()
+    run_smoke_audio_backend()
+    run_smoke_scheduler()
+    run_smoke_alarm_burst()
+    run_smoke_alarm_sim()
+    run_smoke_backtest()
+    run_smoke_lazy_startup()
+    run_smoke_cycle_spans()
+    run_smoke_profiler()
+    run_smoke_bench()
+    run_smoke_memory()
+    run_smoke_soak()
+    run_smoke_stop()
+    run_smoke_aquisicao()
+    run_smoke_pipeline()
+    run_smoke_live_snapshot()
+    run_smoke_loadtest()
+    run_smoke_alarm_confirm_worker()